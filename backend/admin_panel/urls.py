@@ -22,4 +22,7 @@ urlpatterns = [
     
     # Transações
     path('transactions/', views.list_all_transactions, name='admin_transactions'),
+
+    # Upstream (YGOProDeck)
+    path('upstream/', views.upstream_stats, name='admin_upstream'),
 ]
@@ -2,6 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db.models import Sum, Count, Avg
 from django.db.models.functions import TruncDate
@@ -11,6 +12,8 @@ from decimal import Decimal
 
 from wallet.models import UserWallet, Transaction, WithdrawRequest, DepositRequest, ReferralCode
 from market.models import CardListing
+from core.ratelimit import scheduler
+from core.upstream import upstream
 
 
 def is_admin(user):
@@ -587,3 +590,21 @@ def list_all_transactions(request):
         'page': page,
         'per_page': per_page,
     })
+
+
+# ==================== UPSTREAM ====================
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def upstream_stats(request):
+    """Fila e orçamento das chamadas ao YGOProDeck; DELETE zera os contadores"""
+    if request.method == 'DELETE':
+        scheduler.reset_metrics()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response({
+        'rate_limit': settings.UPSTREAM_RATE_LIMIT,
+        'interactive_reserve': settings.UPSTREAM_INTERACTIVE_RESERVE,
+        'priorities': scheduler.metrics(),
+        'circuits': upstream.circuit_states(),
+    })
@@ -4,4 +4,7 @@ set -o errexit
 
 pip install -r requirements.txt
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py createcachetable
+python manage.py build_catalog_snapshot
+python manage.py extract_card_features --store-only
\ No newline at end of file
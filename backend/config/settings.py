@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'wallet',
     'market',
     'admin_panel',
+    'scanner',
 ]
 
 MIDDLEWARE = [
@@ -108,6 +109,73 @@ DATABASES = {
 }
 
 
+# Cache
+# Compartilhado entre os workers do Gunicorn (o LocMemCache padrão é por processo).
+# Com REDIS_URL usa Redis; com DATABASE_URL (deploy), a tabela do banco
+# (rode `createcachetable`); senão, cache em arquivo no próprio host.
+# O lock do single-flight e os contadores do limite de chamadas ao upstream
+# dependem de add/incr: só o Redis é atômico nos dois; no banco o add é
+# atômico e o incr não; no arquivo nenhum dos dois entre processos. Com
+# cache em arquivo e vários workers, ambos valem por processo (best-effort).
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'redis' if REDIS_URL else 'db' if os.getenv('DATABASE_URL') else 'file'
+)
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+# LRU local (por processo) na frente do cache compartilhado, ver core/cache.py
+CORE_LOCAL_CACHE_SIZE = int(os.getenv('CORE_LOCAL_CACHE_SIZE', '512'))
+CORE_LOCAL_CACHE_TTL = int(os.getenv('CORE_LOCAL_CACHE_TTL', '60'))
+
+# Snapshot binário do catálogo (build_catalog_snapshot), mapeado pelos workers
+CATALOG_SNAPSHOT_PATH = Path(os.getenv('CATALOG_SNAPSHOT_PATH', BASE_DIR / 'cache' / 'catalog.snapshot'))
+
+# Scanner: referências mantidas pelo pré-filtro de pHash antes do ORB (0 desliga)
+SCANNER_PREFILTER_K = int(os.getenv('SCANNER_PREFILTER_K', '200'))
+# Descritores empacotados (extract_card_features), mapeados pelos workers
+SCANNER_STORE_DIR = Path(os.getenv('SCANNER_STORE_DIR', BASE_DIR / 'cache' / 'scanner'))
+# Fila de jobs (por worker do Gunicorn): threads do pool e jobs pendentes antes do 429
+SCANNER_WORKERS = int(os.getenv('SCANNER_WORKERS', '2'))
+SCANNER_QUEUE_DEPTH = int(os.getenv('SCANNER_QUEUE_DEPTH', '8'))
+# Threads de requisição que podem ficar esperando um job (long polling, streaming);
+# mantenha abaixo do --threads do Gunicorn para sobrar thread para o resto da API
+SCANNER_MAX_WAITERS = int(os.getenv('SCANNER_MAX_WAITERS', '2'))
+# Por quanto tempo o resultado de um job fica disponível para consulta (s)
+SCANNER_JOB_TTL = int(os.getenv('SCANNER_JOB_TTL', '600'))
+
+# Orçamento de chamadas ao upstream por host, somando todos os workers (core/ratelimit.py).
+# O YGOProDeck bloqueia o IP acima de 20 req/s; background só usa o que passa da reserva
+UPSTREAM_RATE_LIMIT = int(os.getenv('UPSTREAM_RATE_LIMIT', '15'))
+UPSTREAM_INTERACTIVE_RESERVE = int(os.getenv('UPSTREAM_INTERACTIVE_RESERVE', '5'))
+# Espera máxima por uma vaga antes de desistir (s)
+UPSTREAM_INTERACTIVE_MAX_WAIT = float(os.getenv('UPSTREAM_INTERACTIVE_MAX_WAIT', '2'))
+UPSTREAM_BACKGROUND_MAX_WAIT = float(os.getenv('UPSTREAM_BACKGROUND_MAX_WAIT', '30'))
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -139,6 +207,16 @@ STATIC_ROOT = BASE_DIR / 'staticfiles' # Pasta onde o collectstatic reunirá os
 # WhiteNoise: Compressão e cache para arquivos estáticos
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Media (uploads e imagens de cartas baixadas do YGOProDeck)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Store de imagens endereçado por conteúdo (core/images.py)
+IMAGE_STORE_ROOT = MEDIA_ROOT / 'card_images'
+# Com nginx na frente, defina o prefixo de uma location `internal` que aponte
+# para IMAGE_STORE_ROOT (ex.: /protected/card_images/) para o nginx servir o arquivo
+IMAGE_STORE_ACCEL_PREFIX = os.getenv('IMAGE_STORE_ACCEL_PREFIX', '')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -23,4 +23,5 @@ urlpatterns = [
     path('api/wallet/', include('wallet.urls')),
     path('api/market/', include('market.urls')),
     path('api/admin-panel/', include('admin_panel.urls')),
+    path('api/scanner/', include('scanner.urls')),
 ]
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Índices do catálogo (e do scanner) em memória montados na subida de cada worker
+from core.indexes import warm_indexes  # noqa: E402
+from scanner.index import scanner_index  # noqa: E402
+
+warm_indexes(scanner_index)
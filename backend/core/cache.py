@@ -0,0 +1,220 @@
+"""
+Cache em dois níveis para as consultas de catálogo do core.
+
+Nível 1: LRU pequeno em memória, por processo (evita ida ao backend em hits quentes).
+Nível 2: cache compartilhado do Django (arquivo, banco ou Redis, ver CACHES),
+visto por todos os workers do Gunicorn e preservado entre restarts.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .ratelimit import upstream_priority, BACKGROUND
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(prefix, params=None):
+    """
+    Chave estável para um conjunto de parâmetros.
+    Diferente de hash(), não muda entre processos nem entre execuções.
+    """
+    canonical = json.dumps(params or {}, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    return f"{prefix}_{digest}"
+
+
+class LocalLRU:
+    """LRU thread-safe com expiração, usado como primeiro nível"""
+
+    def __init__(self, maxsize=512, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        # O nível local nunca guarda por mais que `ttl`, para que
+        # invalidações feitas por outros workers apareçam logo.
+        ttl = self.ttl if timeout is None else min(timeout, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    """LRU local na frente de um cache compartilhado do Django"""
+
+    def __init__(self, alias='default', local_size=None, local_ttl=None):
+        self.alias = alias
+        self.local = LocalLRU(
+            maxsize=local_size or settings.CORE_LOCAL_CACHE_SIZE,
+            ttl=local_ttl or settings.CORE_LOCAL_CACHE_TTL,
+        )
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value = self.shared.get(key)
+        if value is None:
+            return default
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing)
+            for key, value in shared.items():
+                self.local.set(key, value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout):
+        self.shared.set(key, value, timeout)
+        self.local.set(key, value, timeout)
+
+    def set_many(self, mapping, timeout):
+        self.shared.set_many(mapping, timeout)
+        for key, value in mapping.items():
+            self.local.set(key, value, timeout)
+
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.shared.delete_many(keys)
+        for key in keys:
+            self.local.delete(key)
+
+
+# Tempo que um "não encontrado" fica cacheado (IDs inválidos, buscas sem resultado)
+NEGATIVE_TTL = 300
+
+# Chaves com revalidação em andamento neste processo
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def make_entry(value, timeout, negative_timeout=NEGATIVE_TTL):
+    """
+    Envelope guardado no cache: valor + instante em que deixa de ser fresco.
+    Retorna (entrada, timeout do backend); value None é uma entrada negativa.
+    """
+    ttl = negative_timeout if value is None else timeout
+    return {'value': value, 'fresh_until': time.time() + ttl}, ttl
+
+
+def is_fresh(entry):
+    """A entrada ainda está dentro do TTL "soft"?"""
+    return entry['fresh_until'] > time.time()
+
+
+def _fresh(entry):
+    """Retorna a entrada se ainda estiver dentro do TTL "soft" """
+    if entry is not None and is_fresh(entry):
+        return entry
+    return None
+
+
+def refresh_in_background(key, load):
+    """Revalida uma entrada velha sem bloquear a requisição atual"""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with upstream_priority(BACKGROUND):
+                single_flight.do(key, load, wait=False)
+        except Exception:
+            logger.warning('Falha ao revalidar %s; mantendo a versão velha', key, exc_info=True)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def cached_fetch(cache, key, fetch, timeout, stale_timeout=None, negative_timeout=NEGATIVE_TTL):
+    """
+    Lê `key` do cache com stale-while-revalidate e cache negativo.
+
+    - `timeout` (soft TTL): até aqui a entrada é servida como fresca.
+    - `stale_timeout` (hard TTL): depois do soft TTL e até aqui, a entrada
+      velha é servida na hora e revalidada em background.
+    - `fetch()` devolve None para "não encontrado", que fica cacheado por
+      `negative_timeout`.
+
+    No miss, `fetch()` roda com single-flight (uma busca por chave, mesmo
+    com vários workers).
+    """
+    stale_timeout = max(stale_timeout or timeout, timeout)
+
+    def load():
+        value = fetch()
+        entry, ttl = make_entry(value, timeout, negative_timeout)
+        cache.set(key, entry, stale_timeout if value is not None else ttl)
+        return entry
+
+    entry = cache.get(key)
+    if entry is not None:
+        if _fresh(entry) is None:
+            refresh_in_background(key, load)
+        return entry['value']
+
+    entry = single_flight.do(key, load, check=lambda: _fresh(cache.get(key)))
+    if entry is None:
+        # Pegamos carona numa revalidação em background que desistiu
+        entry = load()
+    return entry['value']
+
+
+# Instância usada pelas views do core
+catalog_cache = TwoTierCache()
@@ -0,0 +1,218 @@
+"""
+Consultas e carga do catálogo local de cartas (espelho do YGOProDeck).
+
+Leituras por ID usam o snapshot mapeado em memória (core/snapshot.py)
+quando ele existe; as buscas por texto continuam no banco.
+"""
+from itertools import islice
+
+from django.db import transaction
+
+from .indexes import catalog_snapshot
+from .models import CardCatalog
+from .snapshot import STRING_FIELDS, INT_FIELDS, write_snapshot
+
+# Campos atualizados quando uma carta já existe no catálogo
+UPSERT_FIELDS = [
+    'name', 'type', 'frame_type', 'attribute', 'race', 'archetype',
+    'atk', 'defense', 'level', 'data', 'content_hash', 'updated_at',
+]
+
+
+def catalog_available():
+    """Indica se o catálogo local já foi carregado"""
+    return len(catalog_snapshot.get()) > 0 or CardCatalog.objects.exists()
+
+
+def parse_ids(value):
+    """Converte '123,456' em [123, 456], ignorando valores inválidos"""
+    ids = []
+    for part in str(value).split(','):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+    return ids
+
+
+def parse_pagination(query):
+    """
+    Lê num/offset da querystring.
+    num ausente significa "sem limite"; valores inválidos geram ValueError.
+    """
+    num = query.get('num')
+    offset = query.get('offset') or 0
+    num = int(num) if num not in (None, '') else None
+    offset = int(offset)
+    if (num is not None and num < 0) or offset < 0:
+        raise ValueError('num/offset negativos')
+    return num, offset
+
+
+def pagination_meta(total, num, offset, count):
+    """Bloco `meta` no mesmo formato do cardinfo.php"""
+    remaining = max(total - offset - count, 0)
+    total_pages = -(-total // num) if num else 1
+    meta = {
+        'current_rows': count,
+        'total_rows': total,
+        'rows_remaining': remaining,
+        'total_pages': total_pages,
+        'pages_remaining': -(-remaining // num) if num else 0,
+    }
+    if remaining:
+        meta['next_page_offset'] = offset + count
+    return meta
+
+
+def summarize_card(card):
+    """
+    Versão enxuta da carta para grids/listas: id, nome, tipo e só a
+    primeira imagem (mantém `card_images` para o front não mudar).
+    """
+    images = card.get('card_images') or []
+    return {
+        'id': card.get('id'),
+        'name': card.get('name'),
+        'type': card.get('type'),
+        'card_images': images[:1],
+    }
+
+
+# Campo da querystring -> coluna do modelo
+RANGE_COLUMNS = {'atk': 'atk', 'def': 'defense', 'level': 'level'}
+
+
+def search_catalog(params, num=None, offset=0, ranges=None):
+    """
+    Busca no catálogo local com a mesma semântica do cardinfo.php.
+    `ranges` ({'atk': (mín, máx), ...}) restringe os campos numéricos.
+    Retorna (cartas da página no formato da API, total de resultados).
+    """
+    queryset = CardCatalog.objects.all()
+
+    if params.get('fname'):
+        queryset = queryset.filter(name__icontains=params['fname'])
+    if params.get('name'):
+        queryset = queryset.filter(name__iexact=params['name'])
+    if params.get('id'):
+        queryset = queryset.filter(id__in=parse_ids(params['id']))
+    # Categóricos sem diferenciar maiúsculas, como no FilterEngine
+    for field in ('type', 'attribute', 'race', 'archetype'):
+        if params.get(field):
+            queryset = queryset.filter(**{f'{field}__iexact': params[field]})
+    for field, (low, high) in (ranges or {}).items():
+        column = RANGE_COLUMNS[field]
+        if low is not None:
+            queryset = queryset.filter(**{f'{column}__gte': low})
+        if high is not None:
+            queryset = queryset.filter(**{f'{column}__lte': high})
+
+    total = queryset.count()
+    page = queryset.order_by('name').values_list('data', flat=True)
+    if num is not None:
+        page = page[offset:offset + num]
+    elif offset:
+        page = page[offset:]
+
+    return list(page), total
+
+
+def get_catalog_card(card_id):
+    """Retorna a carta no formato da API ou None"""
+    snapshot = catalog_snapshot.get()
+    if len(snapshot):
+        record = snapshot.get(card_id)
+        return record.data if record is not None else None
+    return CardCatalog.objects.filter(id=card_id).values_list('data', flat=True).first()
+
+
+def get_catalog_cards(card_ids):
+    """Retorna {id: carta no formato da API} para os IDs encontrados"""
+    snapshot = catalog_snapshot.get()
+    if len(snapshot):
+        return {card_id: record.data for card_id, record in snapshot.get_many(card_ids).items()}
+    return dict(CardCatalog.objects.filter(id__in=card_ids).values_list('id', 'data'))
+
+
+def upsert_cards(cards, batch_size=1000):
+    """
+    Insere/atualiza cartas em lotes com bulk_create + ON CONFLICT.
+    Retorna o número de cartas processadas.
+    """
+    total = 0
+    cards = iter(cards)
+
+    with transaction.atomic():
+        while True:
+            batch = [CardCatalog.from_api(card) for card in islice(cards, batch_size)]
+            if not batch:
+                break
+            CardCatalog.objects.bulk_create(
+                batch,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPSERT_FIELDS,
+            )
+            total += len(batch)
+
+    return total
+
+
+def card_lookup_ids(card):
+    """IDs pelos quais a carta é pedida: o dela e os das artes alternativas"""
+    ids = {int(card['id'])}
+    ids.update(int(image['id']) for image in card.get('card_images') or () if image.get('id'))
+    return ids
+
+
+def stored_lookup_ids(card_ids, batch_size=1000):
+    """card_lookup_ids das cartas gravadas hoje no catálogo local"""
+    ids = set()
+    for start in range(0, len(card_ids), batch_size):
+        batch = card_ids[start:start + batch_size]
+        for data in CardCatalog.objects.filter(id__in=batch).values_list('data', flat=True):
+            ids.update(card_lookup_ids(data))
+    return ids
+
+
+def diff_catalog(cards):
+    """
+    Compara o dump do upstream com os hashes do catálogo local.
+    Retorna (cartas novas ou alteradas, IDs que sumiram do upstream).
+    """
+    local = dict(CardCatalog.objects.values_list('id', 'content_hash').iterator())
+    changed = []
+    for card in cards:
+        if local.pop(int(card['id']), None) != CardCatalog.hash_card(card):
+            changed.append(card)
+    return changed, sorted(local)
+
+
+def delete_cards(card_ids, batch_size=1000):
+    """Remove cartas do catálogo; retorna quantas foram apagadas"""
+    deleted = 0
+    with transaction.atomic():
+        for start in range(0, len(card_ids), batch_size):
+            batch = card_ids[start:start + batch_size]
+            deleted += CardCatalog.objects.filter(id__in=batch).delete()[0]
+    return deleted
+
+
+def export_snapshot(path=None, cards=None):
+    """
+    Exporta o catálogo para o snapshot binário lido pelos workers. Com
+    `cards` (o dump completo já em memória), não relê o banco.
+    Retorna o número de cartas exportadas.
+    """
+    if cards is not None:
+        rows = []
+        for card in cards:
+            instance = CardCatalog.from_api(card)
+            row = {field: getattr(instance, field) for field in STRING_FIELDS + INT_FIELDS}
+            rows.append({**row, 'id': instance.id, 'data': card})
+    else:
+        if not CardCatalog.objects.exists():
+            return 0
+        rows = CardCatalog.objects.values('id', *STRING_FIELDS, *INT_FIELDS, 'data').iterator()
+    return write_snapshot(rows, path=path)
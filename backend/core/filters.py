@@ -0,0 +1,117 @@
+"""
+Motor de filtros do catálogo em memória (um por worker).
+
+- Campos categóricos (type, attribute, race, archetype): um bitmap por valor,
+  compactado com np.packbits (bit i = carta i, cartas ordenadas por nome).
+  Filtros combinam com AND bit a bit; vários valores no mesmo campo, com OR.
+- Campos numéricos (atk, def, level): valores ordenados + posições; uma
+  faixa vira dois np.searchsorted e um bitmap.
+
+Qualquer combinação sai em poucos milissegundos, sem uma chave de cache
+por combinação. O resultado já vem na ordem do nome (a mesma da busca).
+"""
+from collections import defaultdict
+
+import numpy as np
+
+CATEGORICAL_FIELDS = ('type', 'attribute', 'race', 'archetype')
+NUMERIC_FIELDS = ('atk', 'def', 'level')
+
+
+def parse_ranges(query):
+    """
+    Lê atk_min/atk_max, def_min/def_max, level_min/level_max da querystring.
+    Retorna {campo: (mínimo ou None, máximo ou None)}; valores inválidos
+    geram ValueError.
+    """
+    ranges = {}
+    for field in NUMERIC_FIELDS:
+        low = query.get(f'{field}_min')
+        high = query.get(f'{field}_max')
+        low = int(low) if low not in (None, '') else None
+        high = int(high) if high not in (None, '') else None
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+    return ranges
+
+
+class FilterEngine:
+
+    def __init__(self, rows):
+        """
+        rows: iterável de dicts com id e os campos filtráveis, já ordenado
+        pelo nome.
+        """
+        rows = list(rows)
+        self.size = len(rows)
+        self.ids = np.array([row['id'] for row in rows], dtype=np.int64)
+
+        self._bitmaps = {}
+        for field in CATEGORICAL_FIELDS:
+            positions = defaultdict(list)
+            for i, row in enumerate(rows):
+                value = row.get(field)
+                if value:
+                    positions[value.lower()].append(i)
+            self._bitmaps[field] = {
+                value: self._bitmap_from_positions(idx) for value, idx in positions.items()
+            }
+
+        # Numéricos: (valores ordenados, posição de cada valor); nulos ficam de fora
+        self._sorted = {}
+        for field in NUMERIC_FIELDS:
+            pairs = sorted((row[field], i) for i, row in enumerate(rows) if row.get(field) is not None)
+            self._sorted[field] = (
+                np.array([value for value, _ in pairs], dtype=np.int32),
+                np.array([i for _, i in pairs], dtype=np.int32),
+            )
+
+    def __len__(self):
+        return self.size
+
+    def _bitmap_from_positions(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def _empty(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _categorical(self, field, values):
+        bitmap = self._empty()
+        for value in values:
+            match = self._bitmaps[field].get(value.lower())
+            if match is not None:
+                bitmap |= match
+        return bitmap
+
+    def _numeric(self, field, low, high):
+        values, positions = self._sorted[field]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return self._bitmap_from_positions(positions[start:end])
+
+    def query(self, filters, ranges=None, num=None, offset=0):
+        """
+        filters: {campo categórico: valor ou lista de valores}
+        ranges: {campo numérico: (mínimo, máximo)}
+        Retorna (IDs da página na ordem do nome, total de resultados).
+        """
+        bitmap = None
+        for field, values in filters.items():
+            if isinstance(values, str):
+                values = [values]
+            match = self._categorical(field, values)
+            bitmap = match if bitmap is None else bitmap & match
+        for field, (low, high) in (ranges or {}).items():
+            match = self._numeric(field, low, high)
+            bitmap = match if bitmap is None else bitmap & match
+
+        if bitmap is None:
+            positions = np.arange(self.size)
+        else:
+            positions = np.flatnonzero(np.unpackbits(bitmap, count=self.size))
+
+        total = len(positions)
+        end = None if num is None else offset + num
+        return [int(card_id) for card_id in self.ids[positions[offset:end]]], total
@@ -0,0 +1,261 @@
+"""
+Armazenamento de imagens em disco, endereçado por conteúdo (MEDIA_ROOT).
+
+    blobs/ab/<sha256>.jpg   conteúdo imutável, nome = hash do conteúdo
+    refs/<chave>.json       aponta uma chave lógica (ex.: cards/46986414) para o blob
+
+As escritas são atômicas (arquivo temporário + os.replace), então vários
+workers podem gravar a mesma imagem sem corromper nada. Nada fica na memória
+dos workers: as respostas saem com FileResponse ou X-Accel-Redirect.
+"""
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import NEGATIVE_TTL
+from .imaging import is_valid_image
+from .singleflight import single_flight
+from .upstream import upstream, CircuitOpenError, YGOPRODECK_IMAGE_URL, YGOPRODECK_CARD_BACK_URL
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_AGE = 604800
+# Respostas do upstream que significam "imagem não existe" (vão para o cache negativo)
+MISSING_STATUS = (404, 410)
+# Permissão dos blobs e refs gravados
+FILE_MODE = 0o644
+
+
+@dataclass
+class StoredImage:
+    key: str
+    digest: str
+    content_type: str
+    path: Path
+    relative_path: str
+    modified: float
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+
+class ImageStore:
+
+    def __init__(self, root=None):
+        self._root = Path(root) if root else None
+
+    @property
+    def root(self):
+        return self._root or Path(settings.IMAGE_STORE_ROOT)
+
+    def _ref_path(self, key):
+        return self.root / 'refs' / f"{key}.json"
+
+    def _atomic_write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            # mkstemp cria com 0600; o nginx (outro usuário) lê o arquivo via X-Accel-Redirect
+            os.fchmod(fd, FILE_MODE)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        """Retorna a StoredImage da chave ou None"""
+        try:
+            ref = json.loads(self._ref_path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        relative_path = ref['path']
+        path = self.root / relative_path
+        try:
+            modified = path.stat().st_mtime
+        except OSError:
+            return None
+        return StoredImage(
+            key=key,
+            digest=ref['digest'],
+            content_type=ref['content_type'],
+            path=path,
+            relative_path=relative_path,
+            modified=modified,
+        )
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def _missing_key(self, key):
+        return f"image_missing_{key.replace('/', '_')}"
+
+    def discard(self, key):
+        """
+        Esquece a chave (ex.: original que não decodifica) e a marca como
+        "não encontrada" pelo tempo do cache negativo; depois disso a
+        próxima leitura busca de novo. O blob fica (pode ser de outra chave).
+        """
+        try:
+            self._ref_path(key).unlink()
+        except OSError:
+            pass
+        cache.set(self._missing_key(key), True, NEGATIVE_TTL)
+
+    def put(self, key, data, content_type):
+        """Grava o conteúdo (se ainda não existir) e aponta a chave para ele"""
+        digest = hashlib.sha256(data).hexdigest()
+        extension = mimetypes.guess_extension(content_type) or '.bin'
+        if extension == '.jpe':
+            extension = '.jpg'
+        relative_path = f"blobs/{digest[:2]}/{digest}{extension}"
+        path = self.root / relative_path
+        if not path.exists():
+            self._atomic_write(path, data)
+
+        ref = {'digest': digest, 'content_type': content_type, 'path': relative_path}
+        self._atomic_write(self._ref_path(key), json.dumps(ref).encode('utf-8'))
+        return self.get(key)
+
+    def prune(self, prefix, max_age):
+        """
+        Apaga as chaves `prefix/*` sem regravação há mais de `max_age`
+        segundos, junto com os blobs delas. Só para prefixos cujos blobs não
+        são compartilhados com outras chaves (ex.: atlases). Retorna quantas.
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        for ref_path in (self.root / 'refs' / prefix).glob('*.json'):
+            try:
+                if ref_path.stat().st_mtime >= cutoff:
+                    continue
+                ref = json.loads(ref_path.read_text())
+                ref_path.unlink()
+            except (OSError, ValueError):
+                continue
+            try:
+                (self.root / ref['path']).unlink()
+            except (OSError, KeyError):
+                pass
+            removed += 1
+        return removed
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Retorna a imagem da chave, buscando com `fetch()` (uma vez por chave,
+        via single-flight) se ainda não estiver em disco. `fetch` devolve
+        {'data', 'content_type'} ou None; "não encontrado" fica num cache
+        negativo curto.
+        """
+        stored = self.get(key)
+        if stored is not None:
+            return stored
+
+        missing_key = self._missing_key(key)
+        if cache.get(missing_key):
+            return None
+
+        def load():
+            image = fetch()
+            if image is None:
+                cache.set(missing_key, True, NEGATIVE_TTL)
+                return None
+            return self.put(key, image['data'], image['content_type'])
+
+        return single_flight.do(f"image_{key}", load, check=lambda: self.get(key))
+
+
+def download_image(image_urls):
+    """
+    Baixa a primeira URL disponível; retorna {'data', 'content_type'} ou
+    None se nenhuma existir (404/410 ou conteúdo que não é imagem). Erros de rede, 429 e 5xx são
+    propagados para não serem cacheados como "não encontrado".
+    """
+    error = None
+    for image_url in image_urls:
+        try:
+            img_response = upstream.get(image_url, timeout=(3.05, 8))
+        except CircuitOpenError:
+            raise
+        except requests.exceptions.RequestException as e:
+            error = e
+            continue
+        if img_response.status_code == 200:
+            # 200 com página de erro ou arquivo corrompido: como se a URL não existisse
+            if not is_valid_image(img_response.content):
+                logger.warning('Conteúdo de %s não é uma imagem válida', image_url)
+                continue
+            return {
+                'data': img_response.content,
+                'content_type': img_response.headers.get('Content-Type', 'image/jpeg'),
+            }
+        if img_response.status_code not in MISSING_STATUS:
+            error = requests.exceptions.HTTPError(
+                f'{img_response.status_code} ao baixar {image_url}', response=img_response
+            )
+    if error is not None:
+        raise error
+    return None
+
+
+def card_image_key(card_id):
+    return f"cards/{card_id}"
+
+
+def get_card_image(card_id, image_urls=None):
+    """
+    Imagem original da carta, baixando do YGOProDeck se preciso.
+    `image_urls` vem do catálogo quando a arte é conhecida.
+    """
+    # Sem catálogo, tenta os formatos de URL conhecidos
+    image_urls = image_urls or [
+        f"{YGOPRODECK_IMAGE_URL}/{card_id}.jpg",
+        f"{YGOPRODECK_IMAGE_URL}_small/{card_id}.jpg",
+    ]
+    return image_store.get_or_fetch(card_image_key(card_id), lambda: download_image(image_urls))
+
+
+def get_card_back_image():
+    return image_store.get_or_fetch("cards/back", lambda: download_image([YGOPRODECK_CARD_BACK_URL]))
+
+
+def serve_image(request, stored):
+    """
+    Resposta para uma imagem do store, com ETag/Last-Modified e 304 na
+    revalidação. Com IMAGE_STORE_ACCEL_PREFIX, quem envia o arquivo é o nginx.
+    """
+    response = get_conditional_response(
+        request, etag=stored.etag, last_modified=int(stored.modified)
+    )
+    if response is None:
+        accel_prefix = settings.IMAGE_STORE_ACCEL_PREFIX
+        if accel_prefix:
+            response = HttpResponse(content_type=stored.content_type)
+            response['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{stored.relative_path}"
+        else:
+            response = FileResponse(open(stored.path, 'rb'), content_type=stored.content_type)
+
+    response['ETag'] = stored.etag
+    response['Last-Modified'] = http_date(stored.modified)
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Cache-Control'] = f'public, max-age={IMAGE_MAX_AGE}'
+    return response
+
+
+image_store = ImageStore()
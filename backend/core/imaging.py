@@ -0,0 +1,198 @@
+"""
+Variantes redimensionadas/re-encodadas das imagens de cartas (Pillow).
+Geradas uma vez e guardadas no image store (ver core/images.py).
+
+Texturas do visualizador 3D: a imagem em dimensões potência de dois e toda a
+cadeia de mipmaps (até 1x1) num arquivo só, para o navegador não precisar
+redimensionar nem gerar mipmaps na thread principal:
+
+    MAGIC | tamanho do cabeçalho (u32) | cabeçalho JSON | níveis encodados
+
+O cabeçalho traz content_type e, por nível, width/height/offset/length
+(offset contado a partir do fim do cabeçalho).
+
+Atlas (sprite sheet): miniaturas de várias cartas numa imagem só, em grade,
+para uma página do catálogo baixar uma imagem em vez de dezenas.
+"""
+import json
+import math
+import struct
+from contextlib import contextmanager
+from io import BytesIO
+
+from PIL import Image
+
+# Largura alvo de cada preset (None = tamanho original)
+SIZE_PRESETS = {
+    'thumb': 160,
+    'medium': 320,
+    'full': None,
+}
+
+# format -> (formato do Pillow, content type, opções de encode)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+# Lado máximo da textura (nível 0); o padrão cabe bem em celular simples
+TEXTURE_SIZES = (256, 512, 1024)
+TEXTURE_DEFAULT_SIZE = 512
+MIPCHAIN_MAGIC = b'MIPCHN01'
+MIPCHAIN_CONTENT_TYPE = 'application/octet-stream'
+
+
+# Tamanho de cada miniatura do atlas (proporção de uma carta, 421 x 614)
+ATLAS_TILES = {
+    'thumb': (160, 233),
+    'medium': (320, 467),
+}
+# Fundo dos espaços vazios (bg-gray-900 do front)
+ATLAS_BACKGROUND = (17, 24, 39)
+
+
+class InvalidImageError(ValueError):
+    """O Pillow não conseguiu decodificar a imagem (corrompida, truncada ou não é imagem)"""
+
+
+@contextmanager
+def _decoding():
+    # UnidentifiedImageError e arquivo truncado são OSError; bomba de descompressão não
+    try:
+        yield
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e)) from e
+
+
+def is_valid_image(data):
+    """Confere só o cabeçalho/estrutura, sem decodificar os pixels"""
+    try:
+        with _decoding():
+            Image.open(BytesIO(data)).verify()
+    except InvalidImageError:
+        return False
+    return True
+
+
+def variant_key(card_id, size, fmt):
+    return f"variants/{card_id}/{size}-{fmt}"
+
+
+def texture_key(card_id, max_size, fmt):
+    return f"textures/{card_id}/{max_size}-{fmt}"
+
+
+def render_variant(data, size, fmt):
+    """
+    Redimensiona (mantendo a proporção) e re-encoda a imagem original.
+    Retorna {'data', 'content_type'} no formato usado pelo image store;
+    levanta InvalidImageError se o original não decodificar.
+    """
+    pil_format, content_type, options = FORMATS[fmt]
+    width = SIZE_PRESETS[size]
+
+    with _decoding():
+        image = Image.open(BytesIO(data))
+        if width and image.width > width:
+            height = round(image.height * width / image.width)
+            # Para JPEG, decodifica já em escala reduzida (bem mais barato)
+            image.draft('RGB', (width, height))
+            image = image.convert('RGB').resize((width, height), Image.LANCZOS)
+        else:
+            image = image.convert('RGB')
+
+    output = BytesIO()
+    image.save(output, pil_format, **options)
+    return {'data': output.getvalue(), 'content_type': content_type}
+
+
+def _power_of_two(value, limit):
+    """Potência de dois mais próxima (na escala log) de `value`, até `limit`"""
+    return min(limit, 2 ** max(0, round(math.log2(max(value, 1)))))
+
+
+def render_mipchain(data, max_size, fmt):
+    """
+    Textura potência de dois com todos os níveis de mipmap, cada um encodado
+    em `fmt`. Retorna {'data', 'content_type'} no formato do image store.
+    A proporção não é mantida: o UV do modelo cobre a textura inteira.
+    Levanta InvalidImageError se o original não decodificar.
+    """
+    pil_format, content_type, options = FORMATS[fmt]
+
+    with _decoding():
+        image = Image.open(BytesIO(data))
+        width = _power_of_two(image.width, max_size)
+        height = _power_of_two(image.height, max_size)
+        image.draft('RGB', (width, height))
+        level = image.convert('RGB').resize((width, height), Image.LANCZOS)
+
+    levels = []
+    blobs = []
+    offset = 0
+    while True:
+        output = BytesIO()
+        level.save(output, pil_format, **options)
+        blob = output.getvalue()
+        levels.append({'width': level.width, 'height': level.height, 'offset': offset, 'length': len(blob)})
+        blobs.append(blob)
+        offset += len(blob)
+        if level.width == 1 and level.height == 1:
+            break
+        # Cada nível sai do anterior (box filter 2x2), como o glGenerateMipmap
+        level = level.resize((max(1, level.width // 2), max(1, level.height // 2)), Image.BOX)
+
+    header = json.dumps({
+        'width': width, 'height': height, 'content_type': content_type, 'levels': levels,
+    }, separators=(',', ':')).encode('utf-8')
+    return {
+        'data': MIPCHAIN_MAGIC + struct.pack('<I', len(header)) + header + b''.join(blobs),
+        'content_type': MIPCHAIN_CONTENT_TYPE,
+    }
+
+
+def atlas_layout(count, size, columns):
+    """
+    Posição de cada miniatura na grade, na ordem dada.
+    Retorna (largura, altura, [(x, y)]) em px.
+    """
+    tile_width, tile_height = ATLAS_TILES[size]
+    columns = max(1, min(columns, count))
+    rows = -(-count // columns)
+    positions = [
+        ((i % columns) * tile_width, (i // columns) * tile_height) for i in range(count)
+    ]
+    return columns * tile_width, rows * tile_height, positions
+
+
+def render_atlas(images, size, fmt, columns):
+    """
+    Monta o atlas com as imagens originais (bytes) na ordem dada.
+    Retorna {'data', 'content_type'} no formato do image store e, em
+    `invalid`, os índices das que não decodificaram: essas ficam de fora e
+    as demais seguem a atlas_layout das válidas.
+    """
+    pil_format, content_type, options = FORMATS[fmt]
+    tile = ATLAS_TILES[size]
+
+    tiles = []
+    invalid = []
+    for i, data in enumerate(images):
+        try:
+            with _decoding():
+                image = Image.open(BytesIO(data))
+                # Para JPEG, decodifica já perto do tamanho da miniatura
+                image.draft('RGB', tile)
+                tiles.append(image.convert('RGB').resize(tile, Image.LANCZOS))
+        except InvalidImageError:
+            invalid.append(i)
+
+    width, height, positions = atlas_layout(max(len(tiles), 1), size, columns)
+    atlas = Image.new('RGB', (width, height), ATLAS_BACKGROUND)
+    for image, position in zip(tiles, positions):
+        atlas.paste(image, position)
+
+    output = BytesIO()
+    atlas.save(output, pil_format, **options)
+    return {'data': output.getvalue(), 'content_type': content_type, 'invalid': invalid}
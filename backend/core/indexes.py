@@ -0,0 +1,162 @@
+"""
+Índices em memória derivados do catálogo (um por worker).
+
+Cada índice é reconstruído quando a versão do catálogo muda. A versão fica
+no cache compartilhado e é incrementada por quem altera o catálogo
+(load_catalog, depois de regravar o snapshot); cada worker confere a versão no máximo a cada
+INDEX_CHECK_INTERVAL segundos. Enquanto uma nova versão é montada em
+background, as consultas continuam usando a anterior.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+
+from .filters import FilterEngine
+from .models import CardCatalog
+from .search import NameIndex
+from .setcodes import SetCodeIndex
+from .snapshot import CatalogSnapshot
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog_version'
+INDEX_CHECK_INTERVAL = 30
+
+
+def catalog_version():
+    return cache.get(CATALOG_VERSION_KEY, 0)
+
+
+def bump_catalog_version():
+    """Avisa todos os workers que o catálogo mudou"""
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+class CatalogIndex:
+    """
+    Guarda um índice montado por `builder()` e o mantém em dia com o catálogo
+    (ou com outra fonte, passando a função `version`).
+    """
+
+    def __init__(self, name, builder, version=None):
+        self.name = name
+        self.builder = builder
+        self.version = version or catalog_version
+        self._index = None
+        self._version = None
+        self._checked_at = 0
+        self._building = False
+        self._lock = threading.Lock()
+
+    def get(self, fresh=False):
+        """
+        fresh=True confere a versão agora e, se mudou, remonta antes de
+        retornar (usado por índices que dependem de outro índice).
+        """
+        now = time.monotonic()
+        if self._index is not None and not fresh and now - self._checked_at < INDEX_CHECK_INTERVAL:
+            return self._index
+
+        self._checked_at = now
+        version = self.version()
+        if self._index is None or (fresh and version != self._version):
+            # Primeira montagem: não há versão anterior para servir
+            with self._lock:
+                if self._index is None or (fresh and version != self._version):
+                    self._build(version)
+        elif version != self._version:
+            self._rebuild_in_background(version)
+        return self._index
+
+    def _build(self, version):
+        started = time.monotonic()
+        self._index = self.builder()
+        self._version = version
+        logger.info(
+            'Índice %s (versão %s) montado em %.0f ms',
+            self.name, version, (time.monotonic() - started) * 1000
+        )
+
+    def _rebuild_in_background(self, version):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+
+        def run():
+            try:
+                self._build(version)
+            except Exception:
+                logger.exception('Falha ao remontar o índice %s', self.name)
+            finally:
+                self._building = False
+                connections.close_all()
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def load_catalog_snapshot():
+    # Só um mmap: as páginas são compartilhadas entre os workers do host
+    return CatalogSnapshot.open()
+
+
+def build_name_index():
+    snapshot = catalog_snapshot.get(fresh=True)
+    if len(snapshot):
+        return NameIndex((record.id, record.name) for record in snapshot)
+    return NameIndex(CardCatalog.objects.order_by('id').values_list('id', 'name').iterator())
+
+
+def build_filter_engine():
+    snapshot = catalog_snapshot.get(fresh=True)
+    if len(snapshot):
+        rows = (
+            {
+                'id': record.id, 'type': record.type, 'attribute': record.attribute,
+                'race': record.race, 'archetype': record.archetype,
+                'atk': record.atk, 'def': record.defense, 'level': record.level,
+            }
+            for record in snapshot.by_name()
+        )
+        return FilterEngine(rows)
+
+    rows = CardCatalog.objects.order_by('name').values(
+        'id', 'type', 'attribute', 'race', 'archetype', 'atk', 'level', **{'def': F('defense')}
+    )
+    return FilterEngine(rows.iterator())
+
+
+def build_set_code_index():
+    snapshot = catalog_snapshot.get(fresh=True)
+    if len(snapshot):
+        return SetCodeIndex(record.data for record in snapshot)
+    return SetCodeIndex(CardCatalog.objects.values_list('data', flat=True).iterator())
+
+
+catalog_snapshot = CatalogIndex('snapshot', load_catalog_snapshot)
+name_index = CatalogIndex('nomes', build_name_index)
+filter_index = CatalogIndex('filtros', build_filter_engine)
+set_code_index = CatalogIndex('códigos', build_set_code_index)
+
+
+def warm_indexes(*extra):
+    """
+    Monta os índices na subida do worker, sem segurar a primeira requisição.
+    `extra`: outros CatalogIndex a aquecer depois dos do catálogo.
+    """
+    def run():
+        try:
+            for index in (catalog_snapshot, name_index, filter_index, set_code_index, *extra):
+                index.get()
+        except Exception:
+            logger.exception('Falha ao aquecer os índices do catálogo')
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
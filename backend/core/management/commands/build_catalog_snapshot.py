@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.catalog import export_snapshot
+from core.indexes import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Exporta o catálogo local para o snapshot binário compartilhado pelos workers (mmap)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Destino (padrão: CATALOG_SNAPSHOT_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.CATALOG_SNAPSHOT_PATH
+
+        started = time.monotonic()
+        total = export_snapshot(path)
+        if not total:
+            self.stdout.write('Catálogo local vazio; snapshot não gerado.')
+            return
+        bump_catalog_version()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot com {total} cartas gravado em {path} ({elapsed:.1f}s)'
+        ))
@@ -0,0 +1,38 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog import upsert_cards, export_snapshot
+from core.indexes import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Carrega o dump completo do cardinfo.php (JSON) no catálogo local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo JSON baixado de cardinfo.php')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Não foi possível ler o dump: {e}')
+
+        # Aceita tanto {"data": [...]} quanto a lista crua
+        cards = payload.get('data', []) if isinstance(payload, dict) else payload
+        if not cards:
+            raise CommandError('Dump vazio ou em formato desconhecido.')
+
+        started = time.monotonic()
+        total = upsert_cards(cards, batch_size=options['batch_size'])
+        # O snapshot precisa estar gravado antes de avisar os workers
+        export_snapshot()
+        bump_catalog_version()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} cartas carregadas em {elapsed:.1f}s'
+        ))
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import image_store, card_image_key, get_card_image
+from core.imaging import SIZE_PRESETS, FORMATS, InvalidImageError, variant_key, render_variant
+from core.models import CardCatalog
+from core.ratelimit import upstream_priority, BACKGROUND
+from market.models import CardListing, OrderItem
+
+# Itens de pedido que ainda aparecem para comprador/vendedor
+ACTIVE_ORDER_ITEM_STATUS = ['PENDING', 'PREPARING', 'SHIPPED', 'DELIVERED']
+
+
+class Command(BaseCommand):
+    help = 'Baixa em paralelo as imagens das cartas para o image store (aquece o cache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', choices=['listings', 'catalog'], default='listings',
+            help='listings: anúncios ativos e pedidos em andamento; catalog: catálogo local inteiro'
+        )
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--variants', nargs='*', default=[],
+            help='Variantes a pré-gerar, no formato size-fmt (ex.: thumb-webp medium-jpeg)'
+        )
+
+    def handle(self, *args, **options):
+        variants = []
+        for variant in options['variants']:
+            size, _, fmt = variant.partition('-')
+            if size not in SIZE_PRESETS or fmt not in FORMATS:
+                raise CommandError(f'Variante inválida: {variant}')
+            variants.append((size, fmt))
+
+        card_ids = self.collect_card_ids(options['source'])
+        total = len(card_ids)
+        if not total:
+            self.stdout.write('Nenhuma carta para baixar.')
+            return
+
+        stats = {'downloaded': 0, 'cached': 0, 'missing': 0, 'failed': 0, 'bytes': 0}
+        started = time.monotonic()
+        last_report = started
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(self.prefetch, card_id, variants): card_id for card_id in card_ids}
+            for done, future in enumerate(as_completed(futures), start=1):
+                # Erro inesperado numa carta (disco, imagem inválida...) não derruba as outras
+                try:
+                    result, size = future.result()
+                except Exception as e:
+                    self.stderr.write(f'Carta {futures[future]}: {e}')
+                    result, size = 'failed', 0
+                stats[result] += 1
+                stats['bytes'] += size
+
+                now = time.monotonic()
+                if now - last_report >= 2 or done == total:
+                    last_report = now
+                    self.report(done, total, stats, now - started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {stats['downloaded']} baixadas, {stats['cached']} já em cache, "
+            f"{stats['missing']} sem imagem, {stats['failed']} falhas"
+        ))
+
+    def collect_card_ids(self, source):
+        if source == 'catalog':
+            ids = CardCatalog.objects.values_list('id', flat=True)
+        else:
+            listing_ids = CardListing.objects.filter(status='ACTIVE').values_list('card_id', flat=True)
+            item_ids = OrderItem.objects.filter(
+                status__in=ACTIVE_ORDER_ITEM_STATUS
+            ).values_list('card_id', flat=True)
+            ids = set(listing_ids) | set(item_ids)
+        return sorted({str(card_id) for card_id in ids if str(card_id).isdigit()})
+
+    def prefetch(self, card_id, variants):
+        """Retorna (resultado, bytes baixados); seguro para rodar de novo"""
+        if image_store.exists(card_image_key(card_id)):
+            result = 'cached'
+            size = 0
+        else:
+            try:
+                # Thread do pool: a prioridade não vem do contexto de quem submeteu
+                with upstream_priority(BACKGROUND):
+                    stored = get_card_image(card_id)
+            except requests.exceptions.RequestException:
+                return 'failed', 0
+            if stored is None:
+                return 'missing', 0
+            result = 'downloaded'
+            size = stored.path.stat().st_size
+
+        original = image_store.get(card_image_key(card_id))
+        try:
+            for size_name, fmt in variants:
+                image_store.get_or_fetch(
+                    variant_key(card_id, size_name, fmt),
+                    lambda: render_variant(original.path.read_bytes(), size_name, fmt)
+                )
+        except InvalidImageError:
+            # Original corrompido: sai do store para ser baixado de novo
+            image_store.discard(card_image_key(card_id))
+            return 'failed', 0
+        return result, size
+
+    def report(self, done, total, stats, elapsed):
+        rate = done / elapsed if elapsed else 0
+        mb_per_s = stats['bytes'] / elapsed / 1_000_000 if elapsed else 0
+        self.stdout.write(
+            f"{done}/{total} ({done * 100 // total}%) - {rate:.1f} cartas/s, {mb_per_s:.2f} MB/s - "
+            f"{stats['downloaded']} baixadas, {stats['cached']} em cache, "
+            f"{stats['missing']} sem imagem, {stats['failed']} falhas"
+        )
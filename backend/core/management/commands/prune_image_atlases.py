@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.images import image_store, IMAGE_MAX_AGE
+
+# O mapa do atlas fica até IMAGE_MAX_AGE no cache; o arquivo precisa durar mais
+ATLAS_RETENTION = 2 * IMAGE_MAX_AGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga do image store os atlas de miniaturas não regerados há mais de '
+        '--max-age segundos (pode ir no cron junto com o sync_catalog)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=ATLAS_RETENTION)
+
+    def handle(self, *args, **options):
+        removed = image_store.prune('atlases', options['max_age'])
+        self.stdout.write(f'{removed} atlas removidos.')
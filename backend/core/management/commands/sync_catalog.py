@@ -0,0 +1,108 @@
+import time
+
+import requests
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.cache import catalog_cache
+from core.catalog import (
+    card_lookup_ids, diff_catalog, stored_lookup_ids, upsert_cards, delete_cards, export_snapshot,
+)
+from core.indexes import bump_catalog_version
+from core.models import CatalogSyncState
+from core.ratelimit import upstream_priority, BACKGROUND
+from core.upstream import upstream, YGOPRODECK_API_URL, YGOPRODECK_DB_VERSION_URL
+
+SYNC_LOCK_KEY = 'catalog_sync_lock'
+SYNC_LOCK_TIMEOUT = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        'Sincroniza o catálogo local com o YGOProDeck: só roda quando a versão do '
+        'banco deles muda e só regrava as cartas cujo conteúdo mudou (pode ir no cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Ignora a versão e compara tudo')
+        parser.add_argument('--dry-run', action='store_true', help='Só mostra o que mudaria')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Evita duas sincronizações ao mesmo tempo (cron + execução manual)
+        if not cache.add(SYNC_LOCK_KEY, True, SYNC_LOCK_TIMEOUT):
+            self.stdout.write('Outra sincronização está em andamento.')
+            return
+        try:
+            # Sync usa só a sobra do orçamento do upstream, atrás das requisições de usuário
+            with upstream_priority(BACKGROUND):
+                self.sync(options)
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+    def sync(self, options):
+        state = CatalogSyncState.current()
+        version, updated_at = self.upstream_version()
+        if version == state.database_version and not options['force']:
+            self.stdout.write(f'Catálogo já está na versão {version}.')
+            return
+
+        started = time.monotonic()
+        cards = self.download_catalog()
+        changed, removed = diff_catalog(cards)
+        self.stdout.write(
+            f'Versão {state.database_version or "-"} -> {version}: '
+            f'{len(changed)} cartas novas/alteradas, {len(removed)} removidas'
+        )
+        if options['dry_run']:
+            return
+
+        if changed or removed:
+            # Chaves das cartas afetadas, inclusive as das artes alternativas
+            # (de antes e de depois); as buscas mudam de chave com a versão
+            stale_ids = stored_lookup_ids(
+                [int(card['id']) for card in changed] + removed, batch_size=options['batch_size']
+            )
+            for card in changed:
+                stale_ids.update(card_lookup_ids(card))
+
+            upsert_cards(changed, batch_size=options['batch_size'])
+            delete_cards(removed, batch_size=options['batch_size'])
+            export_snapshot(cards=cards)
+
+            catalog_cache.delete_many(f"ygo_card_{card_id}" for card_id in sorted(stale_ids))
+            bump_catalog_version()
+
+        state.database_version = version
+        state.upstream_updated_at = updated_at
+        state.cards_changed = len(changed)
+        state.cards_removed = len(removed)
+        state.synced_at = timezone.now()
+        state.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Catálogo sincronizado na versão {version} em {time.monotonic() - started:.1f}s'
+        ))
+
+    def upstream_version(self):
+        """(database_version, last_update) do checkDBVer.php"""
+        try:
+            response = upstream.get(YGOPRODECK_DB_VERSION_URL)
+            response.raise_for_status()
+            info = response.json()[0]
+        except (requests.exceptions.RequestException, ValueError, LookupError) as e:
+            raise CommandError(f'Não foi possível consultar a versão do YGOProDeck: {e}')
+        return str(info.get('database_version', '')), str(info.get('last_update', ''))
+
+    def download_catalog(self):
+        # O YGOProDeck não tem endpoint de delta: baixa o dump e compara por hash
+        try:
+            response = upstream.get(YGOPRODECK_API_URL, timeout=(3.05, 120))
+            response.raise_for_status()
+            cards = response.json().get('data', [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise CommandError(f'Não foi possível baixar o catálogo: {e}')
+        if not cards:
+            raise CommandError('O YGOProDeck devolveu um catálogo vazio.')
+        return cards
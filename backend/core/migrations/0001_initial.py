@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardCatalog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('type', models.CharField(db_index=True, max_length=100)),
+                ('frame_type', models.CharField(blank=True, max_length=50)),
+                ('attribute', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('race', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('archetype', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('atk', models.IntegerField(blank=True, null=True)),
+                ('defense', models.IntegerField(blank=True, null=True)),
+                ('level', models.IntegerField(blank=True, null=True)),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Carta do Catálogo',
+                'verbose_name_plural': 'Catálogo de Cartas',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CardReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='card_references/')),
+                ('orb_features', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name'], name='core_cardre_name_07d2b4_idx')],
+            },
+        ),
+    ]
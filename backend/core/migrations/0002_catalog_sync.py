@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_version', models.CharField(blank=True, max_length=50)),
+                ('upstream_updated_at', models.CharField(blank=True, max_length=50)),
+                ('cards_changed', models.IntegerField(default=0)),
+                ('cards_removed', models.IntegerField(default=0)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Sincronização do Catálogo',
+                'verbose_name_plural': 'Sincronização do Catálogo',
+            },
+        ),
+        migrations.AddField(
+            model_name='cardcatalog',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
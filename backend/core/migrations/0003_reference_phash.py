@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_catalog_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardreference',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
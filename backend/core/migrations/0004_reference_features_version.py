@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_reference_phash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardreference',
+            name='features_image',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='cardreference',
+            name='features_version',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
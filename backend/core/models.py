@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 from django.db import models
 
 class CardReference(models.Model):
@@ -7,6 +10,11 @@ class CardReference(models.Model):
     # Campo para armazenar features extraídas (ORB descriptors) como array numpy serializado
     # BinaryField é eficiente para armazenar dados binários brutos
     orb_features = models.BinaryField(null=True, blank=True)
+    # pHash de 64 bits da imagem (guardado com sinal), pré-filtro do scanner
+    phash = models.BigIntegerField(null=True, blank=True)
+    # Imagem e updated_at de quando as features foram extraídas (extract_card_features)
+    features_image = models.CharField(max_length=255, blank=True)
+    features_version = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -18,3 +26,79 @@ class CardReference(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class CardCatalog(models.Model):
+    """
+    Espelho local do cardinfo.php do YGOProDeck.
+    O payload original fica em `data` (mesmo formato da API); as colunas
+    abaixo existem só para filtrar com índices.
+    """
+    id = models.BigIntegerField(primary_key=True)  # Passcode da carta
+    name = models.CharField(max_length=255, db_index=True)
+    type = models.CharField(max_length=100, db_index=True)
+    frame_type = models.CharField(max_length=50, blank=True)
+    attribute = models.CharField(max_length=20, blank=True, db_index=True)
+    race = models.CharField(max_length=100, blank=True, db_index=True)
+    archetype = models.CharField(max_length=255, blank=True, db_index=True)
+    atk = models.IntegerField(null=True, blank=True)
+    defense = models.IntegerField(null=True, blank=True)
+    level = models.IntegerField(null=True, blank=True)
+
+    data = models.JSONField()
+    # SHA-1 do JSON canônico da carta; a sincronização só regrava o que mudou
+    content_hash = models.CharField(max_length=40, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Carta do Catálogo'
+        verbose_name_plural = 'Catálogo de Cartas'
+
+    def __str__(self):
+        return f"{self.name} ({self.id})"
+
+    @classmethod
+    def from_api(cls, card):
+        """Monta uma instância a partir de um item do cardinfo.php"""
+        return cls(
+            id=int(card['id']),
+            name=card.get('name', ''),
+            type=card.get('type', ''),
+            frame_type=card.get('frameType', ''),
+            attribute=card.get('attribute', ''),
+            race=card.get('race', ''),
+            archetype=card.get('archetype', ''),
+            atk=card.get('atk'),
+            defense=card.get('def'),
+            level=card.get('level'),
+            data=card,
+            content_hash=cls.hash_card(card),
+        )
+
+    @staticmethod
+    def hash_card(card):
+        canonical = json.dumps(card, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class CatalogSyncState(models.Model):
+    """Versão do banco do YGOProDeck refletida no catálogo local (linha única)"""
+    database_version = models.CharField(max_length=50, blank=True)
+    upstream_updated_at = models.CharField(max_length=50, blank=True)
+    cards_changed = models.IntegerField(default=0)
+    cards_removed = models.IntegerField(default=0)
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Sincronização do Catálogo'
+        verbose_name_plural = 'Sincronização do Catálogo'
+
+    def __str__(self):
+        return f"Catálogo na versão {self.database_version or '-'}"
+
+    @classmethod
+    def current(cls):
+        state, _ = cls.objects.get_or_create(pk=1)
+        return state
@@ -0,0 +1,254 @@
+"""
+Orçamento de chamadas ao upstream, compartilhado entre workers e processos.
+
+- Balde por host, reabastecido a UPSTREAM_RATE_LIMIT chamadas por segundo.
+  O nível do balde vem de contadores por janela de 1 s no cache
+  compartilhado (cache.incr), com a janela anterior pesando pelo tempo que
+  falta (janela deslizante): todos os workers, comandos e threads gastam do
+  mesmo orçamento.
+- Duas prioridades. Interativa (requisições de usuário) usa o orçamento
+  inteiro; background (sync, warm-up de imagens, revalidação de cache) só o
+  que sobra acima de UPSTREAM_INTERACTIVE_RESERVE. No mesmo processo, quem
+  espera em background também cede a vez a qualquer interativa na fila.
+- Sem vaga, espera até o limite da prioridade e desiste (o UpstreamClient
+  levanta UpstreamThrottledError). Um 429 do upstream bloqueia o host para
+  todos pelo Retry-After.
+- Métricas (liberadas, esperas, tempo de espera, recusas) somam na memória
+  do processo e vão para o cache compartilhado em lote, a cada
+  METRICS_FLUSH_INTERVAL: o painel vê todos os workers com esse atraso.
+- Poucas operações no cache por chamada: um get_many (backoff + janela
+  anterior) e um incr. Quem espera vaga tenta de novo com intervalo
+  crescente, e o processo que sozinho já encheu a janela nem consulta o
+  cache até ela virar.
+
+O incr só é atômico entre processos no Redis; com cache em arquivo ou banco
+o limite vale por processo e, entre workers, é aproximado. No banco, todo
+set (e o incr, que é get + set) ainda faz o COUNT do cull: prefira Redis
+com vários workers.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+WINDOW_SECONDS = 1.0
+# Intervalo entre tentativas de quem está esperando vaga: começa em
+# POLL_INTERVAL e dobra a cada tentativa até MAX_POLL_INTERVAL
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.4
+# Bloqueio do host após um 429 sem Retry-After (s)
+DEFAULT_BACKOFF = 5
+MAX_BACKOFF = 120
+
+METRIC_FIELDS = ('granted', 'waited', 'wait_ms', 'throttled', 'upstream_429')
+# Intervalo (s) entre as gravações das métricas do processo no cache
+METRICS_FLUSH_INTERVAL = 10
+
+_priority = ContextVar('upstream_priority', default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def upstream_priority(priority):
+    """
+    Chamadas ao upstream dentro do bloco usam `priority`. Vale para o
+    contexto atual: threads novas começam como interativas e precisam
+    entrar no bloco de novo.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateScheduler:
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._lock = threading.Lock()
+        # Serializa os incr no processo (fora do Redis o incr é get + set)
+        self._counter_lock = threading.Lock()
+        # host -> (janela, chamadas liberadas neste processo nela)
+        self._granted_here = {}
+        # Métricas ainda não gravadas no cache
+        self._pending = self._empty_metrics()
+        self._last_flush = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def limit_for(self, priority):
+        rate = settings.UPSTREAM_RATE_LIMIT
+        if priority == INTERACTIVE:
+            return rate
+        return max(1, rate - settings.UPSTREAM_INTERACTIVE_RESERVE)
+
+    def max_wait_for(self, priority):
+        if priority == INTERACTIVE:
+            return settings.UPSTREAM_INTERACTIVE_MAX_WAIT
+        return settings.UPSTREAM_BACKGROUND_MAX_WAIT
+
+    def _window_keys(self, host, now):
+        window = int(now // WINDOW_SECONDS)
+        return f'upstream_rate_{host}_{window}', f'upstream_rate_{host}_{window - 1}'
+
+    def _try_acquire(self, host, limit):
+        """Reserva uma chamada se o balde tiver espaço até `limit`"""
+        with self._counter_lock:
+            return self._take(host, limit)
+
+    def _take(self, host, limit):
+        now = time.time()
+        window = int(now // WINDOW_SECONDS)
+        # Só este processo já encheu a janela: não adianta consultar o cache
+        granted_window, granted = self._granted_here.get(host, (None, 0))
+        if granted_window != window:
+            granted = 0
+        if granted >= limit:
+            return False
+
+        current_key, previous_key = self._window_keys(host, now)
+        backoff_key = f'upstream_backoff_{host}'
+        found = self.cache.get_many([backoff_key, previous_key])
+        if found.get(backoff_key):
+            return False
+        try:
+            count = self.cache.incr(current_key)
+        except ValueError:
+            # Primeira chamada da janela (ou a chave expirou)
+            if self.cache.add(current_key, 1, timeout=int(WINDOW_SECONDS * 3)):
+                count = 1
+            else:
+                count = self.cache.incr(current_key)
+        previous = found.get(previous_key) or 0
+        elapsed = (now % WINDOW_SECONDS) / WINDOW_SECONDS
+        if previous * (1 - elapsed) + count <= limit:
+            self._granted_here[host] = (window, granted + 1)
+            return True
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        return False
+
+    def _yield_to_interactive(self, priority):
+        return priority == BACKGROUND and self._waiting[INTERACTIVE] > 0
+
+    def acquire(self, host, priority=None):
+        """
+        Espera uma vaga no orçamento do host. Retorna o tempo de espera (s),
+        ou None se o limite de espera da prioridade acabou.
+        """
+        priority = priority or current_priority()
+        limit = self.limit_for(priority)
+        started = time.monotonic()
+        deadline = started + self.max_wait_for(priority)
+
+        if not self._yield_to_interactive(priority) and self._try_acquire(host, limit):
+            self._record(priority, granted=1)
+            return 0.0
+
+        with self._lock:
+            self._waiting[priority] += 1
+        try:
+            interval = POLL_INTERVAL
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record(priority, throttled=1)
+                    return None
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+                if not self._yield_to_interactive(priority) and self._try_acquire(host, limit):
+                    waited = time.monotonic() - started
+                    self._record(priority, granted=1, waited=1, wait_ms=round(waited * 1000))
+                    return waited
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+
+    def backoff(self, host, retry_after=None, priority=None):
+        """Upstream respondeu 429: ninguém chama o host por `retry_after` segundos"""
+        try:
+            seconds = int(retry_after)
+        except (TypeError, ValueError):
+            seconds = DEFAULT_BACKOFF
+        seconds = min(max(seconds, 1), MAX_BACKOFF)
+        self.cache.set(f'upstream_backoff_{host}', True, seconds)
+        self._record(priority or current_priority(), upstream_429=1)
+
+    @staticmethod
+    def _empty_metrics():
+        return {priority: dict.fromkeys(METRIC_FIELDS, 0) for priority in PRIORITIES}
+
+    def _record(self, priority, **values):
+        """Soma na memória; grava no cache a cada METRICS_FLUSH_INTERVAL"""
+        with self._lock:
+            for field, value in values.items():
+                self._pending[priority][field] += value
+            due = time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        """Grava no cache compartilhado as métricas acumuladas neste processo"""
+        with self._lock:
+            pending, self._pending = self._pending, self._empty_metrics()
+            self._last_flush = time.monotonic()
+        with self._counter_lock:
+            for priority, values in pending.items():
+                for field, value in values.items():
+                    if value:
+                        self._increment(f'upstream_metrics_{priority}_{field}', value)
+
+    def _increment(self, key, value):
+        try:
+            self.cache.incr(key, value)
+        except ValueError:
+            if not self.cache.add(key, value, timeout=None):
+                self.cache.incr(key, value)
+
+    def metrics(self):
+        """
+        Contadores acumulados (todos os workers, os outros com até
+        METRICS_FLUSH_INTERVAL de atraso) e filas deste processo
+        """
+        self.flush_metrics()
+        keys = [f'upstream_metrics_{p}_{field}' for p in PRIORITIES for field in METRIC_FIELDS]
+        found = self.cache.get_many(keys)
+        result = {}
+        for priority in PRIORITIES:
+            counters = {
+                field: found.get(f'upstream_metrics_{priority}_{field}', 0) for field in METRIC_FIELDS
+            }
+            counters['avg_wait_ms'] = (
+                round(counters['wait_ms'] / counters['waited'], 1) if counters['waited'] else 0.0
+            )
+            counters['waiting_in_process'] = self._waiting[priority]
+            counters['limit_per_second'] = self.limit_for(priority)
+            counters['max_wait_seconds'] = self.max_wait_for(priority)
+            result[priority] = counters
+        return result
+
+    def reset_metrics(self):
+        with self._lock:
+            self._pending = self._empty_metrics()
+        self.cache.delete_many(
+            [f'upstream_metrics_{p}_{field}' for p in PRIORITIES for field in METRIC_FIELDS]
+        )
+
+# Instância usada pelo UpstreamClient (core/upstream.py)
+scheduler = RateScheduler()
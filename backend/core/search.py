@@ -0,0 +1,112 @@
+"""
+Índice em memória dos nomes de cartas para autocomplete/busca fuzzy.
+
+- Prefixo: nomes e palavras ordenados, consultados com bisect.
+- Fuzzy: trigramas -> listas de postings (arrays NumPy); a similaridade
+  (Jaccard) de todos os nomes sai de um único np.bincount.
+
+Com ~13k cartas, uma consulta leva bem menos de 1 ms e não toca banco
+nem upstream.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+# Similaridade mínima para um resultado só-fuzzy entrar na lista
+MIN_FUZZY_SCORE = 0.2
+
+# Bônus somados ao Jaccard para ordenar os resultados
+EXACT_BOOST = 3.0
+PREFIX_BOOST = 2.0
+WORD_PREFIX_BOOST = 1.0
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """minúsculas, sem acentos e só letras/números separados por espaço"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _prefix_range(keys, prefix):
+    """Intervalo [start, end) de `keys` (ordenadas) que começam com `prefix`"""
+    start = bisect_left(keys, prefix)
+    end = bisect_left(keys, prefix + '\uffff', lo=start)
+    return start, end
+
+
+class NameIndex:
+
+    def __init__(self, entries):
+        """entries: iterável de (id, nome)"""
+        entries = list(entries)
+        self.ids = np.array([card_id for card_id, _ in entries], dtype=np.int64)
+        self.names = [name for _, name in entries]
+        normalized = [normalize(name) for name in self.names]
+
+        # Prefixo do nome inteiro
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        self._name_keys = [normalized[i] for i in order]
+        self._name_order = np.array(order, dtype=np.int32)
+
+        # Prefixo de qualquer palavra do nome
+        words = sorted(
+            (word, i) for i, name in enumerate(normalized) for word in set(name.split())
+        )
+        self._word_keys = [word for word, _ in words]
+        self._word_order = np.array([i for _, i in words], dtype=np.int32)
+
+        # Trigramas
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(normalized), dtype=np.float32)
+        for i, name in enumerate(normalized):
+            grams = trigrams(name)
+            gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = {gram: np.array(idx, dtype=np.int32) for gram, idx in postings.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query, limit=10):
+        """Retorna até `limit` (id, nome, score) ordenados por relevância"""
+        query = normalize(query)
+        if not query or not len(self):
+            return []
+
+        # Similaridade de trigramas para todos os nomes de uma vez
+        grams = trigrams(query)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        scores = np.zeros(len(self), dtype=np.float32)
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self)).astype(np.float32)
+            scores = shared / (len(grams) + self._gram_counts - shared)
+        scores[scores < MIN_FUZZY_SCORE] = 0
+
+        start, end = _prefix_range(self._name_keys, query)
+        scores[self._name_order[start:end]] += PREFIX_BOOST
+        if start < end and self._name_keys[start] == query:
+            scores[self._name_order[start]] += EXACT_BOOST
+
+        last_word = query.split()[-1]
+        start, end = _prefix_range(self._word_keys, last_word)
+        scores[np.unique(self._word_order[start:end])] += WORD_PREFIX_BOOST
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+
+        # Empate: nome mais curto primeiro
+        ranked = sorted(candidates, key=lambda i: (-scores[i], len(self.names[i])))
+        return [(int(self.ids[i]), self.names[i], round(float(scores[i]), 3)) for i in ranked]
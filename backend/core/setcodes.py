@@ -0,0 +1,90 @@
+"""
+Índice em memória de códigos de coleção e artes alternativas.
+
+- Código impresso (ex.: LOB-EN001) -> impressões (carta, coleção, raridade).
+  Também indexa o código sem a região (LOB-001), que é o que aparece em
+  várias tiragens e no que o scanner consegue ler.
+- ID de arte alternativa (card_images[].id) -> carta canônica + URLs da
+  imagem, para o proxy não precisar adivinhar nada no upstream.
+"""
+import re
+
+_SET_CODE = re.compile(r'^([A-Z0-9]+)-([A-Z]{0,2})(\d+)$')
+
+
+def normalize_set_code(code):
+    return re.sub(r'\s+', '', str(code or '')).upper()
+
+
+def regionless_code(code):
+    """LOB-EN001 -> LOB-001; None se o código não tiver região"""
+    match = _SET_CODE.match(code)
+    if not match or not match.group(2):
+        return None
+    return f"{match.group(1)}-{match.group(3)}"
+
+
+class SetCodeIndex:
+
+    def __init__(self, cards):
+        """cards: iterável de cartas no formato da API"""
+        self._printings = {}
+        self._regionless = {}
+        self._images = {}
+
+        for card in cards:
+            card_id = int(card['id'])
+            for card_set in card.get('card_sets') or []:
+                code = normalize_set_code(card_set.get('set_code'))
+                if not code:
+                    continue
+                printing = {
+                    'id': card_id,
+                    'set_code': code,
+                    'set_name': card_set.get('set_name'),
+                    'set_rarity': card_set.get('set_rarity'),
+                    'set_rarity_code': card_set.get('set_rarity_code'),
+                }
+                self._printings.setdefault(code, []).append(printing)
+                short = regionless_code(code)
+                if short:
+                    self._regionless.setdefault(short, []).append(printing)
+
+            for image in card.get('card_images') or []:
+                if image.get('id') is None:
+                    continue
+                self._images[int(image['id'])] = {
+                    'card_id': card_id,
+                    'image_url': image.get('image_url'),
+                    'image_url_small': image.get('image_url_small'),
+                }
+
+    def __len__(self):
+        return len(self._images)
+
+    def printings(self, code, rarity=None):
+        """
+        Impressões com esse código (com ou sem região). `rarity` filtra pelo
+        nome ou pelo código da raridade (Ultra Rare, UR, (UR)).
+        """
+        code = normalize_set_code(code)
+        found = self._printings.get(code) or self._regionless.get(regionless_code(code) or code, [])
+        if rarity:
+            wanted = rarity.strip().lower().strip('()')
+            found = [
+                printing for printing in found
+                if wanted in (
+                    (printing['set_rarity'] or '').lower(),
+                    (printing['set_rarity_code'] or '').lower().strip('()'),
+                )
+            ]
+        return found
+
+    def image(self, image_id):
+        """{'card_id', 'image_url', 'image_url_small'} da arte, ou None"""
+        return self._images.get(int(image_id))
+
+    def canonical_id(self, image_id):
+        """Passcode da carta dona da arte (ele mesmo para a arte principal)"""
+        image = self._images.get(int(image_id))
+        return image['card_id'] if image else None
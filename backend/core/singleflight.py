@@ -0,0 +1,100 @@
+"""
+Single-flight: para uma mesma chave, só um chamador vai ao upstream e os
+demais esperam o resultado dele.
+
+- Dentro do processo: os concorrentes aguardam a chamada em andamento.
+- Entre workers: um lock curto no cache compartilhado (cache.add) elege quem
+  busca; os outros ficam consultando o cache até o resultado ser publicado.
+  O add só é exclusivo entre processos no Redis e no banco; com cache em
+  arquivo dois workers podem buscar a mesma chave (só custa uma chamada a mais).
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self, alias='default', lock_timeout=15, wait_timeout=15, poll_interval=0.05):
+        self.alias = alias
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, check=None, wait=True):
+        """
+        Executa `fn()` uma única vez por chave e devolve o resultado a todos.
+        `check()` lê o resultado já publicado no cache (ou None) e é usado
+        para aproveitar a busca feita por outro worker.
+        Com wait=False, desiste (retorna None) se a chave já está sendo
+        buscada em outro lugar; útil para refresh em background.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not wait:
+                return None
+            if not call.event.wait(self.wait_timeout):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn, check, wait)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _do_shared(self, key, fn, check, wait):
+        shared = caches[self.alias]
+        lock_key = f"singleflight_{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        # Outro worker está buscando: espera o resultado aparecer no cache.
+        # Se o lock sumir sem resultado (erro/not found), tentamos nós mesmos.
+        while not shared.add(lock_key, token, self.lock_timeout):
+            if not wait:
+                return None
+            if check is not None:
+                value = check()
+                if value is not None:
+                    return value
+            if time.monotonic() >= deadline:
+                return fn()
+            time.sleep(self.poll_interval)
+
+        try:
+            # Pode ter sido publicado entre o nosso miss e o lock
+            if check is not None:
+                value = check()
+                if value is not None:
+                    return value
+            return fn()
+        finally:
+            if shared.get(lock_key) == token:
+                shared.delete(lock_key)
+
+
+single_flight = SingleFlight()
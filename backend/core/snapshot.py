@@ -0,0 +1,233 @@
+"""
+Snapshot binário e compacto do catálogo, compartilhado entre workers via mmap.
+
+    MAGIC | tamanho do cabeçalho (u32) | cabeçalho JSON | colunas (alinhadas em 8 bytes)
+
+- Colunas de largura fixa (NumPy), uma posição por carta, ordenadas por ID.
+- Strings (nome, tipo, raça, ...) internadas numa tabela única; as colunas
+  guardam só o índice (-1 = vazio).
+- O JSON completo de cada carta fica num blob, com uma coluna de offsets.
+
+Abrir o snapshot é um mmap e a leitura do cabeçalho (milissegundos). As
+páginas ficam no page cache do sistema, contadas uma vez por host e não uma
+vez por worker. As leituras passam por CardRecord (com __slots__), que só
+decodifica o campo pedido.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b'CARDSNP1'
+NULL_INT = np.iinfo(np.int32).min
+# Permissão do arquivo gravado (mkstemp cria com 0600)
+FILE_MODE = 0o644
+
+STRING_FIELDS = ('name', 'type', 'frame_type', 'attribute', 'race', 'archetype')
+INT_FIELDS = ('atk', 'defense', 'level')
+
+
+def _align(size):
+    return -(-size // 8) * 8
+
+
+def write_snapshot(rows, path=None):
+    """
+    Grava o snapshot de forma atômica. `rows`: dicts com id, os campos de
+    STRING_FIELDS/INT_FIELDS e `data` (a carta no formato da API).
+    Retorna o número de cartas gravadas.
+    """
+    path = Path(path or settings.CATALOG_SNAPSHOT_PATH)
+    rows = sorted(rows, key=lambda row: row['id'])
+
+    strings = {}
+
+    def intern(value):
+        if not value:
+            return -1
+        ref = strings.get(value)
+        if ref is None:
+            ref = strings[value] = len(strings)
+        return ref
+
+    data_offsets = [0]
+    blobs = []
+    for row in rows:
+        blob = json.dumps(row['data'], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        blobs.append(blob)
+        data_offsets.append(data_offsets[-1] + len(blob))
+
+    columns = {
+        'id': np.array([row['id'] for row in rows], dtype=np.int64),
+        'data_offsets': np.array(data_offsets, dtype=np.int64),
+        'data': np.frombuffer(b''.join(blobs), dtype=np.uint8),
+        # Posições ordenadas pelo nome (ordem padrão das buscas)
+        'name_order': np.array(
+            sorted(range(len(rows)), key=lambda i: rows[i]['name']), dtype=np.int32
+        ),
+    }
+    for field in STRING_FIELDS:
+        columns[field] = np.array([intern(row.get(field)) for row in rows], dtype=np.int32)
+    for field in INT_FIELDS:
+        columns[field] = np.array(
+            [NULL_INT if row.get(field) is None else row[field] for row in rows], dtype=np.int32
+        )
+
+    encoded = [value.encode('utf-8') for value in strings]
+    columns['string_offsets'] = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+    columns['strings'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'count': len(rows), 'columns': layout}).encode('utf-8')
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        # Lido por outros processos, possivelmente de outro usuário (ex.: sync no cron como root)
+        os.fchmod(fd, FILE_MODE)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            f.write(b'\0' * (_align(f.tell()) - f.tell()))
+            base = f.tell()
+            for name, array in columns.items():
+                f.write(b'\0' * (base + layout[name][1] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(rows)
+
+
+def _string_property(field):
+    def getter(self):
+        return self._snapshot.string(self._snapshot.columns[field][self._pos])
+    return property(getter)
+
+
+def _int_property(field):
+    def getter(self):
+        value = int(self._snapshot.columns[field][self._pos])
+        return None if value == NULL_INT else value
+    return property(getter)
+
+
+class CardRecord:
+    """Visão leve de uma carta do snapshot; nada é copiado até ser lido"""
+
+    __slots__ = ('_snapshot', '_pos')
+
+    def __init__(self, snapshot, pos):
+        self._snapshot = snapshot
+        self._pos = pos
+
+    @property
+    def id(self):
+        return int(self._snapshot.columns['id'][self._pos])
+
+    name = _string_property('name')
+    type = _string_property('type')
+    frame_type = _string_property('frame_type')
+    attribute = _string_property('attribute')
+    race = _string_property('race')
+    archetype = _string_property('archetype')
+    atk = _int_property('atk')
+    defense = _int_property('defense')
+    level = _int_property('level')
+
+    @property
+    def data(self):
+        """A carta completa no formato da API"""
+        return self._snapshot.card_data(self._pos)
+
+    def __repr__(self):
+        return f'<CardRecord {self.id} {self.name!r}>'
+
+
+class CatalogSnapshot:
+
+    def __init__(self, buffer=None):
+        """Sem `buffer`, um snapshot vazio (catálogo ainda não exportado)"""
+        self._buffer = buffer
+        self.columns = {}
+        self.size = 0
+        if buffer is None:
+            return
+
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError('Arquivo não é um snapshot do catálogo')
+        (header_size,) = struct.unpack_from('<I', buffer, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(buffer[header_start:header_start + header_size]))
+        base = _align(header_start + header_size)
+
+        self.size = header['count']
+        for name, (dtype, offset, count) in header['columns'].items():
+            self.columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=base + offset)
+
+    @classmethod
+    def open(cls, path=None):
+        """Mapeia o arquivo (somente leitura); snapshot vazio se ele não existir"""
+        path = Path(path or settings.CATALOG_SNAPSHOT_PATH)
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return cls()
+        return cls(buffer)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """Cartas na ordem do ID"""
+        return (CardRecord(self, pos) for pos in range(self.size))
+
+    def by_name(self):
+        """Cartas na ordem do nome"""
+        if not self.size:
+            return iter(())
+        return (CardRecord(self, int(pos)) for pos in self.columns['name_order'])
+
+    def string(self, ref):
+        if ref < 0:
+            return None
+        offsets = self.columns['string_offsets']
+        return self.columns['strings'][offsets[ref]:offsets[ref + 1]].tobytes().decode('utf-8')
+
+    def card_data(self, pos):
+        offsets = self.columns['data_offsets']
+        return json.loads(self.columns['data'][offsets[pos]:offsets[pos + 1]].tobytes())
+
+    def get(self, card_id):
+        """CardRecord da carta ou None"""
+        if not self.size:
+            return None
+        ids = self.columns['id']
+        pos = int(np.searchsorted(ids, card_id))
+        if pos < self.size and ids[pos] == card_id:
+            return CardRecord(self, pos)
+        return None
+
+    def get_many(self, card_ids):
+        """{id: CardRecord} para os IDs encontrados"""
+        if not self.size or not card_ids:
+            return {}
+        ids = self.columns['id']
+        wanted = np.asarray(card_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(ids, wanted), self.size - 1)
+        found = ids[positions] == wanted
+        return {
+            int(card_id): CardRecord(self, int(pos))
+            for card_id, pos in zip(wanted[found], positions[found])
+        }
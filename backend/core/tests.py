@@ -1,3 +1,497 @@
-from django.test import TestCase
+import os
+import stat
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from PIL import Image
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .cache import catalog_cache, make_entry
+from .catalog import search_catalog
+from .filters import FilterEngine
+from .images import ImageStore, FILE_MODE, download_image
+from .imaging import InvalidImageError, render_atlas, render_variant
+from .models import CardCatalog
+from .ratelimit import RateScheduler, BACKGROUND, INTERACTIVE, METRICS_FLUSH_INTERVAL
+from .snapshot import (
+    FILE_MODE as SNAPSHOT_FILE_MODE, INT_FIELDS, STRING_FIELDS, CatalogSnapshot, write_snapshot,
+)
+from .upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def _jpeg(size=(42, 61)):
+    output = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImageStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ImageStore(self.tmp.name)
+
+    def test_stored_files_are_world_readable(self):
+        stored = self.store.put('cards/1', b'\xff\xd8jpeg', 'image/jpeg')
+        self.assertEqual(stat.S_IMODE(stored.path.stat().st_mode), FILE_MODE)
+        ref_path = self.store._ref_path('cards/1')
+        self.assertEqual(stat.S_IMODE(ref_path.stat().st_mode), FILE_MODE)
+
+    def test_prune_removes_old_keys_and_their_blobs(self):
+        old = self.store.put('atlases/old', b'old-atlas', 'image/webp')
+        new = self.store.put('atlases/new', b'new-atlas', 'image/webp')
+        past = time.time() - 3600
+        os.utime(self.store._ref_path('atlases/old'), (past, past))
+
+        self.assertEqual(self.store.prune('atlases', 60), 1)
+        self.assertIsNone(self.store.get('atlases/old'))
+        self.assertFalse(old.path.exists())
+        self.assertTrue(new.path.exists())
+
+    def test_upstream_errors_are_not_negative_cached(self):
+        fetch = mock.Mock(side_effect=requests.exceptions.HTTPError('503'))
+        cache.delete('image_missing_cards_2')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.store.get_or_fetch('cards/2', fetch)
+        self.assertIsNone(cache.get('image_missing_cards_2'))
+
+        fetch = mock.Mock(return_value=None)
+        self.assertIsNone(self.store.get_or_fetch('cards/2', fetch))
+        self.assertTrue(cache.get('image_missing_cards_2'))
+        cache.delete('image_missing_cards_2')
+
+
+class DownloadImageTests(SimpleTestCase):
+
+    def _response(self, status_code, content=None):
+        return mock.Mock(
+            status_code=status_code, content=content or _jpeg(), headers={'Content-Type': 'image/jpeg'}
+        )
+
+    @mock.patch('core.images.upstream')
+    def test_only_404_and_410_mean_missing(self, upstream):
+        upstream.get.side_effect = [self._response(404), self._response(410)]
+        self.assertIsNone(download_image(['a', 'b']))
+
+        for status_code in (429, 500, 503):
+            upstream.get.side_effect = [self._response(status_code)]
+            with self.assertRaises(requests.exceptions.HTTPError):
+                download_image(['a'])
+
+    @mock.patch('core.images.upstream')
+    def test_falls_back_to_next_url(self, upstream):
+        upstream.get.side_effect = [self._response(503), self._response(200)]
+        self.assertEqual(download_image(['a', 'b'])['data'], _jpeg())
+
+    @mock.patch('core.images.upstream')
+    def test_non_image_body_counts_as_missing(self, upstream):
+        upstream.get.side_effect = [self._response(200, b'<html>erro</html>'), self._response(404)]
+        self.assertIsNone(download_image(['a', 'b']))
+
+        upstream.get.side_effect = [self._response(200, b'<html>erro</html>'), self._response(200)]
+        self.assertEqual(download_image(['a', 'b'])['data'], _jpeg())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class InvalidOriginalTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ImageStore(self.tmp.name)
+        patcher = mock.patch('core.views.image_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_render_raises_invalid_image(self):
+        with self.assertRaises(InvalidImageError):
+            render_variant(_jpeg()[:200], 'thumb', 'webp')
+        atlas = render_atlas([_jpeg(), b'lixo', _jpeg()], 'thumb', 'webp', 10)
+        self.assertEqual(atlas['invalid'], [1])
+
+    @mock.patch('core.views._original_card_image')
+    def test_corrupt_original_is_discarded(self, original_card_image):
+        original_card_image.return_value = self.store.put('cards/7', b'nao e imagem', 'image/jpeg')
+        response = self.client.get('/api/core/images/7/', {'size': 'thumb', 'fmt': 'webp'})
+        self.assertEqual(response.status_code, 502)
+        self.assertIsNone(self.store.get('cards/7'))
+        self.assertIsNone(self.store.get_or_fetch('cards/7', mock.Mock(side_effect=AssertionError)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CardsBatchTests(SimpleTestCase):
+
+    def test_non_object_body_is_rejected(self):
+        for body in ([1, 2, 3], 'ids', 5):
+            response = self.client.post('/api/core/cards/batch/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    @mock.patch('core.views._fetch_cards')
+    @mock.patch('core.views.refresh_in_background')
+    def test_stale_entries_are_served_and_revalidated(self, refresh, fetch_cards):
+        catalog_cache.set_many({
+            'ygo_card_101': {'value': {'data': [{'id': 101, 'name': 'Velha'}]}, 'fresh_until': time.time() - 1},
+            'ygo_card_102': {'value': {'data': [{'id': 102, 'name': 'Fresca'}]}, 'fresh_until': time.time() + 60},
+        }, 60)
+        response = self.client.get('/api/core/cards/batch/', {'ids': '101,102'})
+        self.assertEqual([card['name'] for card in response.json()['data']], ['Velha', 'Fresca'])
+        fetch_cards.assert_not_called()
+        refresh.assert_called_once()
+
+        # A revalidação busca só as velhas e regrava o cache
+        fetch_cards.return_value = {101: {'id': 101, 'name': 'Nova'}}
+        refresh.call_args[0][1]()
+        fetch_cards.assert_called_once_with([101])
+        entry = catalog_cache.get('ygo_card_101')
+        self.assertEqual(entry['value']['data'][0]['name'], 'Nova')
+        self.assertGreater(entry['fresh_until'], time.time())
+
+
+class UpstreamRetryTests(SimpleTestCase):
+
+    def _response(self, status_code):
+        return mock.Mock(status_code=status_code, headers={})
+
+    @mock.patch('core.upstream.time.sleep')
+    @mock.patch('core.upstream.scheduler')
+    def test_each_status_retry_takes_budget(self, scheduler, sleep):
+        scheduler.acquire.return_value = 0.0
+        client = UpstreamClient(retries=2)
+        client.session = mock.Mock()
+        client.session.get.side_effect = [self._response(503), self._response(502), self._response(200)]
+        self.assertEqual(client.get('https://example.test/x').status_code, 200)
+        self.assertEqual(client.session.get.call_count, 3)
+        self.assertEqual(scheduler.acquire.call_count, 3)
+
+    @mock.patch('core.upstream.time.sleep')
+    @mock.patch('core.upstream.scheduler')
+    def test_retry_without_budget_returns_last_response(self, scheduler, sleep):
+        scheduler.acquire.side_effect = [0.0, None]
+        client = UpstreamClient(retries=2)
+        client.session = mock.Mock()
+        client.session.get.return_value = self._response(503)
+        self.assertEqual(client.get('https://example.test/x').status_code, 503)
+        self.assertEqual(client.session.get.call_count, 1)
+
+
+def _catalog_card(card_id, name, card_type, attribute='', race='', archetype='', atk=None, level=None):
+    card = {'id': card_id, 'name': name, 'type': card_type, 'race': race}
+    if attribute:
+        card.update(attribute=attribute, atk=atk, level=level)
+    if archetype:
+        card['archetype'] = archetype
+    return card
+
+
+CATALOG_CARDS = [
+    _catalog_card(1, 'Blue-Eyes White Dragon', 'Normal Monster', 'LIGHT', 'Dragon', 'Blue-Eyes', 3000, 8),
+    _catalog_card(2, 'Dark Magician', 'Normal Monster', 'DARK', 'Spellcaster', 'Dark Magician', 2500, 7),
+    _catalog_card(3, 'Dragon Ravine', 'Spell Card', race='Field'),
+    _catalog_card(4, 'Pot of Greed', 'Spell Card', race='Normal'),
+    _catalog_card(5, 'Mirror Force', 'Trap Card', race='Normal'),
+    _catalog_card(6, 'Red-Eyes Black Dragon', 'Normal Monster', 'DARK', 'Dragon', 'Red-Eyes', 2400, 7),
+]
+
+
+class CatalogSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CardCatalog.objects.bulk_create([CardCatalog.from_api(card) for card in CATALOG_CARDS])
+        rows = CardCatalog.objects.order_by('name').values(
+            'id', 'type', 'attribute', 'race', 'archetype', 'atk', 'level', **{'def': F('defense')}
+        )
+        cls.engine = FilterEngine(rows)
+
+    def _db_ids(self, params, ranges=None):
+        cards, total = search_catalog(params, ranges=ranges)
+        self.assertEqual(total, len(cards))
+        return [card['id'] for card in cards]
+
+    def test_categorical_filters_ignore_case_in_both_paths(self):
+        for params in ({'type': 'spell card'}, {'type': 'SPELL CARD'}, {'attribute': 'dark'},
+                       {'race': 'DRAGON', 'attribute': 'Light'}, {'archetype': 'red-eyes'}):
+            engine_ids, total = self.engine.query(params)
+            self.assertTrue(total, params)
+            self.assertEqual(self._db_ids(params), engine_ids, params)
+
+    def test_name_search_matches_engine_results(self):
+        engine_ids, _ = self.engine.query({'type': 'normal monster'}, {'atk': (2400, None)})
+        dragons = [card['id'] for card in CATALOG_CARDS if 'dragon' in card['name'].lower()]
+        expected = [card_id for card_id in engine_ids if card_id in dragons]
+        self.assertEqual(
+            self._db_ids({'type': 'normal monster', 'fname': 'dragon'}, {'atk': (2400, None)}), expected
+        )
+        self.assertEqual(self._db_ids({'type': 'spell card', 'fname': 'dragon'}), [3])
+
+    def test_engine_lists_and_pagination(self):
+        ids, total = self.engine.query({'type': ['spell card', 'trap card']})
+        self.assertEqual((ids, total), ([3, 5, 4], 3))
+        self.assertEqual(self.engine.query({'type': ['spell card', 'trap card']}, num=2, offset=1), ([5, 4], 3))
+        self.assertEqual(self.engine.query({'type': 'ritual monster'}), ([], 0))
+        self.assertEqual(self.engine.query({'race': 'dragon'}, {'atk': (3000, None)}), ([1], 1))
+
+    def test_numeric_ranges(self):
+        engine_ids, total = self.engine.query({}, {'level': (7, 7)})
+        self.assertEqual(set(engine_ids), {2, 6})
+        self.assertEqual(total, 2)
+        engine_ids, _ = self.engine.query({'attribute': 'dark'}, {'atk': (None, 2400)}, num=1)
+        self.assertEqual(engine_ids, [6])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncCatalogTests(TestCase):
+
+    def _card(self, card_id, name, image_ids):
+        return {**_catalog_card(card_id, name, 'Spell Card'), 'card_images': [{'id': i} for i in image_ids]}
+
+    def test_invalidates_alternate_art_keys(self):
+        CardCatalog.objects.bulk_create([
+            CardCatalog.from_api(self._card(10, 'Antiga', [10, 11])),
+            CardCatalog.from_api(self._card(20, 'Removida', [20, 21])),
+            CardCatalog.from_api(self._card(30, 'Igual', [30, 31])),
+        ])
+        keys = [f'ygo_card_{card_id}' for card_id in (10, 11, 12, 20, 21, 30, 31)]
+        catalog_cache.set_many({key: make_entry(None, 60)[0] for key in keys}, 60)
+
+        version = mock.Mock(status_code=200)
+        version.json.return_value = [{'database_version': '2', 'last_update': 'hoje'}]
+        dump = mock.Mock(status_code=200)
+        dump.json.return_value = {'data': [self._card(10, 'Nova', [10, 12]), self._card(30, 'Igual', [30, 31])]}
+        with tempfile.TemporaryDirectory() as root, \
+                override_settings(CATALOG_SNAPSHOT_PATH=os.path.join(root, 'catalog.snapshot')), \
+                mock.patch('core.management.commands.sync_catalog.upstream') as upstream:
+            upstream.get.side_effect = [version, dump]
+            call_command('sync_catalog', stdout=mock.Mock())
+
+        remaining = catalog_cache.get_many(keys)
+        self.assertEqual(sorted(remaining), ['ygo_card_30', 'ygo_card_31'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PrefetchCardImagesTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ImageStore(self.tmp.name)
+        patcher = mock.patch('core.management.commands.prefetch_card_images.image_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('core.management.commands.prefetch_card_images.get_card_image')
+    def test_unexpected_error_counts_as_failure(self, get_card_image):
+        CardCatalog.objects.bulk_create([CardCatalog.from_api(card) for card in CATALOG_CARDS[:3]])
+
+        def fetch(card_id):
+            if card_id == '2':
+                raise ValueError('disco cheio')
+            return self.store.put(f'cards/{card_id}', _jpeg(), 'image/jpeg')
+
+        get_card_image.side_effect = fetch
+        stdout, stderr = StringIO(), StringIO()
+        call_command('prefetch_card_images', '--source', 'catalog', stdout=stdout, stderr=stderr)
+        self.assertIn('2 baixadas', stdout.getvalue())
+        self.assertIn('1 falhas', stdout.getvalue())
+        self.assertIn('Carta 2: disco cheio', stderr.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateSchedulerMetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.scheduler = RateScheduler()
+        self.scheduler.reset_metrics()
+        self.addCleanup(cache.clear)
+
+    def test_metrics_are_batched_in_process(self):
+        with mock.patch.object(self.scheduler, '_increment') as increment:
+            for _ in range(50):
+                self.scheduler._record(INTERACTIVE, granted=1)
+            increment.assert_not_called()
+        self.assertIsNone(cache.get('upstream_metrics_interactive_granted'))
+
+        # metrics() grava o que está pendente antes de ler
+        self.assertEqual(self.scheduler.metrics()[INTERACTIVE]['granted'], 50)
+        self.assertEqual(cache.get('upstream_metrics_interactive_granted'), 50)
+
+    def test_flush_after_interval(self):
+        self.scheduler._last_flush -= METRICS_FLUSH_INTERVAL
+        self.scheduler._record(BACKGROUND, throttled=1)
+        self.assertEqual(cache.get('upstream_metrics_background_throttled'), 1)
+
+
+class SnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'catalog.snapshot')
+
+    def _rows(self, cards):
+        rows = []
+        for card in cards:
+            instance = CardCatalog.from_api(card)
+            row = {field: getattr(instance, field) for field in STRING_FIELDS + INT_FIELDS}
+            rows.append({**row, 'id': instance.id, 'data': card})
+        return rows
+
+    def test_round_trip(self):
+        self.assertEqual(write_snapshot(self._rows(CATALOG_CARDS), self.path), len(CATALOG_CARDS))
+        snapshot = CatalogSnapshot.open(self.path)
+
+        self.assertEqual(len(snapshot), len(CATALOG_CARDS))
+        self.assertEqual([record.id for record in snapshot], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(
+            [record.name for record in snapshot.by_name()],
+            sorted(card['name'] for card in CATALOG_CARDS)
+        )
+        record = snapshot.get(6)
+        self.assertEqual(
+            (record.name, record.attribute, record.atk, record.level), ('Red-Eyes Black Dragon', 'DARK', 2400, 7)
+        )
+        self.assertEqual(record.data, CATALOG_CARDS[5])
+        # Campos vazios voltam como None
+        spell = snapshot.get(3)
+        self.assertIsNone(spell.atk)
+        self.assertIsNone(spell.archetype)
+
+        self.assertIsNone(snapshot.get(99))
+        self.assertEqual(sorted(snapshot.get_many([99, 5, 1])), [1, 5])
+
+    def test_missing_file_is_empty(self):
+        snapshot = CatalogSnapshot.open(self.path)
+        self.assertEqual(len(snapshot), 0)
+        self.assertIsNone(snapshot.get(1))
+        self.assertEqual(snapshot.get_many([1]), {})
+
+    def test_snapshot_is_world_readable(self):
+        write_snapshot(self._rows(CATALOG_CARDS), self.path)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), SNAPSHOT_FILE_MODE)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('core.upstream.time.monotonic', return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(window_seconds=30, min_requests=4, failure_rate=0.5, open_seconds=10)
+
+    def _open(self):
+        for _ in range(2):
+            self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure()
+
+    def test_opens_only_with_enough_requests_and_failures(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+    def test_old_results_leave_the_window(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.return_value = 131.0
+        for _ in range(3):
+            self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_probe_closes_on_success(self):
+        self._open()
+        self.clock.return_value = 110.0
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.breaker.before_request()
+        # Só uma chamada de teste por vez
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.before_request()
+
+    def test_half_open_probe_failure_reopens(self):
+        self._open()
+        self.clock.return_value = 110.0
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.return_value = 119.0
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+    def test_released_probe_lets_another_through(self):
+        self._open()
+        self.clock.return_value = 110.0
+        self.breaker.before_request()
+        self.breaker.release_probe()
+        self.breaker.before_request()
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, UPSTREAM_RATE_LIMIT=4, UPSTREAM_INTERACTIVE_RESERVE=2,
+    UPSTREAM_INTERACTIVE_MAX_WAIT=0.05, UPSTREAM_BACKGROUND_MAX_WAIT=0.05,
+)
+class RateSchedulerTests(SimpleTestCase):
+
+    host = 'example.test'
+
+    def setUp(self):
+        self.scheduler = RateScheduler()
+        self.addCleanup(cache.clear)
+        # Início de uma janela; o cache em memória usa o mesmo relógio
+        patcher = mock.patch('core.ratelimit.time.time', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _take(self, count, limit):
+        return sum(self.scheduler._try_acquire(self.host, limit) for _ in range(count))
+
+    def test_window_limit(self):
+        self.assertEqual(self._take(6, 4), 4)
+        # Começo da janela seguinte: a anterior ainda pesa inteira
+        self.clock.return_value = 1001.0
+        self.assertEqual(self._take(1, 4), 0)
+        # No meio dela, pesa metade (4 * 0.5 + 2 <= 4)
+        self.clock.return_value = 1001.5
+        self.assertEqual(self._take(3, 4), 2)
+
+    def test_background_leaves_the_reserve_to_interactive(self):
+        self.assertEqual(self.scheduler.limit_for(BACKGROUND), 2)
+        self.assertEqual(self.scheduler.acquire(self.host, BACKGROUND), 0.0)
+        self.assertEqual(self.scheduler.acquire(self.host, BACKGROUND), 0.0)
+        self.assertIsNone(self.scheduler.acquire(self.host, BACKGROUND))
+        self.assertEqual(self.scheduler.acquire(self.host, INTERACTIVE), 0.0)
+        self.assertEqual(self.scheduler.acquire(self.host, INTERACTIVE), 0.0)
+        self.assertIsNone(self.scheduler.acquire(self.host, INTERACTIVE))
+        counters = self.scheduler.metrics()
+        self.assertEqual((counters[BACKGROUND]['granted'], counters[BACKGROUND]['throttled']), (2, 1))
+        self.assertEqual((counters[INTERACTIVE]['granted'], counters[INTERACTIVE]['throttled']), (2, 1))
+
+    def test_background_yields_to_waiting_interactive(self):
+        self.scheduler._waiting[INTERACTIVE] = 1
+        self.assertIsNone(self.scheduler.acquire(self.host, BACKGROUND))
+        self.scheduler._waiting[INTERACTIVE] = 0
+        self.assertEqual(self.scheduler.acquire(self.host, BACKGROUND), 0.0)
+
+    def test_backoff_blocks_the_host(self):
+        self.scheduler.backoff(self.host, '30')
+        self.assertIsNone(self.scheduler.acquire(self.host, INTERACTIVE))
+        self.assertEqual(self.scheduler.acquire('other.test', INTERACTIVE), 0.0)
@@ -0,0 +1,197 @@
+"""
+Cliente HTTP compartilhado para as chamadas do core ao YGOProDeck.
+
+- Session única com keep-alive e pool de conexões por host.
+- Retries limitados com backoff (erros de conexão e 5xx; timeout de
+  leitura não é repetido para não prender o worker). Os de 5xx são feitos
+  aqui, não no urllib3, para cada tentativa passar pelo orçamento.
+- Toda chamada passa pelo orçamento compartilhado de core/ratelimit.py, com
+  prioridade interativa ou background; um 429 pausa o host para todos.
+- Circuit breaker por host: com muitas falhas seguidas, falha rápido com
+  CircuitOpenError em vez de esperar o timeout (o cache serve a versão velha).
+"""
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ratelimit import scheduler, current_priority
+
+YGOPRODECK_API_URL = 'https://db.ygoprodeck.com/api/v7/cardinfo.php'
+YGOPRODECK_ARCHETYPES_URL = 'https://db.ygoprodeck.com/api/v7/archetypes.php'
+YGOPRODECK_DB_VERSION_URL = 'https://db.ygoprodeck.com/api/v7/checkDBVer.php'
+YGOPRODECK_IMAGE_URL = 'https://images.ygoprodeck.com/images/cards'
+YGOPRODECK_CARD_BACK_URL = 'https://images.ygoprodeck.com/images/cards/back_high.jpg'
+
+# (connect, read) em segundos
+DEFAULT_TIMEOUT = (3.05, 6)
+# Respostas repetidas por UpstreamClient.get (429 vira backoff no scheduler)
+RETRY_STATUS = (500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Upstream com taxa de erro alta; a chamada nem foi feita"""
+
+
+class UpstreamThrottledError(CircuitOpenError):
+    """Sem orçamento de chamadas ao upstream dentro da espera da prioridade"""
+
+
+class CircuitBreaker:
+    """
+    Janela deslizante de resultados. Abre quando, com pelo menos
+    `min_requests` chamadas na janela, a taxa de falha passa de
+    `failure_rate`. Depois de `open_seconds`, deixa passar uma chamada de
+    teste (half-open): sucesso fecha o circuito, falha reabre.
+    """
+
+    def __init__(self, window_seconds=30, min_requests=10, failure_rate=0.5, open_seconds=30):
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._results = deque()
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.open_seconds:
+                return 'half-open'
+            return 'open'
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.open_seconds or self._probing:
+                raise CircuitOpenError('Circuito aberto para o upstream.')
+            self._probing = True
+
+    def release_probe(self):
+        """A chamada de teste não chegou a ser feita; outra pode tentar"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                # Chamada de teste passou: fecha e zera a janela
+                self._opened_at = None
+                self._probing = False
+                self._results.clear()
+                return
+            self._record(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self._results if not ok)
+            if len(self._results) >= self.min_requests and failures / len(self._results) >= self.failure_rate:
+                self._opened_at = time.monotonic()
+
+    def _record(self, ok):
+        now = time.monotonic()
+        self._results.append((now, ok))
+        while self._results and now - self._results[0][0] > self.window_seconds:
+            self._results.popleft()
+
+
+class UpstreamClient:
+
+    def __init__(self, pool_connections=4, pool_maxsize=10, retries=2, backoff=0.3, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        # Só falhas de conexão (a requisição nem chegou ao upstream); status
+        # é repetido em get(), com orçamento a cada tentativa
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=0,
+            backoff_factor=backoff,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker_for(self, url):
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker()
+            return breaker
+
+    def circuit_states(self):
+        with self._breakers_lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+
+    def get(self, url, params=None, timeout=None, priority=None):
+        """
+        GET pelo pool compartilhado. Levanta CircuitOpenError se o host
+        estiver com o circuito aberto e UpstreamThrottledError se não houver
+        orçamento a tempo; 5xx/429 contam como falha, 4xx não. `priority`
+        padrão vem do contexto (ver ratelimit.upstream_priority).
+        5xx é repetido até `retries` vezes enquanto houver orçamento e o
+        circuito seguir fechado; senão volta a última resposta.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker_for(url)
+        priority = priority or current_priority()
+        response = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                if response is None:
+                    raise
+                return response
+            if scheduler.acquire(host, priority) is None:
+                breaker.release_probe()
+                if response is None:
+                    raise UpstreamThrottledError(f'Orçamento de chamadas para {host} esgotado ({priority}).')
+                return response
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            if response.status_code == 429:
+                scheduler.backoff(host, response.headers.get('Retry-After'), priority)
+                breaker.record_failure()
+                return response
+            if response.status_code not in RETRY_STATUS:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                return response
+            breaker.record_failure()
+        return response
+
+upstream = UpstreamClient()
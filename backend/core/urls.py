@@ -3,9 +3,18 @@ from . import views
 
 urlpatterns = [
     path('cards/', views.search_cards, name='search-cards'),
+    path('cards/autocomplete/', views.autocomplete_cards, name='autocomplete-cards'),
+    path('cards/batch/', views.get_cards_batch, name='get-cards-batch'),
+    path('cards/by-set-code/', views.get_card_by_set_code, name='get-card-by-set-code'),
     path('cards/<int:card_id>/', views.get_card_by_id, name='get-card'),
     path('archetypes/', views.get_all_archetypes, name='get-archetypes'),
     # Proxy de imagens (resolve CORS)
     path('images/<int:card_id>/', views.proxy_card_image, name='proxy-card-image'),
     path('images/back/', views.proxy_card_back_image, name='proxy-card-back'),
+    # Texturas com mipmaps prontos para o visualizador 3D
+    path('images/<int:card_id>/texture/', views.proxy_card_texture, name='proxy-card-texture'),
+    path('images/back/texture/', views.proxy_card_back_texture, name='proxy-card-back-texture'),
+    # Atlas de miniaturas (sprite sheet) para grades do catálogo
+    path('images/atlas/', views.get_image_atlas, name='image-atlas'),
+    path('images/atlas/<str:digest>/', views.get_image_atlas_file, name='image-atlas-file'),
 ]
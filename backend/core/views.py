@@ -1,18 +1,171 @@
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from rest_framework.decorators import api_view
+from django.db import connections
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.cache import cache
-from django.http import HttpResponse
 
-YGOPRODECK_API_URL = 'https://db.ygoprodeck.com/api/v7/cardinfo.php'
-YGOPRODECK_IMAGE_URL = 'https://images.ygoprodeck.com/images/cards'
+from .cache import (
+    catalog_cache, cached_fetch, is_fresh, make_cache_key, make_entry, refresh_in_background, NEGATIVE_TTL
+)
+from .catalog import (
+    catalog_available, search_catalog, get_catalog_card, get_catalog_cards,
+    parse_ids, parse_pagination, pagination_meta, summarize_card,
+)
+from .filters import CATEGORICAL_FIELDS, parse_ranges
+from .indexes import catalog_version, name_index, filter_index, set_code_index
+from .images import (
+    image_store, serve_image, card_image_key, get_card_image, get_card_back_image, IMAGE_MAX_AGE,
+)
+from .imaging import (
+    SIZE_PRESETS, FORMATS, TEXTURE_SIZES, TEXTURE_DEFAULT_SIZE, ATLAS_TILES,
+    variant_key, render_variant, texture_key, render_mipchain, atlas_layout, render_atlas,
+    InvalidImageError,
+)
+from .ratelimit import upstream_priority, BACKGROUND
+from .singleflight import single_flight
+from .upstream import upstream, CircuitOpenError, YGOPRODECK_API_URL, YGOPRODECK_ARCHETYPES_URL
+
+logger = logging.getLogger(__name__)
+
+# Dados de carta: frescos por 24 horas, servidos velhos até 7 dias
+CARD_TTL = 86400
+CARD_STALE_TTL = 604800
+
+# Máximo de IDs por chamada em /cards/batch/
+MAX_BATCH_IDS = 300
+
+# Atlas de miniaturas: cartas por atlas, colunas (fixas) e downloads simultâneos
+# das artes que faltam no disco (em background)
+MAX_ATLAS_IDS = 60
+ATLAS_COLUMNS = 10
+ATLAS_FETCH_WORKERS = 4
+_ATLAS_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Sugestões por chamada em /cards/autocomplete/
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def _filter_search(engine, params, ranges, num, offset, summary):
+    """
+    Busca só por atributos/faixas, respondida pelo motor de filtros em
+    memória; do banco saem apenas as cartas da página (por PK).
+    """
+    card_ids, total = engine.query(params, ranges, num=num, offset=offset)
+    if not total:
+        return None
+    found = get_catalog_cards(card_ids)
+    cards = [found[card_id] for card_id in card_ids if card_id in found]
+    data = {'data': cards}
+    if num is not None or offset:
+        data['meta'] = pagination_meta(total, num, offset, len(cards))
+    if summary:
+        data['data'] = [summarize_card(card) for card in cards]
+    return data
+
+
+def _fetch_search(params, num, offset, summary, ranges=None):
+    """
+    Monta a resposta da busca (catálogo local ou upstream).
+    Retorna None quando nenhuma carta é encontrada.
+    """
+    # Catálogo local carregado: responde sem ir à rede
+    if catalog_available():
+        cards, total = search_catalog(params, num=num, offset=offset, ranges=ranges)
+        if not total:
+            return None
+        data = {'data': cards}
+        if num is not None or offset:
+            data['meta'] = pagination_meta(total, num, offset, len(cards))
+    else:
+        upstream_params = dict(params)
+        if num is not None:
+            upstream_params.update(num=num, offset=offset)
+
+        response = upstream.get(YGOPRODECK_API_URL, params=upstream_params)
+        if response.status_code == 400:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        cards = data.get('data', [])
+
+        if num is None and offset:
+            total = len(cards)
+            cards = cards[offset:]
+            data = {'data': cards, 'meta': pagination_meta(total, num, offset, len(cards))}
+        elif num is not None:
+            total = data.get('meta', {}).get('total_rows', len(cards))
+            data = {'data': cards, 'meta': pagination_meta(total, num, offset, len(cards))}
+
+    if summary:
+        data['data'] = [summarize_card(card) for card in cards]
+    return data
+
+
+def _fetch_card(card_id):
+    """Retorna {'data': [carta]} ou None se a carta não existir"""
+    if catalog_available():
+        card = get_catalog_card(card_id)
+        if card is None:
+            # ID de arte alternativa: responde com a carta canônica
+            canonical_id = set_code_index.get().canonical_id(card_id)
+            if canonical_id is not None:
+                card = get_catalog_card(canonical_id)
+        return {'data': [card]} if card is not None else None
+
+    response = upstream.get(YGOPRODECK_API_URL, params={'id': card_id})
+    if response.status_code == 400:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+def _fetch_cards(card_ids):
+    """Busca várias cartas de uma vez; retorna {id: carta} só com as encontradas"""
+    if catalog_available():
+        found = get_catalog_cards(card_ids)
+        # IDs de arte alternativa resolvem para a carta canônica
+        index = set_code_index.get()
+        aliases = {
+            card_id: index.canonical_id(card_id) for card_id in card_ids if card_id not in found
+        }
+        aliases = {card_id: canonical for card_id, canonical in aliases.items() if canonical}
+        if aliases:
+            canonical_cards = get_catalog_cards(list(set(aliases.values())))
+            found.update({
+                card_id: canonical_cards[canonical]
+                for card_id, canonical in aliases.items() if canonical in canonical_cards
+            })
+        return found
+
+    # Uma única chamada ao upstream para todos os misses
+    response = upstream.get(YGOPRODECK_API_URL, params={'id': ','.join(str(i) for i in card_ids)})
+    if response.status_code == 400:
+        return {}
+    response.raise_for_status()
+    return {card['id']: card for card in response.json().get('data', [])}
+
+
+def _fetch_archetypes():
+    response = upstream.get(YGOPRODECK_ARCHETYPES_URL)
+    response.raise_for_status()
+    return response.json()
 
 
 @api_view(['GET'])
 def search_cards(request):
     """
-    Proxy para a API do YGOProDeck.
+    Busca cartas no catálogo local (ou no YGOProDeck, se o catálogo
+    ainda não foi carregado).
     Parâmetros aceitos:
     - fname: Nome da carta (busca fuzzy)
     - name: Nome exato da carta
@@ -21,11 +174,14 @@ def search_cards(request):
     - attribute: Atributo (DARK, LIGHT, etc.)
     - race: Raça/Tipo do monstro
     - archetype: Arquétipo
+    - atk_min/atk_max, def_min/def_max, level_min/level_max: faixas numéricas
+      (exigem o catálogo local)
     - num: Limite de resultados
     - offset: Offset para paginação
+    - view: 'summary' retorna só id, nome, tipo e imagem de cada carta
     """
     params = {}
-    
+
     # Parâmetros de busca
     if request.GET.get('fname'):
         params['fname'] = request.GET.get('fname')
@@ -41,35 +197,66 @@ def search_cards(request):
         params['race'] = request.GET.get('race')
     if request.GET.get('archetype'):
         params['archetype'] = request.GET.get('archetype')
-    
+
+    try:
+        ranges = parse_ranges(request.GET)
+    except ValueError:
+        return Response(
+            {'error': 'As faixas (atk_min, def_max, level_min...) devem ser inteiros.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     # Se não há parâmetros, retorna erro
-    if not params:
+    if not params and not ranges:
         return Response(
             {'error': 'Informe pelo menos um parâmetro de busca (fname, name, id, type, etc.)'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Tenta buscar do cache primeiro
-    cache_key = f"ygo_search_{hash(frozenset(params.items()))}"
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return Response(cached_data)
-    
+
     try:
-        response = requests.get(YGOPRODECK_API_URL, params=params, timeout=10)
-        
-        if response.status_code == 400:
+        num, offset = parse_pagination(request.GET)
+    except ValueError:
+        return Response(
+            {'error': 'num e offset devem ser inteiros não negativos.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    summary = request.GET.get('view') == 'summary'
+
+    # Só atributos/faixas: motor de filtros em memória, sem chave de cache
+    # para cada combinação
+    engine = filter_index.get()
+    if len(engine) and set(params) <= set(CATEGORICAL_FIELDS):
+        data = _filter_search(engine, params, ranges, num, offset, summary)
+        if data is None:
             return Response({'data': [], 'message': 'Nenhuma carta encontrada.'}, status=status.HTTP_200_OK)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Cacheia por 1 hora
-        cache.set(cache_key, data, 3600)
-        
         return Response(data)
-        
+
+    if ranges and not len(engine):
+        return Response(
+            {'error': 'Filtros por faixa ainda não estão disponíveis (catálogo local não carregado).'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # A versão do catálogo entra na chave: qualquer carta alterada pode mudar
+    # o resultado, e a busca não tem como saber quais
+    key_params = {
+        **params, 'ranges': ranges, 'num': num, 'offset': offset, 'summary': summary,
+        'catalog': catalog_version(),
+    }
+    cache_key = make_cache_key('ygo_search', key_params)
+
+    try:
+        # Fresco por 1 hora; até 24 horas serve o velho e revalida em background
+        data = cached_fetch(
+            catalog_cache, cache_key,
+            lambda: _fetch_search(params, num, offset, summary, ranges=ranges),
+            3600, stale_timeout=86400
+        )
+    except CircuitOpenError:
+        return Response(
+            {'error': 'API externa indisponível no momento. Tente novamente em instantes.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except requests.exceptions.Timeout:
         return Response(
             {'error': 'Timeout ao conectar com a API externa.'},
@@ -81,6 +268,11 @@ def search_cards(request):
             status=status.HTTP_502_BAD_GATEWAY
         )
 
+    if data is None:
+        return Response({'data': [], 'message': 'Nenhuma carta encontrada.'}, status=status.HTTP_200_OK)
+
+    return Response(data)
+
 
 @api_view(['GET'])
 def get_card_by_id(request, card_id):
@@ -88,102 +280,324 @@ def get_card_by_id(request, card_id):
     Busca uma carta específica pelo ID.
     """
     cache_key = f"ygo_card_{card_id}"
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return Response(cached_data)
-    
+
     try:
-        response = requests.get(YGOPRODECK_API_URL, params={'id': card_id}, timeout=10)
-        
-        if response.status_code == 400:
-            return Response({'error': 'Carta não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Cacheia por 24 horas (dados de carta não mudam com frequência)
-        cache.set(cache_key, data, 86400)
-        
-        return Response(data)
-        
+        # Dados de carta não mudam com frequência
+        data = cached_fetch(
+            catalog_cache, cache_key, lambda: _fetch_card(card_id),
+            CARD_TTL, stale_timeout=CARD_STALE_TTL
+        )
+    except CircuitOpenError:
+        return Response(
+            {'error': 'API externa indisponível no momento. Tente novamente em instantes.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except requests.exceptions.RequestException as e:
         return Response(
             {'error': f'Erro ao buscar carta: {str(e)}'},
             status=status.HTTP_502_BAD_GATEWAY
         )
 
+    if data is None:
+        return Response({'error': 'Carta não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(data)
+
+
+def _store_cards(card_ids, found):
+    """Grava no cache as cartas encontradas e uma entrada negativa para as que faltaram"""
+    positive = {}
+    negative = {}
+    for card_id in card_ids:
+        key = f"ygo_card_{card_id}"
+        if card_id in found:
+            positive[key] = make_entry({'data': [found[card_id]]}, CARD_TTL)[0]
+        else:
+            negative[key] = make_entry(None, CARD_TTL)[0]
+    if positive:
+        catalog_cache.set_many(positive, CARD_STALE_TTL)
+    if negative:
+        catalog_cache.set_many(negative, NEGATIVE_TTL)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def get_cards_batch(request):
+    """
+    Busca várias cartas numa chamada só.
+    GET ?ids=1,2,3 ou POST {"ids": [1, 2, 3]} (até MAX_BATCH_IDS).
+    Retorna as cartas na ordem pedida, cada uma com `requested_id` (o ID
+    pedido; difere de `id` quando é uma arte alternativa) e, em `missing`,
+    os IDs não encontrados.
+    """
+    if request.method == 'POST':
+        if not isinstance(request.data, dict):
+            return Response(
+                {'error': 'Envie um objeto JSON: {"ids": [...]}.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        raw_ids = request.data.get('ids', [])
+    else:
+        raw_ids = request.GET.get('ids', '')
+    if isinstance(raw_ids, list):
+        raw_ids = ','.join(str(card_id) for card_id in raw_ids)
+    card_ids = list(dict.fromkeys(parse_ids(raw_ids)))
+
+    if not card_ids:
+        return Response({'error': 'Informe os IDs das cartas em ids.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(card_ids) > MAX_BATCH_IDS:
+        return Response(
+            {'error': f'Máximo de {MAX_BATCH_IDS} cartas por chamada.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Multi-get no cache (mesmas chaves do get_card_by_id)
+    keys = {card_id: f"ygo_card_{card_id}" for card_id in card_ids}
+    entries = catalog_cache.get_many(keys.values())
+    cards = {}
+    misses = []
+    stale = []
+    for card_id, key in keys.items():
+        entry = entries.get(key)
+        if entry is None:
+            misses.append(card_id)
+            continue
+        if entry['value'] is not None:
+            cards[card_id] = entry['value']['data'][0]
+        if not is_fresh(entry):
+            stale.append(card_id)
+
+    # Velhas são servidas agora e revalidadas juntas em background (como no get_card_by_id)
+    if stale:
+        refresh_in_background(
+            make_cache_key('ygo_cards_batch', sorted(stale)),
+            lambda: _store_cards(stale, _fetch_cards(stale)),
+        )
+
+    if misses:
+        try:
+            found = _fetch_cards(misses)
+        except CircuitOpenError:
+            return Response(
+                {'error': 'API externa indisponível no momento. Tente novamente em instantes.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except requests.exceptions.RequestException as e:
+            return Response(
+                {'error': f'Erro ao buscar cartas: {str(e)}'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+        _store_cards(misses, found)
+        cards.update(found)
+
+    return Response({
+        'data': [{**cards[card_id], 'requested_id': card_id} for card_id in card_ids if card_id in cards],
+        'missing': [card_id for card_id in card_ids if card_id not in cards],
+    })
+
+
+@api_view(['GET'])
+def autocomplete_cards(request):
+    """
+    Sugestões de nomes para busca-enquanto-digita.
+    Parâmetros: q (texto digitado), limit (padrão 10, máx. 50).
+    Responde do índice em memória, sem banco nem upstream.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_DEFAULT_LIMIT
+
+    if not query or limit <= 0:
+        return Response({'data': []})
+
+    results = name_index.get().search(query, limit=limit)
+    return Response({
+        'data': [{'id': card_id, 'name': name} for card_id, name, _ in results],
+    })
+
+
+@api_view(['GET'])
+def get_card_by_set_code(request):
+    """
+    Busca a carta pelo código impresso na coleção.
+    Parâmetros:
+    - code: Código da coleção (ex.: LOB-EN001; também aceita sem região, LOB-001)
+    - rarity: Raridade (opcional, ex.: Ultra Rare ou UR)
+    """
+    code = request.GET.get('code', '').strip()
+    if not code:
+        return Response({'error': 'Informe o parâmetro code.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    index = set_code_index.get()
+    if not len(index):
+        return Response(
+            {'error': 'Busca por código indisponível (catálogo local não carregado).'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    printings = index.printings(code, rarity=request.GET.get('rarity'))
+    if not printings:
+        return Response({'error': 'Código não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+
+    card_ids = list(dict.fromkeys(printing['id'] for printing in printings))
+    cards = get_catalog_cards(card_ids)
+    return Response({
+        'data': [cards[card_id] for card_id in card_ids if card_id in cards],
+        'printings': printings,
+    })
+
 
 @api_view(['GET'])
 def get_all_archetypes(request):
     """
     Retorna todos os arquétipos disponíveis.
     """
-    cache_key = "ygo_archetypes"
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return Response(cached_data)
-    
     try:
-        response = requests.get('https://db.ygoprodeck.com/api/v7/archetypes.php', timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Cacheia por 24 horas
-        cache.set(cache_key, data, 86400)
-        
-        return Response(data)
-        
+        # Fresco por 24 horas, velho até 7 dias
+        data = cached_fetch(
+            catalog_cache, "ygo_archetypes", _fetch_archetypes,
+            86400, stale_timeout=604800
+        )
+    except CircuitOpenError:
+        return Response(
+            {'error': 'API externa indisponível no momento. Tente novamente em instantes.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except requests.exceptions.RequestException as e:
         return Response(
             {'error': f'Erro ao buscar arquétipos: {str(e)}'},
             status=status.HTTP_502_BAD_GATEWAY
         )
 
+    return Response(data)
+
+
+def _original_card_image(card_id):
+    """
+    StoredImage da arte original (baixada uma vez do upstream) ou None se
+    ela não existir. Falha do upstream levanta RequestException.
+    """
+    # Com o catálogo, só artes conhecidas (inclusive alternativas) vão ao upstream,
+    # direto na URL cadastrada
+    image_urls = None
+    index = set_code_index.get()
+    if len(index):
+        image = index.image(card_id)
+        if image is None:
+            return None
+        image_urls = [url for url in (image['image_url'], image['image_url_small']) if url]
+
+    # Imagens ficam em disco (MEDIA_ROOT), não no cache nem na memória do worker
+    return get_card_image(card_id, image_urls=image_urls)
+
+
+def _image_unavailable():
+    """Upstream fora do ar ao baixar uma imagem: 503, nunca 404 (não é cacheado)"""
+    return Response(
+        {'error': 'API externa indisponível no momento. Tente novamente em instantes.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def _discard_original(key):
+    """Original gravado não decodifica: sai do store (com cache negativo, para ser baixado de novo depois)"""
+    logger.warning('Imagem %s não decodifica; descartando o original', key)
+    image_store.discard(key)
+
+
+def _invalid_original(original):
+    """Resposta para um original que não decodifica: 502, como falha do upstream"""
+    _discard_original(original.key)
+    return Response(
+        {'error': 'A API externa devolveu uma imagem inválida.'}, status=status.HTTP_502_BAD_GATEWAY
+    )
+
+
+def _negotiated_format(request):
+    return 'webp' if 'image/webp' in request.META.get('HTTP_ACCEPT', '') else 'jpeg'
+
+
+def _serve_texture(request, key, original):
+    """
+    Cadeia de mipmaps (ver core/imaging.py) da imagem `original`, gerada uma
+    vez e guardada no image store. Parâmetros: max (lado máximo) e fmt.
+    """
+    try:
+        max_size = int(request.GET.get('max', TEXTURE_DEFAULT_SIZE))
+    except ValueError:
+        max_size = None
+    fmt = request.GET.get('fmt')
+    if max_size not in TEXTURE_SIZES or (fmt is not None and fmt not in FORMATS):
+        return Response(
+            {'error': f"Use max em {', '.join(map(str, TEXTURE_SIZES))} e fmt em {', '.join(FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    negotiated = fmt is None
+    if negotiated:
+        fmt = _negotiated_format(request)
+
+    try:
+        stored = image_store.get_or_fetch(
+            texture_key(key, max_size, fmt),
+            lambda: render_mipchain(original.path.read_bytes(), max_size, fmt)
+        )
+    except InvalidImageError:
+        return _invalid_original(original)
+    response = serve_image(request, stored)
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
 
 @api_view(['GET'])
 def proxy_card_image(request, card_id):
     """
     Proxy para imagens de cartas do YGOProDeck.
     Resolve problemas de CORS ao carregar imagens no Three.js.
+    Parâmetros opcionais:
+    - size: thumb, medium ou full (padrão)
+    - fmt: webp ou jpeg (padrão: webp se o navegador aceitar).
+      Não é `format` porque o DRF reserva esse parâmetro.
     """
-    # Verifica se já está em cache
-    cache_key = f"ygo_image_{card_id}"
-    cached_image = cache.get(cache_key)
-    
-    if cached_image:
-        response = HttpResponse(cached_image['data'], content_type=cached_image['content_type'])
-        response['Access-Control-Allow-Origin'] = '*'
-        return response
-    
-    # Tenta diferentes formatos de imagem
-    image_urls = [
-        f"{YGOPRODECK_IMAGE_URL}/{card_id}.jpg",
-        f"{YGOPRODECK_IMAGE_URL}_small/{card_id}.jpg",
-    ]
-    
-    for image_url in image_urls:
-        try:
-            img_response = requests.get(image_url, timeout=15)
-            if img_response.status_code == 200:
-                content_type = img_response.headers.get('Content-Type', 'image/jpeg')
-                
-                # Cacheia a imagem por 7 dias
-                cache.set(cache_key, {
-                    'data': img_response.content,
-                    'content_type': content_type
-                }, 604800)
-                
-                response = HttpResponse(img_response.content, content_type=content_type)
-                response['Access-Control-Allow-Origin'] = '*'
-                response['Cache-Control'] = 'public, max-age=604800'
-                return response
-                
-        except requests.exceptions.RequestException:
-            continue
-    
-    return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    size = request.GET.get('size', 'full')
+    fmt = request.GET.get('fmt')
+    if size not in SIZE_PRESETS or (fmt is not None and fmt not in FORMATS):
+        return Response(
+            {'error': f"Use size em {', '.join(SIZE_PRESETS)} e fmt em {', '.join(FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        stored = _original_card_image(card_id)
+    except requests.exceptions.RequestException:
+        return _image_unavailable()
+    if stored is None:
+        return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Sem parâmetros: imagem original, como sempre
+    if size == 'full' and fmt is None:
+        return serve_image(request, stored)
+
+    negotiated = fmt is None
+    if negotiated:
+        fmt = _negotiated_format(request)
+
+    # Variante gerada uma única vez e reaproveitada dali em diante
+    original = stored
+    try:
+        stored = image_store.get_or_fetch(
+            variant_key(card_id, size, fmt),
+            lambda: render_variant(original.path.read_bytes(), size, fmt)
+        )
+    except InvalidImageError:
+        return _invalid_original(original)
+
+    response = serve_image(request, stored)
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
 
 
 @api_view(['GET'])
@@ -191,30 +605,192 @@ def proxy_card_back_image(request):
     """
     Proxy para a imagem do verso da carta.
     """
-    cache_key = "ygo_card_back"
-    cached_image = cache.get(cache_key)
-    
-    if cached_image:
-        response = HttpResponse(cached_image['data'], content_type=cached_image['content_type'])
-        response['Access-Control-Allow-Origin'] = '*'
-        return response
-    
     try:
-        img_response = requests.get('https://images.ygoprodeck.com/images/cards/back_high.jpg', timeout=15)
-        if img_response.status_code == 200:
-            content_type = img_response.headers.get('Content-Type', 'image/jpeg')
-            
-            cache.set(cache_key, {
-                'data': img_response.content,
-                'content_type': content_type
-            }, 604800)
-            
-            response = HttpResponse(img_response.content, content_type=content_type)
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Cache-Control'] = 'public, max-age=604800'
-            return response
-            
-    except requests.exceptions.RequestException as e:
-        pass
-    
-    return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        stored = get_card_back_image()
+    except requests.exceptions.RequestException:
+        return _image_unavailable()
+
+    if stored is None:
+        return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    return serve_image(request, stored)
+
+
+@api_view(['GET'])
+def proxy_card_texture(request, card_id):
+    """
+    Textura da carta para o visualizador 3D: dimensões potência de dois e
+    todos os níveis de mipmap num arquivo só (formato em core/imaging.py).
+    Parâmetros opcionais:
+    - max: lado máximo do nível 0 (256, 512 ou 1024; padrão 512)
+    - fmt: webp ou jpeg (padrão: webp se o navegador aceitar)
+    """
+    try:
+        stored = _original_card_image(card_id)
+    except requests.exceptions.RequestException:
+        return _image_unavailable()
+    if stored is None:
+        return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return _serve_texture(request, card_id, stored)
+
+
+@api_view(['GET'])
+def proxy_card_back_texture(request):
+    """
+    Textura do verso (mesmo formato e parâmetros de proxy_card_texture).
+    """
+    try:
+        stored = get_card_back_image()
+    except requests.exceptions.RequestException:
+        return _image_unavailable()
+
+    if stored is None:
+        return Response({'error': 'Imagem não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return _serve_texture(request, 'back', stored)
+
+
+_atlas_fetcher = ThreadPoolExecutor(ATLAS_FETCH_WORKERS, thread_name_prefix='atlas')
+_atlas_fetching = set()
+_atlas_fetching_lock = threading.Lock()
+
+
+def _fetch_atlas_original(card_id):
+    """Baixa a arte para um próximo atlas, com a prioridade de background"""
+    try:
+        with upstream_priority(BACKGROUND):
+            _original_card_image(card_id)
+    except Exception:
+        logger.warning('Falha ao baixar a arte %s para o atlas', card_id, exc_info=True)
+    finally:
+        with _atlas_fetching_lock:
+            _atlas_fetching.discard(card_id)
+        connections.close_all()
+
+
+def _schedule_atlas_originals(card_ids):
+    with _atlas_fetching_lock:
+        pending = [card_id for card_id in card_ids if card_id not in _atlas_fetching]
+        _atlas_fetching.update(pending)
+    for card_id in pending:
+        _atlas_fetcher.submit(_fetch_atlas_original, card_id)
+
+
+def _build_atlas(card_ids, size, fmt):
+    """
+    Monta o atlas só com as artes que já estão em disco e grava no image
+    store pelo hash do conteúdo; as que faltam vão em `missing` e são
+    baixadas em background para a próxima chamada. Retorna o mapa de
+    coordenadas.
+    """
+    found = []
+    missing = []
+    for card_id in card_ids:
+        stored = image_store.get(card_image_key(card_id))
+        try:
+            found.append((card_id, stored.path.read_bytes()))
+        except (AttributeError, OSError):
+            missing.append(card_id)
+    _schedule_atlas_originals(missing)
+    if not found:
+        return {'digest': None, 'missing': missing}
+
+    atlas = render_atlas([data for _, data in found], size, fmt, ATLAS_COLUMNS)
+    # Originais que não decodificam saem do store e entram em `missing`
+    for i in atlas['invalid']:
+        card_id = found[i][0]
+        _discard_original(card_image_key(card_id))
+        missing.append(card_id)
+    missing.sort()
+    found = [item for i, item in enumerate(found) if i not in atlas['invalid']]
+    if not found:
+        return {'digest': None, 'missing': missing}
+
+    digest = hashlib.sha256(atlas['data']).hexdigest()
+    image_store.put(f"atlases/{digest}", atlas['data'], atlas['content_type'])
+
+    width, height, positions = atlas_layout(len(found), size, ATLAS_COLUMNS)
+    tile_width, tile_height = ATLAS_TILES[size]
+    return {
+        'digest': digest,
+        'width': width,
+        'height': height,
+        'tile': {'width': tile_width, 'height': tile_height},
+        'cards': [
+            {'id': card_id, 'x': x, 'y': y}
+            for (card_id, _), (x, y) in zip(found, positions)
+        ],
+        'missing': missing,
+    }
+
+
+@api_view(['GET'])
+def get_image_atlas(request):
+    """
+    Miniaturas de várias cartas numa imagem só (sprite sheet) para grades.
+    GET ?ids=1,2,3 (até MAX_ATLAS_IDS; a posição de cada carta vem no mapa,
+    o atlas sai em ordem de ID). Opcionais:
+    - size: thumb (padrão) ou medium
+    - fmt: webp ou jpeg (padrão: webp se o navegador aceitar)
+    Retorna a URL do atlas, o tamanho de cada miniatura e a posição (x, y)
+    de cada carta. Não chama o upstream: artes ainda não baixadas vão em
+    `missing` e entram num atlas seguinte.
+    """
+    # Ordenado e sem repetição: a mesma seleção dá sempre o mesmo atlas
+    card_ids = sorted(set(parse_ids(request.GET.get('ids', ''))))
+    size = request.GET.get('size', 'thumb')
+    fmt = request.GET.get('fmt')
+
+    if not card_ids:
+        return Response({'error': 'Informe os IDs das cartas em ids.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(card_ids) > MAX_ATLAS_IDS:
+        return Response(
+            {'error': f'Máximo de {MAX_ATLAS_IDS} cartas por atlas.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if size not in ATLAS_TILES or (fmt is not None and fmt not in FORMATS):
+        return Response(
+            {'error': f"Use size em {', '.join(ATLAS_TILES)} e fmt em {', '.join(FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    negotiated = fmt is None
+    if negotiated:
+        fmt = _negotiated_format(request)
+
+    # A mesma grade (consultas comuns, página inicial) sai do cache; atlas
+    # com falhas expira logo para a próxima chamada completar
+    key = make_cache_key('image_atlas', {'ids': card_ids, 'size': size, 'fmt': fmt})
+
+    def build():
+        atlas = _build_atlas(card_ids, size, fmt)
+        catalog_cache.set(key, atlas, NEGATIVE_TTL if atlas['missing'] else IMAGE_MAX_AGE)
+        return atlas
+
+    atlas = catalog_cache.get(key)
+    if atlas is None:
+        atlas = single_flight.do(key, build, check=lambda: catalog_cache.get(key))
+
+    if atlas['digest'] is None:
+        return Response({'error': 'Nenhuma imagem encontrada', 'missing': atlas['missing']},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    data = {field: value for field, value in atlas.items() if field != 'digest'}
+    data['image'] = request.build_absolute_uri(reverse('image-atlas-file', args=[atlas['digest']]))
+    response = Response(data)
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@api_view(['GET'])
+def get_image_atlas_file(request, digest):
+    """
+    Imagem do atlas, endereçada pelo hash do conteúdo (URL vem de
+    get_image_atlas): nunca muda, pode ficar no cache do navegador.
+    """
+    stored = image_store.get(f"atlases/{digest}") if _ATLAS_DIGEST.match(digest) else None
+    if stored is None:
+        return Response({'error': 'Atlas não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    response = serve_image(request, stored)
+    response['Cache-Control'] = f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    return response
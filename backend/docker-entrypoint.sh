@@ -34,6 +34,14 @@ EOF
 # Run migrations
 echo "Running migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
+python manage.py build_catalog_snapshot
+python manage.py extract_card_features --store-only
+python manage.py prune_image_atlases
+# Imagens gravadas antes do fix de permissão ficaram 0600 (o nginx não lê)
+if [ -d media/card_images ]; then
+    find media/card_images -type f ! -perm -o=r -exec chmod 644 {} +
+fi
 
 # Collect static files
 echo "Collecting static files..."
@@ -60,5 +68,6 @@ else:
 EOF
 
 # Start server
+# gthread: long polling/streaming do scanner ocupa uma thread, não o worker inteiro
 echo "Starting Gunicorn..."
-exec gunicorn --bind 0.0.0.0:8000 --workers 3 config.wsgi:application
+exec gunicorn --bind 0.0.0.0:8000 --workers 3 --worker-class gthread --threads 4 config.wsgi:application
@@ -0,0 +1,207 @@
+"""
+Benchmark de acurácia e latência do scanner (comando benchmark_scanner).
+
+As consultas saem das próprias imagens das CardReference, com distorções
+sintéticas de foto de celular (rotação, perspectiva, desfoque, reflexo,
+JPEG forte). Tudo é sorteado de um gerador com semente fixa: a mesma
+semente e o mesmo banco dão exatamente as mesmas consultas, então o JSON
+pode ser comparado entre commits. Roda offline e só na CPU.
+"""
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from core.models import CardReference
+
+from .pipeline import identify_image
+
+SCHEMA_VERSION = 1
+BACKGROUND = (70, 70, 70)
+# Qualidade do JPEG de todas as consultas (menos na distorção "jpeg")
+BASE_QUALITY = 90
+
+
+class NoQueries(Exception):
+    """Sem imagens de referência em disco para gerar consultas"""
+
+
+def _rotation(image, rng):
+    height, width = image.shape[:2]
+    angle = rng.uniform(5, 20) * rng.choice([-1, 1])
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 0.9)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=BACKGROUND)
+
+
+def _perspective(image, rng):
+    height, width = image.shape[:2]
+    corners = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+    shift = rng.uniform(0, 0.1, size=(4, 2)) * (width, height)
+    inward = np.array([[1, 1], [-1, 1], [-1, -1], [1, -1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, (corners + shift * inward).astype(np.float32))
+    return cv2.warpPerspective(image, matrix, (width, height), borderValue=BACKGROUND)
+
+
+def _blur(image, rng):
+    return cv2.GaussianBlur(image, (0, 0), rng.uniform(1.5, 3.0))
+
+
+def _glare(image, rng):
+    """Mancha de luz (reflexo no sleeve) com queda gaussiana"""
+    height, width = image.shape[:2]
+    center = rng.uniform(0.2, 0.8, size=2) * (width, height)
+    radius = rng.uniform(0.2, 0.4) * width
+    y, x = np.mgrid[:height, :width]
+    alpha = 0.7 * np.exp(-((x - center[0]) ** 2 + (y - center[1]) ** 2) / (2 * radius ** 2))
+    glare = image + alpha[..., None] * (255 - image.astype(np.float32))
+    return np.clip(glare, 0, 255).astype(np.uint8)
+
+
+def _jpeg(image, rng):
+    # A compressão é aplicada na codificação final (ver _encode)
+    return image
+
+
+DISTORTIONS = {
+    'none': lambda image, rng: image,
+    'rotation': _rotation,
+    'perspective': _perspective,
+    'blur': _blur,
+    'glare': _glare,
+    'jpeg': _jpeg,
+}
+
+
+def _encode(image, distortion, rng):
+    quality = int(rng.integers(15, 31)) if distortion == 'jpeg' else BASE_QUALITY
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def sample_references(index, samples, seed):
+    """[(reference_id, nome, caminho)] sorteadas entre as referências do índice com imagem"""
+    indexed = {int(reference_id) for reference_id in index.reference_ids}
+    rows = CardReference.objects.filter(pk__in=indexed).exclude(image='').order_by('pk')
+    storage = CardReference._meta.get_field('image').storage
+    available = [
+        (pk, name, storage.path(image))
+        for pk, name, image in rows.values_list('pk', 'name', 'image')
+        if storage.exists(image)
+    ]
+    if len(available) > samples:
+        rng = np.random.default_rng(seed)
+        chosen = np.sort(rng.choice(len(available), samples, replace=False))
+        available = [available[i] for i in chosen]
+    return available
+
+
+def build_queries(references, distortions, seed):
+    """
+    Gera [(distorção, reference_id, nome, bytes JPEG)]. Cada par
+    (referência, distorção) tem seu próprio gerador, derivado da semente:
+    mudar a amostra ou a lista de distorções não muda as outras consultas.
+    """
+    queries = []
+    for reference_id, name, path in references:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        for position, distortion in enumerate(distortions):
+            rng = np.random.default_rng([seed, reference_id, position])
+            distorted = DISTORTIONS[distortion](image, rng)
+            queries.append((distortion, reference_id, name, _encode(distorted, distortion, rng)))
+    return queries
+
+
+def _outcome(result, reference_id, name):
+    def same(found):
+        return found['reference_id'] == reference_id or found['name'] == name
+
+    match = result['match']
+    return {
+        'top1': match is not None and same(match),
+        'top5': any(same(found) for found in result['candidates'][:5]),
+        'wrong': match is not None and not same(match),
+        'rejected': match is None,
+        'fallback': result['prefilter']['fallback'],
+    }
+
+
+def _summary(outcomes):
+    total = len(outcomes)
+    summary = {'queries': total}
+    for key in ('top1', 'top5', 'wrong', 'rejected', 'fallback'):
+        hits = sum(outcome[key] for outcome in outcomes)
+        summary[key] = round(hits / total, 4) if total else 0.0
+    return summary
+
+
+def _percentiles(values):
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'count': len(values), 'p50': round(float(p50), 2), 'p95': round(float(p95), 2)}
+
+
+def run_benchmark(index, samples=100, seed=0, distortions=None, top_k=None, warmup=3):
+    """
+    Roda as consultas contra `index` e retorna o relatório (dict serializável
+    em JSON). Levanta NoQueries se nenhuma referência tiver imagem legível.
+    """
+    distortions = list(distortions or DISTORTIONS)
+    references = sample_references(index, samples, seed)
+    queries = build_queries(references, distortions, seed)
+    if not queries:
+        raise NoQueries('Nenhuma imagem de referência disponível para o benchmark.')
+
+    for _, _, _, data in queries[:warmup]:
+        identify_image(data, index=index, top_k=top_k)
+
+    outcomes = {distortion: [] for distortion in distortions}
+    timings = {}
+    for distortion, reference_id, name, data in queries:
+        started = time.perf_counter()
+        result = identify_image(data, index=index, top_k=top_k)
+        elapsed = (time.perf_counter() - started) * 1000
+        outcomes[distortion].append(_outcome(result, reference_id, name))
+        for stage, value in {**result['timings'], 'total': elapsed}.items():
+            timings.setdefault(stage, []).append(value)
+
+    everything = [outcome for group in outcomes.values() for outcome in group]
+    return {
+        'schema': SCHEMA_VERSION,
+        'config': {
+            'samples': len(references),
+            'seed': seed,
+            'distortions': distortions,
+            'top_k': top_k,
+            'warmup': warmup,
+        },
+        'index': {'references': len(index), 'descriptors': int(len(index.descriptors))},
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'accuracy': _summary(everything),
+        'distortions': {distortion: _summary(group) for distortion, group in outcomes.items()},
+        'latency_ms': {stage: _percentiles(values) for stage, values in timings.items()},
+    }
+
+
+def compare_reports(current, baseline):
+    """Linhas de texto com a diferença entre dois relatórios (atual - base)"""
+    lines = []
+    for key in ('top1', 'top5', 'wrong', 'rejected'):
+        now, before = current['accuracy'][key], baseline['accuracy'].get(key)
+        if before is not None:
+            lines.append(f'{key:>12}: {before:.4f} -> {now:.4f} ({now - before:+.4f})')
+    for stage, now in current['latency_ms'].items():
+        before = baseline['latency_ms'].get(stage)
+        if before is None:
+            continue
+        lines.append(
+            f"{stage:>12}: p50 {before['p50']:.2f} -> {now['p50']:.2f} ms, "
+            f"p95 {before['p95']:.2f} -> {now['p95']:.2f} ms"
+        )
+    return lines
@@ -0,0 +1,201 @@
+"""
+Extração de features das fotos/imagens de cartas (OpenCV).
+
+ORB gera descritores binários de 256 bits (32 bytes), comparados por
+distância de Hamming. Toda imagem é reduzida para a mesma altura antes da
+extração, para que foto e referência fiquem na mesma escala.
+
+O pHash (64 bits) resume a imagem inteira e serve de pré-filtro barato
+antes da comparação dos descritores.
+
+Fotos com várias cartas (página de fichário, cartas espalhadas na mesa)
+passam antes por find_card_regions/warp_card, que recortam cada carta.
+"""
+import cv2
+import numpy as np
+
+DESCRIPTOR_BYTES = 32
+
+# Altura de trabalho (px) de referências e consultas
+WORKING_HEIGHT = 480
+
+# Descritores guardados por referência / extraídos da foto enviada
+REFERENCE_FEATURES = 300
+QUERY_FEATURES = 500
+
+# Detecção de cartas numa foto com várias
+CARD_ASPECT = 59 / 86           # largura / altura de uma carta
+ASPECT_TOLERANCE = 0.12
+MIN_RECTANGULARITY = 0.8        # área do contorno / área do retângulo mínimo
+MIN_CARD_AREA = 0.01            # fração da foto
+DETECT_SIZE = 1000              # lado maior (px) da imagem usada na detecção
+MAX_CARDS = 24
+
+
+def decode_image(data):
+    """Bytes (JPEG/PNG/WebP) -> imagem em tons de cinza, ou None se inválida"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if not buffer.size:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+
+
+def normalize_size(gray):
+    height, width = gray.shape[:2]
+    if height == WORKING_HEIGHT:
+        return gray
+    scale = WORKING_HEIGHT / height
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(gray, (max(1, round(width * scale)), WORKING_HEIGHT), interpolation=interpolation)
+
+
+def extract_descriptors(gray, max_features=QUERY_FEATURES):
+    """Descritores ORB (N x 32, uint8) da imagem já em tons de cinza"""
+    orb = cv2.ORB_create(nfeatures=max_features)
+    _, descriptors = orb.detectAndCompute(normalize_size(gray), None)
+    if descriptors is None:
+        return np.empty((0, DESCRIPTOR_BYTES), dtype=np.uint8)
+    return descriptors
+
+
+def _order_corners(corners):
+    """
+    Cantos em sequência (como os de cv2.boxPoints) -> (sup. esq., sup. dir.,
+    inf. dir., inf. esq.), com a carta em pé.
+    """
+    x, y = corners[:, 0], corners[:, 1]
+    if np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) < 0:
+        corners = corners[::-1]
+    ordered = np.roll(corners, -int(np.argmin(corners.sum(axis=1))), axis=0).astype(np.float32)
+    top = np.linalg.norm(ordered[1] - ordered[0])
+    side = np.linalg.norm(ordered[3] - ordered[0])
+    if top > side:
+        # Carta deitada: gira a ordem para o recorte sair em pé
+        ordered = np.roll(ordered, -1, axis=0)
+    return ordered
+
+
+def find_card_regions(gray):
+    """
+    Cartas numa foto com várias: retângulos com a proporção de uma carta,
+    achados pelas bordas. Retorna uma lista de cantos (4 x 2, float32, em px
+    da foto original, ver _order_corners) na ordem de leitura; vazia se
+    nada parecer uma carta.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECT_SIZE / max(height, width))
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+    )
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    high, _ = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    edges = cv2.Canny(blurred, high / 2, high)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = MIN_CARD_AREA * small.shape[0] * small.shape[1]
+    found = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+        rect = cv2.minAreaRect(contour)
+        short, long = sorted(rect[1])
+        if abs(short / long - CARD_ASPECT) > ASPECT_TOLERANCE or area < MIN_RECTANGULARITY * short * long:
+            continue
+        found.append((short * long, rect))
+
+    # Maiores primeiro. Um retângulo que contém outras cartas inteiras é um
+    # grupo (duas cartas lado a lado também têm cara de carta) e fica de
+    # fora; o que cai dentro de uma carta já escolhida é borda/moldura dela.
+    found.sort(key=lambda item: -item[0])
+    boxes = [cv2.boxPoints(rect) for _, rect in found]
+    chosen = []
+    for i, (area, rect) in enumerate(found):
+        inner = sum(
+            1 for other_area, other in found[i + 1:]
+            if other_area < 0.6 * area and cv2.pointPolygonTest(boxes[i], other[0], False) >= 0
+        )
+        if inner >= 2:
+            continue
+        if any(cv2.pointPolygonTest(boxes[j], rect[0], False) >= 0 for j in chosen):
+            continue
+        chosen.append(i)
+
+    regions = [_order_corners(boxes[i] / scale) for i in chosen[:MAX_CARDS]]
+    if regions:
+        # Ordem de leitura: linhas pela altura típica de uma carta, depois x
+        row_height = float(np.median([np.linalg.norm(c[3] - c[0]) for c in regions]))
+        regions.sort(key=lambda c: (round(c[:, 1].mean() / row_height), c[:, 0].mean()))
+    return regions
+
+
+def warp_card(gray, corners):
+    """Recorte da carta em pé, sem perspectiva, na resolução original"""
+    width = round(max(np.linalg.norm(corners[1] - corners[0]), np.linalg.norm(corners[2] - corners[3])))
+    height = round(max(np.linalg.norm(corners[3] - corners[0]), np.linalg.norm(corners[2] - corners[1])))
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(gray, matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+
+def pack_descriptors(descriptors):
+    """Formato de CardReference.orb_features: as linhas de 32 bytes concatenadas"""
+    return np.ascontiguousarray(descriptors, dtype=np.uint8).tobytes()
+
+
+def unpack_descriptors(blob):
+    return np.frombuffer(bytes(blob), dtype=np.uint8).reshape(-1, DESCRIPTOR_BYTES)
+
+
+def _low_frequencies(gray):
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return cv2.dct(small)[:8, :8]
+
+
+def _hash_bits(low):
+    bits = (low > np.median(low)).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+# Girar 180° só troca o sinal dos coeficientes da DCT com u + v ímpar
+_ROTATE_180_SIGNS = np.where(np.add.outer(np.arange(8), np.arange(8)) % 2, -1, 1).astype(np.float32)
+
+
+def perceptual_hash(gray):
+    """pHash de 64 bits: DCT de 32x32, bloco 8x8 de baixa frequência contra a mediana"""
+    return _hash_bits(_low_frequencies(gray))
+
+
+def perceptual_hashes(gray):
+    """(pHash da imagem, pHash dela girada 180°), com uma DCT só"""
+    low = _low_frequencies(gray)
+    return _hash_bits(low), _hash_bits(low * _ROTATE_180_SIGNS)
+
+
+def hash_to_db(value):
+    """uint64 -> int64 com sinal (BigIntegerField)"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def init_worker():
+    """Inicializador dos processos de extração: um core por processo, sem threads do OpenCV"""
+    cv2.setNumThreads(1)
+
+
+def extract_reference(item):
+    """
+    Roda nos processos do ProcessPoolExecutor (extract_card_features).
+    item: (pk, caminho da imagem). Retorna (pk, descritores empacotados, pHash) ou
+    (pk, None, mensagem de erro).
+    """
+    pk, path = item
+    try:
+        with open(path, 'rb') as f:
+            gray = decode_image(f.read())
+    except OSError as e:
+        return pk, None, str(e)
+    if gray is None:
+        return pk, None, 'imagem inválida'
+    descriptors = extract_descriptors(gray, REFERENCE_FEATURES)
+    return pk, pack_descriptors(descriptors), hash_to_db(perceptual_hash(gray))
@@ -0,0 +1,398 @@
+"""
+Índice ANN em memória dos descritores ORB das CardReference (espaço de Hamming).
+
+- Todos os descritores numa matriz uint8 contígua (M x 32), agrupados por
+  referência (ref_offsets), lida uma vez por worker.
+- LSH por amostragem de bits: LSH_TABLES tabelas, cada uma com chave de
+  LSH_BITS bits sorteados (semente fixa). Os buckets ficam em formato CSR
+  (offsets + posições ordenadas), sem dicts nem objetos Python por descritor.
+- Consulta: candidatos dos buckets -> Hamming vetorizado (XOR + popcount)
+  -> voto do vizinho mais próximo de cada descritor -> conferência final
+  (ratio test contra todos os descritores da referência) só nas mais votadas.
+- Pré-filtro: pHash de 64 bits de cada referência num array uint64; um
+  XOR + popcount sobre todas escolhe as top-K, e só os descritores delas
+  têm a distância calculada e entram na votação/conferência.
+"""
+import time
+
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from core.indexes import CatalogIndex, catalog_snapshot
+from core.models import CardCatalog, CardReference
+
+from .features import DESCRIPTOR_BYTES, unpack_descriptors
+from .store import load_store, write_store
+
+LSH_TABLES = 4
+LSH_BITS = 18
+LSH_SEED = 20240917
+# Gravados no store: se mudarem, o store antigo é ignorado
+LSH_PARAMS = {'tables': LSH_TABLES, 'bits': LSH_BITS, 'seed': LSH_SEED}
+# Buckets maiores que isso são ruído (descritores muito comuns) e são ignorados
+MAX_BUCKET = 2048
+
+# Distância máxima (em bits, de 256) para dois descritores "baterem"
+MATCH_DISTANCE = 64
+# Referências mais votadas que passam pela conferência final
+VERIFY_CANDIDATES = 5
+# Lowe: melhor vizinho precisa ser claramente melhor que o segundo
+RATIO = 0.8
+# Para aceitar a identificação: matches bons mínimos e vantagem sobre o segundo
+# colocado (cartas parecidas compartilham moldura, texto etc.)
+MIN_GOOD_MATCHES = 20
+MIN_CONFIDENCE = 0.2
+MIN_MARGIN = 1.5
+
+SCANNER_VERSION_KEY = 'scanner_version'
+
+
+def scanner_version():
+    return cache.get(SCANNER_VERSION_KEY, 0)
+
+
+def bump_scanner_version():
+    """Avisa os workers que as referências mudaram"""
+    version = time.time_ns()
+    cache.set(SCANNER_VERSION_KEY, version, None)
+    return version
+
+
+def _as_words(descriptors):
+    """(N, 32) uint8 -> (N, 4) uint64, para XOR/popcount de 64 em 64 bits"""
+    return np.ascontiguousarray(descriptors).view(np.uint64)
+
+
+def hamming_pairs(a, b):
+    """Distância entre a[i] e b[i] (ambos em palavras de 64 bits)"""
+    return np.bitwise_count(a ^ b).sum(axis=1, dtype=np.int32)
+
+
+def lsh_bits(tables=LSH_TABLES, bits=LSH_BITS, seed=LSH_SEED):
+    """Bits sorteados de cada tabela (fixos, para todos os workers darem o mesmo índice)"""
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.choice(DESCRIPTOR_BYTES * 8, size=bits, replace=False) for _ in range(tables)])
+
+
+def lsh_keys(descriptors, bits):
+    """Chave de cada descritor para uma tabela (inteiro de len(bits) bits)"""
+    keys = np.zeros(len(descriptors), dtype=np.uint32)
+    for position, bit in enumerate(bits):
+        column = descriptors[:, bit // 8]
+        keys |= ((column >> (7 - bit % 8)) & 1).astype(np.uint32) << position
+    return keys
+
+
+class ScannerIndex:
+
+    def __init__(self, descriptors, ref_offsets, reference_ids, names, card_ids, hashes=None):
+        """
+        descriptors: (M, 32) uint8, agrupados por referência
+        ref_offsets: (R + 1,) início de cada referência em `descriptors`
+        reference_ids/names/card_ids: metadados de cada referência (card_id pode ser None)
+        hashes: (R,) pHash de cada referência como int64 (None = sem hash)
+        """
+        self.descriptors = descriptors
+        self.words = _as_words(descriptors)
+        self.ref_offsets = ref_offsets
+        self.owners = np.repeat(
+            np.arange(len(reference_ids), dtype=np.int32), np.diff(ref_offsets)
+        )
+        self.reference_ids = reference_ids
+        self.names = names
+        self.card_ids = card_ids
+
+        if hashes is None:
+            hashes = [None] * len(reference_ids)
+        self.hash_missing = np.array([value is None for value in hashes], dtype=bool)
+        self.hashes = np.array(
+            [0 if value is None else value for value in hashes], dtype=np.int64
+        ).view(np.uint64)
+
+        self.bits = lsh_bits()
+        self.tables = [self._build_table(bits) for bits in self.bits]
+
+    @classmethod
+    def from_arrays(cls, arrays, names, card_ids):
+        """
+        Monta o índice a partir dos arrays já prontos (ver arrays() e
+        scanner/store.py), sem recalcular nada: com arrays mmap, é imediato.
+        """
+        index = cls.__new__(cls)
+        index.descriptors = arrays['descriptors']
+        index.words = _as_words(index.descriptors)
+        index.ref_offsets = arrays['ref_offsets']
+        index.owners = arrays['owners']
+        index.reference_ids = arrays['reference_ids']
+        index.names = names
+        index.card_ids = card_ids
+        index.hash_missing = arrays['hash_missing']
+        index.hashes = arrays['hashes']
+        index.bits = arrays['lsh_bits']
+        index.tables = list(zip(arrays['lsh_offsets'], arrays['lsh_order']))
+        return index
+
+    def arrays(self):
+        """Tudo o que o índice precisa, como arrays NumPy (para gravar em disco)"""
+        return {
+            'descriptors': self.descriptors,
+            'ref_offsets': self.ref_offsets,
+            'owners': self.owners,
+            'reference_ids': self.reference_ids,
+            'hash_missing': self.hash_missing,
+            'hashes': self.hashes,
+            'lsh_bits': self.bits,
+            'lsh_offsets': np.stack([offsets for offsets, _ in self.tables]),
+            'lsh_order': np.stack([order for _, order in self.tables]),
+        }
+
+    def _build_table(self, bits):
+        keys = lsh_keys(self.descriptors, bits)
+        order = np.argsort(keys, kind='stable').astype(np.int32)
+        offsets = np.zeros((1 << LSH_BITS) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=1 << LSH_BITS), out=offsets[1:])
+        return offsets, order
+
+    def __len__(self):
+        return len(self.reference_ids)
+
+    def _candidates(self, query, allowed=None, groups=None):
+        """
+        Pares (descritor da consulta, posição na matriz) que caíram no mesmo
+        bucket. `allowed` (máscara por referência) descarta os de fora; com
+        `groups` (grupo de cada descritor da consulta), a máscara é uma por
+        grupo: (grupos, referências).
+        """
+        query_idx = []
+        positions = []
+        for bits, (offsets, order) in zip(self.bits, self.tables):
+            keys = lsh_keys(query, bits)
+            starts = offsets[keys]
+            lengths = offsets[keys + 1] - starts
+            lengths[lengths > MAX_BUCKET] = 0
+            total = int(lengths.sum())
+            if not total:
+                continue
+            within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            table_query_idx = np.repeat(np.arange(len(query)), lengths)
+            table_positions = order[np.repeat(starts, lengths) + within]
+            if allowed is not None:
+                owners = self.owners[table_positions]
+                keep = allowed[owners] if groups is None else allowed[groups[table_query_idx], owners]
+                table_query_idx, table_positions = table_query_idx[keep], table_positions[keep]
+            query_idx.append(table_query_idx)
+            positions.append(table_positions)
+
+        if not query_idx:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Um par pode vir de mais de uma tabela; repetido não muda o vizinho mais próximo
+        return np.concatenate(query_idx), np.concatenate(positions)
+
+    def _nearest(self, query, allowed=None, groups=None):
+        """(descritor da consulta, posição do vizinho mais próximo) dos que ficaram perto"""
+        query_idx, positions = self._candidates(query, allowed, groups)
+        if not len(query_idx):
+            return query_idx, positions
+        distances = hamming_pairs(_as_words(query)[query_idx], self.words[positions])
+        close = distances <= MATCH_DISTANCE
+        query_idx, positions, distances = query_idx[close], positions[close], distances[close]
+
+        # Uma ordenação só: por descritor e, dentro dele, pela distância
+        order = np.argsort(query_idx.astype(np.int64) * (MATCH_DISTANCE + 1) + distances)
+        query_idx, positions = query_idx[order], positions[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = query_idx[1:] != query_idx[:-1]
+        return query_idx[first], positions[first]
+
+    def vote(self, query, allowed=None):
+        """Votos por referência: cada descritor vota no dono do vizinho mais próximo"""
+        _, nearest = self._nearest(query, allowed)
+        return np.bincount(self.owners[nearest], minlength=len(self)).astype(np.int32)
+
+    def vote_batch(self, queries, allowed=None):
+        """
+        Votos (consultas, referências) de várias consultas numa passada só:
+        os descritores são concatenados e vão juntos pelas tabelas LSH e pelo
+        Hamming. `allowed`: máscara (consultas, referências) ou None.
+        """
+        groups = np.repeat(np.arange(len(queries)), [len(query) for query in queries])
+        if not len(groups):
+            return np.zeros((len(queries), len(self)), dtype=np.int32)
+        query_idx, nearest = self._nearest(np.concatenate(queries), allowed, groups)
+        cells = groups[query_idx] * len(self) + self.owners[nearest]
+        votes = np.bincount(cells, minlength=len(queries) * len(self))
+        return votes.reshape(len(queries), len(self)).astype(np.int32)
+
+    def prefilter(self, query_hash, top_k):
+        """
+        Posições das `top_k` referências com pHash mais próximo. Referências
+        sem hash (ainda não reprocessadas) entram sempre.
+        """
+        ranked = np.flatnonzero(~self.hash_missing)
+        if len(ranked) > top_k:
+            distances = np.bitwise_count(self.hashes[ranked] ^ np.uint64(query_hash))
+            ranked = ranked[np.argpartition(distances, top_k - 1)[:top_k]]
+        return np.concatenate([ranked, np.flatnonzero(self.hash_missing)])
+
+    def verify(self, query, reference):
+        """Matches bons (ratio test) entre a consulta e todos os descritores da referência"""
+        start, end = self.ref_offsets[reference], self.ref_offsets[reference + 1]
+        if end - start < 2 or not len(query):
+            return 0
+        # Dois vizinhos mais próximos de cada descritor (força bruta SIMD do OpenCV)
+        best_two, _ = cv2.batchDistance(
+            query, self.descriptors[start:end], dtype=cv2.CV_32S, normType=cv2.NORM_HAMMING, K=2
+        )
+        good = (best_two[:, 0] <= MATCH_DISTANCE) & (best_two[:, 0] < RATIO * best_two[:, 1])
+        return int(good.sum())
+
+    def _allowed(self, candidates):
+        allowed = np.zeros(len(self), dtype=bool)
+        allowed[candidates] = True
+        return allowed
+
+    def _rank(self, query, votes, limit):
+        """Confere as `limit` referências mais votadas e decide se a melhor é aceita"""
+        top = np.flatnonzero(votes)
+        if len(top) > limit:
+            top = top[np.argpartition(-votes[top], limit - 1)[:limit]]
+
+        results = []
+        for reference in top:
+            good = self.verify(query, reference)
+            size = min(len(query), int(self.ref_offsets[reference + 1] - self.ref_offsets[reference]))
+            results.append(self.describe(reference, votes=int(votes[reference]), good_matches=good, size=size))
+        results.sort(key=lambda result: (-result['good_matches'], -result['votes']))
+        if results:
+            runner_up = results[1]['good_matches'] if len(results) > 1 else 0
+            best = results[0]
+            best['accepted'] = (
+                best['good_matches'] >= MIN_GOOD_MATCHES
+                and best['confidence'] >= MIN_CONFIDENCE
+                and best['good_matches'] >= MIN_MARGIN * runner_up
+            )
+        return results
+
+    def search(self, query, limit=VERIFY_CANDIDATES, candidates=None):
+        """
+        Retorna as referências conferidas, da melhor para a pior:
+        [{'reference_id', 'name', 'card_id', 'votes', 'good_matches', 'confidence', 'accepted'}]
+        `candidates` (saída de prefilter) limita a comparação a essas referências.
+        """
+        if not len(self) or not len(query):
+            return []
+        allowed = None if candidates is None else self._allowed(candidates)
+        return self._rank(query, self.vote(query, allowed), limit)
+
+    def search_batch(self, queries, limit=VERIFY_CANDIDATES, candidates=None):
+        """
+        search() de várias consultas (recortes de uma mesma foto) com uma
+        única votação. `candidates`: lista com a saída de prefilter de cada
+        consulta (None = todas as referências), ou None.
+        Retorna uma lista de resultados por consulta.
+        """
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+        allowed = None
+        if candidates is not None:
+            allowed = np.stack([
+                np.ones(len(self), dtype=bool) if subset is None else self._allowed(subset)
+                for subset in candidates
+            ])
+        votes = self.vote_batch(queries, allowed)
+        return [
+            self._rank(query, row, limit) if len(query) else []
+            for query, row in zip(queries, votes)
+        ]
+
+    def describe(self, reference, votes, good_matches, size):
+        return {
+            'reference_id': int(self.reference_ids[reference]),
+            'name': self.names[reference],
+            'card_id': self.card_ids[reference],
+            'votes': votes,
+            'good_matches': good_matches,
+            'confidence': round(min(1.0, good_matches / size), 3) if size else 0.0,
+            'accepted': False,
+        }
+
+
+def card_ids_for(names):
+    """Nome da referência -> passcode no catálogo local (se houver)"""
+    snapshot = catalog_snapshot.get()
+    if len(snapshot):
+        wanted = set(names)
+        found = {record.name: record.id for record in snapshot if record.name in wanted}
+    else:
+        found = dict(CardCatalog.objects.filter(name__in=set(names)).values_list('name', 'id'))
+    return [found.get(name) for name in names]
+
+
+def load_index_from_db():
+    """Lê os descritores de todas as CardReference e monta o índice (lento; ver store)"""
+    rows = CardReference.objects.exclude(orb_features=None).order_by('id').values_list(
+        'id', 'name', 'orb_features', 'phash'
+    )
+    reference_ids = []
+    names = []
+    hashes = []
+    blocks = []
+    for reference_id, name, blob, phash in rows.iterator():
+        descriptors = unpack_descriptors(blob)
+        if not len(descriptors):
+            continue
+        reference_ids.append(reference_id)
+        names.append(name)
+        hashes.append(phash)
+        blocks.append(descriptors)
+
+    ref_offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    np.cumsum([len(block) for block in blocks], out=ref_offsets[1:])
+    descriptors = (
+        np.concatenate(blocks) if blocks else np.empty((0, DESCRIPTOR_BYTES), dtype=np.uint8)
+    )
+
+    return ScannerIndex(
+        descriptors, ref_offsets, np.array(reference_ids, dtype=np.int64), names,
+        card_ids_for(names), hashes=hashes,
+    )
+
+
+def reference_state():
+    """
+    Quantas referências têm descritores e o maior updated_at entre elas.
+    Gravado no store: se não bater com o banco (referência apagada, extração
+    interrompida antes de gravar o store), o store está desatualizado.
+    """
+    state = CardReference.objects.exclude(orb_features=None).aggregate(
+        references=Count('id'), updated_at=Max('updated_at')
+    )
+    if state['updated_at'] is not None:
+        state['updated_at'] = state['updated_at'].isoformat()
+    return state
+
+
+def export_store():
+    """Monta o índice a partir do banco e grava o store (extract_card_features)"""
+    # Lido antes do índice: uma mudança durante a leitura deixa o store desatualizado
+    source = reference_state()
+    index = load_index_from_db()
+    write_store(index.arrays(), index.names, LSH_PARAMS, source=source)
+    return len(index)
+
+
+def build_scanner_index():
+    """
+    Usa o store empacotado (mmap, pronto em milissegundos e com as páginas
+    compartilhadas entre workers); sem ele, lê tudo do banco.
+    """
+    stored = load_store(LSH_PARAMS)
+    if stored is not None:
+        arrays, names = stored
+        return ScannerIndex.from_arrays(arrays, names, card_ids_for(names))
+    return load_index_from_db()
+
+
+scanner_index = CatalogIndex('scanner', build_scanner_index, version=scanner_version)
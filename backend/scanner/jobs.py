@@ -0,0 +1,182 @@
+"""
+Fila de jobs do scanner, com pool limitado de threads por worker do Gunicorn.
+
+- Decodificar e comparar descritores é CPU pura (OpenCV/NumPy soltam o GIL),
+  então o trabalho sai do thread da requisição e vai para um pool pequeno
+  (SCANNER_WORKERS threads por processo).
+- A fila tem profundidade máxima (SCANNER_QUEUE_DEPTH, contando os jobs em
+  execução); cheia, submit() levanta QueueFull e a view responde 429. Uma
+  rajada de fotos não enfileira trabalho infinito nem rouba CPU do resto.
+- O estado do job (queued -> running -> done/failed) fica no cache
+  compartilhado, então o polling pode cair em qualquer worker. Quem espera
+  no mesmo processo que rodou o job usa o Future, sem polling.
+- Esperar um job prende um thread de requisição do Gunicorn; no máximo
+  SCANNER_MAX_WAITERS por processo fazem isso (reserve_waiter), o resto dos
+  threads fica livre para o carrinho, checkout etc.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .pipeline import identify_cards, identify_image, InvalidImage
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = 'scan_job_'
+# Intervalo do polling no cache quando o job roda em outro worker
+POLL_INTERVAL = 0.1
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Fila do scanner no limite; o cliente deve tentar de novo depois"""
+
+
+def _job_key(job_id):
+    return f'{JOB_PREFIX}{job_id}'
+
+
+def get_job(job_id):
+    """Estado do job ({'id', 'status', ...}) ou None se não existir/expirou"""
+    return cache.get(_job_key(job_id))
+
+
+def _save_job(job):
+    cache.set(_job_key(job['id']), job, settings.SCANNER_JOB_TTL)
+
+
+class ScanQueue:
+
+    def __init__(self, workers=None, depth=None):
+        self.workers = workers or settings.SCANNER_WORKERS
+        self.depth = max(depth or settings.SCANNER_QUEUE_DEPTH, self.workers)
+        self.max_waiters = settings.SCANNER_MAX_WAITERS
+        self._executor = None
+        self._pending = 0
+        self._waiters = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Criado sob demanda: o Gunicorn faz fork depois de importar o app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='scanner')
+        return self._executor
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, data, index, top_k=None, multi=False):
+        """
+        Enfileira a identificação de `data` (bytes da foto) e retorna o job.
+        multi: a foto tem várias cartas (identify_cards em vez de identify_image).
+        Levanta QueueFull se já houver `depth` jobs pendentes neste worker.
+        """
+        with self._lock:
+            if self._pending >= self.depth:
+                raise QueueFull()
+            self._pending += 1
+
+        job = {'id': uuid.uuid4().hex, 'status': QUEUED, 'created_at': time.time()}
+        try:
+            _save_job(job)
+            future = self._pool().submit(self._run, dict(job), data, index, top_k, multi)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        with self._lock:
+            self._futures[job['id']] = future
+        future.add_done_callback(lambda _: self._forget(job['id']))
+        return job
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job, data, index, top_k, multi):
+        started = time.time()
+        job.update(status=RUNNING, queued_ms=round((started - job['created_at']) * 1000, 2))
+        try:
+            _save_job(job)
+            identify = identify_cards if multi else identify_image
+            job.update(status=DONE, result=identify(data, index=index, top_k=top_k))
+        except InvalidImage as e:
+            job.update(status=FAILED, error=str(e), code=400)
+        except Exception:
+            logger.exception('Falha no job do scanner %s', job['id'])
+            job.update(status=FAILED, error='Falha ao processar a imagem.', code=500)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            _save_job(job)
+            connections.close_all()
+        return job
+
+    def reserve_waiter(self):
+        """
+        Reserva a vez de um thread de requisição esperar um job (wait/watch).
+        False se já houver max_waiters esperando neste processo; com True,
+        chame release_waiter() ao terminar.
+        """
+        with self._lock:
+            if self._waiters >= self.max_waiters:
+                return False
+            self._waiters += 1
+            return True
+
+    def release_waiter(self):
+        with self._lock:
+            self._waiters -= 1
+
+    def wait(self, job_id, timeout):
+        """
+        Espera o job terminar por até `timeout` segundos e retorna o estado
+        mais recente (None se o job não existir).
+        """
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                return get_job(job_id)
+
+        deadline = time.monotonic() + timeout
+        job = get_job(job_id)
+        while job is not None and job['status'] not in FINISHED and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            job = get_job(job_id)
+        return job
+
+    def watch(self, job_id, timeout):
+        """Gera o estado do job a cada mudança de status, até terminar ou `timeout`"""
+        deadline = time.monotonic() + timeout
+        last = None
+        job = get_job(job_id)
+        while job is not None:
+            if job['status'] != last:
+                last = job['status']
+                yield job
+            remaining = deadline - time.monotonic()
+            if job['status'] in FINISHED or remaining <= 0:
+                return
+            # Na fila, olha o cache com frequência para avisar o "running";
+            # rodando, basta esperar o fim
+            step = POLL_INTERVAL if job['status'] == QUEUED else remaining
+            job = self.wait(job_id, min(step, remaining))
+
+
+# Instância usada pelas views do scanner (uma por worker do Gunicorn)
+scan_queue = ScanQueue()
@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scanner.benchmark import DISTORTIONS, NoQueries, compare_reports, run_benchmark
+from scanner.index import build_scanner_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede acurácia (top-1/top-5) e latência por etapa do scanner com consultas sintéticas '
+        'geradas das CardReference. Determinístico pela semente; saída em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=100, help='Referências sorteadas')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--distortions', default=','.join(DISTORTIONS),
+            help=f"Lista separada por vírgula ({', '.join(DISTORTIONS)})"
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=None,
+            help='Referências do pré-filtro de pHash (padrão SCANNER_PREFILTER_K; 0 desliga)'
+        )
+        parser.add_argument('--warmup', type=int, default=3, help='Consultas descartadas no início')
+        parser.add_argument('--output', help='Grava o JSON neste arquivo (padrão: stdout)')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+
+    def handle(self, *args, **options):
+        distortions = [name.strip() for name in options['distortions'].split(',') if name.strip()]
+        unknown = [name for name in distortions if name not in DISTORTIONS]
+        if unknown:
+            raise CommandError(f"Distorções desconhecidas: {', '.join(unknown)}")
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Não foi possível ler {options["compare"]}: {e}')
+
+        index = build_scanner_index()
+        if not len(index):
+            raise CommandError('Nenhuma referência indexada; rode extract_card_features antes.')
+
+        try:
+            report = run_benchmark(
+                index, samples=options['samples'], seed=options['seed'], distortions=distortions,
+                top_k=options['top_k'], warmup=options['warmup'],
+            )
+        except NoQueries as e:
+            raise CommandError(str(e))
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        # Resumo e comparação: no stderr quando o JSON vai para o stdout
+        if options['output']:
+            log = self.stdout.write
+        else:
+            def log(line):
+                self.stderr.write(line, style_func=str)
+
+        accuracy = report['accuracy']
+        log(
+            f"{accuracy['queries']} consultas: top-1 {accuracy['top1']:.1%}, top-5 {accuracy['top5']:.1%}, "
+            f"erradas {accuracy['wrong']:.1%}, p95 total {report['latency_ms']['total']['p95']:.1f} ms"
+        )
+        if baseline is not None:
+            for line in compare_reports(report, baseline):
+                log(line)
@@ -0,0 +1,123 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from core.models import CardReference
+from scanner.features import extract_reference, init_worker
+from scanner.index import LSH_PARAMS, bump_scanner_version, export_store, reference_state
+from scanner.store import load_store, store_source
+
+UPDATE_FIELDS = ['orb_features', 'phash', 'features_image', 'features_version']
+
+
+class Command(BaseCommand):
+    help = (
+        'Extrai descritores ORB e pHash das CardReference em paralelo (um processo por core). '
+        'Só reprocessa o que mudou desde a última execução; pode ser interrompido e rodado de novo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=200, help='Linhas por bulk_update')
+        parser.add_argument('--force', action='store_true', help='Reprocessa todas as referências')
+        parser.add_argument(
+            '--rebuild-store', action='store_true',
+            help='Regrava o store de descritores mesmo sem referências novas'
+        )
+        parser.add_argument(
+            '--store-only', action='store_true',
+            help='Não extrai nada; só grava o store se ele não existir ou estiver desatualizado'
+        )
+
+    def handle(self, *args, **options):
+        pending = [] if options['store_only'] else self.pending(options['force'])
+        if pending:
+            processed = self.extract(pending, options)
+        else:
+            processed = 0
+            if not options['store_only']:
+                self.stdout.write('Nenhuma referência para processar.')
+
+        # Store empacotado lido pelos workers (mmap); regravado se algo mudou
+        # ou se não bate mais com o banco (execução interrompida, referência apagada)
+        state = reference_state()
+        if processed or options['rebuild_store'] or store_source(LSH_PARAMS) != state:
+            if not state['references'] and load_store(LSH_PARAMS) is None:
+                return
+            started = time.monotonic()
+            references = export_store()
+            bump_scanner_version()
+            self.stdout.write(self.style.SUCCESS(
+                f'Store do scanner gravado com {references} referências ({time.monotonic() - started:.1f}s)'
+            ))
+
+    def extract(self, pending, options):
+        """Extrai e grava as features; retorna quantas referências foram atualizadas"""
+        total = len(pending)
+
+        # pk -> (imagem, updated_at) lidos agora; é isso que fica registrado
+        versions = {pk: (image, updated_at) for pk, image, _, updated_at in pending}
+        items = [(pk, path) for pk, _, path, _ in pending]
+
+        stats = {'done': 0, 'failed': 0}
+        batch = []
+        started = time.monotonic()
+        last_report = started
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            results = executor.map(extract_reference, items, chunksize=8)
+            for pk, descriptors, phash in results:
+                if descriptors is None:
+                    stats['failed'] += 1
+                    self.stderr.write(f'Referência {pk}: {phash}')
+                else:
+                    image, updated_at = versions[pk]
+                    batch.append(CardReference(
+                        pk=pk, orb_features=descriptors, phash=phash,
+                        features_image=image, features_version=updated_at,
+                    ))
+                    stats['done'] += 1
+
+                # Grava por lotes: se parar no meio, o que já foi gravado não é refeito
+                if len(batch) >= options['batch_size']:
+                    CardReference.objects.bulk_update(batch, UPDATE_FIELDS)
+                    batch = []
+
+                now = time.monotonic()
+                processed = stats['done'] + stats['failed']
+                if now - last_report >= 2 or processed == total:
+                    last_report = now
+                    self.report(processed, total, stats, now - started)
+
+        if batch:
+            CardReference.objects.bulk_update(batch, UPDATE_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {stats['done']} referências processadas, {stats['failed']} falhas "
+            f"em {time.monotonic() - started:.1f}s"
+        ))
+        return stats['done']
+
+    def pending(self, force):
+        """[(pk, nome da imagem, caminho, updated_at)] das referências a processar"""
+        queryset = CardReference.objects.exclude(image='').exclude(image=None)
+        if not force:
+            queryset = queryset.filter(
+                Q(orb_features=None)
+                | Q(features_version=None)
+                | ~Q(features_version=F('updated_at'))
+                | ~Q(features_image=F('image'))
+            )
+        rows = queryset.order_by('pk').values_list('pk', 'image', 'updated_at')
+        storage = CardReference._meta.get_field('image').storage
+        return [(pk, image, storage.path(image), updated_at) for pk, image, updated_at in rows.iterator()]
+
+    def report(self, processed, total, stats, elapsed):
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{processed}/{total} ({processed * 100 // total}%) - {rate:.1f} referências/s - "
+            f"{stats['done']} ok, {stats['failed']} falhas"
+        )
@@ -0,0 +1,161 @@
+"""
+Identificação de uma foto de carta: decodifica, pré-filtra pelo pHash, extrai
+ORB e compara com as referências candidatas.
+Fotos com várias cartas (identify_cards) ganham uma etapa de detecção e
+recorte; os recortes são comparados juntos, numa votação só.
+Cada etapa é cronometrada e volta em `timings` (ms).
+"""
+import time
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .features import (
+    decode_image, extract_descriptors, find_card_regions, perceptual_hash, perceptual_hashes, warp_card
+)
+from .index import scanner_index
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+class InvalidImage(ValueError):
+    """Upload que não é uma imagem decodificável"""
+
+
+def identify_image(data, index=None, top_k=None):
+    """
+    Retorna {'match': melhor referência aceita ou None, 'candidates': [...],
+    'prefilter': {...}, 'timings': {...}}.
+    top_k: referências que passam pelo pré-filtro (padrão SCANNER_PREFILTER_K;
+    0 desliga o pré-filtro e usa o índice LSH inteiro).
+    Levanta InvalidImage se os bytes não forem uma imagem.
+    """
+    timer = StageTimer()
+    index = index if index is not None else scanner_index.get()
+    top_k = settings.SCANNER_PREFILTER_K if top_k is None else top_k
+
+    with timer.stage('decode'):
+        gray = decode_image(data)
+    if gray is None:
+        raise InvalidImage('Não foi possível ler a imagem enviada.')
+
+    candidates = None
+    if top_k:
+        with timer.stage('prefilter'):
+            candidates = index.prefilter(perceptual_hash(gray), top_k)
+
+    with timer.stage('features'):
+        descriptors = extract_descriptors(gray)
+
+    with timer.stage('search'):
+        results = index.search(descriptors, candidates=candidates)
+
+    accepted = [result for result in results if result['accepted']]
+    fallback = candidates is not None and not accepted
+    if fallback:
+        # pHash não é robusto a rotação/enquadramento ruim: se o pré-filtro
+        # errou, paga a busca completa só nesse caso
+        with timer.stage('search_full'):
+            results = index.search(descriptors)
+        accepted = [result for result in results if result['accepted']]
+
+    return {
+        'match': accepted[0] if accepted else None,
+        'candidates': results,
+        'prefilter': {
+            'top_k': top_k,
+            'references': len(index) if candidates is None else len(candidates),
+            'fallback': fallback,
+        },
+        'timings': timer.timings,
+    }
+
+
+def _accepted(results):
+    return next((result for result in results if result['accepted']), None)
+
+
+def identify_cards(data, index=None, top_k=None):
+    """
+    Várias cartas numa foto (página de fichário, cartas na mesa).
+    Retorna {'cards': [{'box', 'bbox', 'match', 'candidates'}], 'regions',
+    'prefilter', 'timings'}; `box` são os 4 cantos da carta (px da foto) e
+    `bbox` o retângulo que os contém. Sem nenhuma carta detectada, a foto
+    inteira vira um recorte só.
+    """
+    timer = StageTimer()
+    index = index if index is not None else scanner_index.get()
+    top_k = settings.SCANNER_PREFILTER_K if top_k is None else top_k
+
+    with timer.stage('decode'):
+        gray = decode_image(data)
+    if gray is None:
+        raise InvalidImage('Não foi possível ler a imagem enviada.')
+
+    with timer.stage('detect'):
+        regions = find_card_regions(gray)
+        if regions:
+            crops = [warp_card(gray, corners) for corners in regions]
+        else:
+            height, width = gray.shape[:2]
+            regions = [np.array(
+                [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32
+            )]
+            crops = [gray]
+
+    candidates = None
+    if top_k:
+        with timer.stage('prefilter'):
+            # O recorte sai em pé, mas pode estar de cabeça para baixo (e o
+            # pHash não é invariante a rotação): junta as duas orientações
+            candidates = [
+                np.union1d(*(index.prefilter(value, top_k) for value in perceptual_hashes(crop)))
+                for crop in crops
+            ]
+
+    with timer.stage('features'):
+        queries = [extract_descriptors(crop) for crop in crops]
+
+    with timer.stage('search'):
+        results = index.search_batch(queries, candidates=candidates)
+
+    # Recortes sem match aceito no pré-filtro: uma busca completa só para eles
+    retry = [i for i, found in enumerate(results) if candidates is not None and _accepted(found) is None]
+    if retry:
+        with timer.stage('search_full'):
+            for i, found in zip(retry, index.search_batch([queries[i] for i in retry])):
+                results[i] = found
+
+    cards = []
+    for corners, found in zip(regions, results):
+        x, y, width, height = cv2.boundingRect(corners)
+        cards.append({
+            'box': [[round(float(px)), round(float(py))] for px, py in corners],
+            'bbox': {'x': x, 'y': y, 'width': width, 'height': height},
+            'match': _accepted(found),
+            'candidates': found,
+        })
+
+    return {
+        'cards': cards,
+        'regions': len(regions),
+        'prefilter': {
+            'top_k': top_k,
+            'fallback': len(retry),
+        },
+        'timings': timer.timings,
+    }
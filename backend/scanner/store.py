@@ -0,0 +1,118 @@
+"""
+Store empacotado dos descritores do scanner, lido pelos workers com mmap.
+
+    SCANNER_STORE_DIR/
+        current.json               {"version": "..."}, trocado de forma atômica
+        <versão>/meta.json         nomes das referências, parâmetros do LSH e
+                                   estado do banco de quando foi gravado
+        <versão>/descriptors.npy   matriz (M, 32) uint8
+        <versão>/ref_offsets.npy   início de cada referência na matriz
+        <versão>/reference_ids.npy IDs das CardReference
+        <versão>/...               hashes e tabelas LSH já montadas
+
+Gravado por extract_card_features. Com np.load(mmap_mode='r') nada é
+copiado para a memória do worker: as páginas ficam no page cache do
+sistema, compartilhadas por todos os processos, e o índice fica pronto em
+milissegundos.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Versões antigas mantidas (workers podem ainda estar com elas mapeadas)
+KEEP_VERSIONS = 2
+# Permissão do current.json (mkstemp cria com 0600)
+FILE_MODE = 0o644
+
+
+def _root(root=None):
+    return Path(root or settings.SCANNER_STORE_DIR)
+
+
+def write_store(arrays, names, params, source=None, root=None):
+    """
+    Grava uma nova versão do store e passa a apontá-la como atual. `source`
+    descreve as referências do banco usadas (ver store_source).
+    """
+    root = _root(root)
+    version = str(time.time_ns())
+    directory = root / version
+    directory.mkdir(parents=True)
+
+    for name, array in arrays.items():
+        np.save(directory / f'{name}.npy', np.ascontiguousarray(array))
+    (directory / 'meta.json').write_text(
+        json.dumps({'names': names, 'params': params, 'source': source}, ensure_ascii=False), encoding='utf-8'
+    )
+
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.tmp-')
+    os.fchmod(fd, FILE_MODE)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'version': version}, f)
+    os.replace(tmp_path, root / 'current.json')
+
+    _prune(root, version)
+    return directory
+
+
+def _prune(root, current):
+    versions = sorted(
+        (path for path in root.iterdir() if path.is_dir() and path.name.isdigit()),
+        key=lambda path: int(path.name)
+    )
+    for path in versions[:-KEEP_VERSIONS]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _current(params, root=None):
+    """(diretório, meta) da versão atual, ou None se não houver ou os parâmetros mudaram"""
+    root = _root(root)
+    try:
+        version = json.loads((root / 'current.json').read_text())['version']
+        directory = root / version
+        meta = json.loads((directory / 'meta.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if meta.get('params') != params:
+        logger.warning('Store do scanner gravado com outros parâmetros; ignorando %s', directory)
+        return None
+    return directory, meta
+
+
+def load_store(params, root=None):
+    """
+    Retorna (arrays mapeados, nomes) da versão atual, ou None se não houver
+    store ou se ele foi gravado com outros parâmetros.
+    """
+    current = _current(params, root)
+    if current is None:
+        return None
+    directory, meta = current
+
+    arrays = {
+        path.stem: np.load(path, mmap_mode='r')
+        for path in directory.glob('*.npy')
+    }
+    return arrays, meta['names']
+
+
+def store_source(params, root=None):
+    """
+    `source` gravado com a versão atual, ou None se não houver store
+    utilizável. Diferente do estado atual do banco = store desatualizado.
+    """
+    current = _current(params, root)
+    if current is None:
+        return None
+    return current[1].get('source')
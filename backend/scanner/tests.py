@@ -0,0 +1,97 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .features import DESCRIPTOR_BYTES, perceptual_hash, perceptual_hashes
+from .index import ScannerIndex
+
+REFERENCES = 5
+DESCRIPTORS_PER_REFERENCE = 120
+
+
+def _flip_bits(descriptors, count, rng):
+    """Cópia com `count` bits trocados em cada descritor (foto x referência)"""
+    noisy = descriptors.copy()
+    for row in noisy:
+        for bit in rng.choice(DESCRIPTOR_BYTES * 8, size=count, replace=False):
+            row[bit // 8] ^= 1 << (bit % 8)
+    return noisy
+
+
+def _hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class ScannerIndexTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rng = np.random.default_rng(7)
+        cls.blocks = [
+            cls.rng.integers(0, 256, size=(DESCRIPTORS_PER_REFERENCE, DESCRIPTOR_BYTES), dtype=np.uint8)
+            for _ in range(REFERENCES)
+        ]
+        ref_offsets = np.arange(REFERENCES + 1, dtype=np.int64) * DESCRIPTORS_PER_REFERENCE
+        # Referência 4 ainda sem pHash
+        cls.hashes = [0x0F0F0F0F0F0F0F0F, 0x00000000FFFFFFFF, 0x7FFFFFFF00000000, 0x1234567812345678, None]
+        cls.index = ScannerIndex(
+            np.concatenate(cls.blocks), ref_offsets, np.arange(100, 100 + REFERENCES, dtype=np.int64),
+            [f'Ref {i}' for i in range(REFERENCES)], [1000 + i for i in range(REFERENCES)], hashes=cls.hashes,
+        )
+
+    def test_lsh_votes_for_the_matching_reference(self):
+        query = _flip_bits(self.blocks[2], 4, self.rng)
+        votes = self.index.vote(query)
+        self.assertEqual(int(np.argmax(votes)), 2)
+        # Descritores aleatórios de outras referências quase nunca caem perto
+        self.assertGreater(votes[2], 10 * max(np.delete(votes, 2).max(), 1))
+
+        results = self.index.search(query)
+        self.assertEqual(results[0]['reference_id'], 102)
+        self.assertEqual(results[0]['card_id'], 1002)
+        self.assertTrue(results[0]['accepted'])
+
+    def test_candidates_restrict_the_vote(self):
+        query = _flip_bits(self.blocks[2], 4, self.rng)
+        results = self.index.search(query, candidates=np.array([0, 1]))
+        self.assertNotIn(102, [result['reference_id'] for result in results])
+        self.assertFalse(any(result['accepted'] for result in results))
+
+    def test_batch_matches_single_queries(self):
+        queries = [_flip_bits(self.blocks[i], 4, self.rng) for i in (1, 3)]
+        batch = self.index.search_batch(queries, candidates=[None, np.array([3])])
+        self.assertEqual([results[0]['reference_id'] for results in batch], [101, 103])
+
+    def test_prefilter_picks_nearest_hashes_and_keeps_unhashed(self):
+        query_hash = self.hashes[3] ^ 0b1011  # 3 bits de diferença
+        candidates = self.index.prefilter(query_hash, top_k=1)
+        self.assertEqual(sorted(candidates.tolist()), [3, 4])
+
+        candidates = self.index.prefilter(self.hashes[0], top_k=2)
+        self.assertIn(0, candidates.tolist())
+        self.assertIn(4, candidates.tolist())
+        self.assertEqual(len(candidates), 3)
+
+    def test_prefilter_with_few_references_returns_all(self):
+        candidates = self.index.prefilter(0, top_k=10)
+        self.assertEqual(sorted(candidates.tolist()), list(range(REFERENCES)))
+
+
+class PerceptualHashTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        # Gradiente + ruído: estrutura de baixa frequência, como uma arte de carta
+        y, x = np.mgrid[0:256, 0:176]
+        self.gray = np.clip(x + y * 0.5 + rng.normal(0, 20, x.shape), 0, 255).astype(np.uint8)
+
+    def test_rotated_hash_matches_rotated_image(self):
+        upright, rotated = perceptual_hashes(self.gray)
+        self.assertEqual(upright, perceptual_hash(self.gray))
+        self.assertLessEqual(_hamming(rotated, perceptual_hash(np.rot90(self.gray, 2).copy())), 2)
+
+    def test_small_changes_keep_the_hash_close(self):
+        brighter = np.clip(self.gray.astype(np.int16) + 15, 0, 255).astype(np.uint8)
+        self.assertLessEqual(_hamming(perceptual_hash(self.gray), perceptual_hash(brighter)), 4)
+        other = np.ascontiguousarray(self.gray.T[:, ::-1])
+        self.assertGreater(_hamming(perceptual_hash(self.gray), perceptual_hash(other)), 10)
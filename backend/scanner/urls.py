@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('identify/', views.identify_card, name='scanner-identify'),
+    path('identify/batch/', views.identify_cards, name='scanner-identify-batch'),
+    path('jobs/', views.create_scan_job, name='scanner-jobs'),
+    path('jobs/<str:job_id>/', views.get_scan_job, name='scanner-job'),
+    path('jobs/<str:job_id>/stream/', views.stream_scan_job, name='scanner-job-stream'),
+]
@@ -0,0 +1,238 @@
+import json
+import math
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from .index import scanner_index
+from .jobs import scan_queue, get_job, QueueFull, FAILED, FINISHED
+
+# Fotos de celular passam fácil de 4 MB; acima disso é quase sempre engano
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_TOP_K = 5000
+
+# Quanto o /identify/ espera o job antes de devolver 202 com o ID (s); curto
+# para não prender o thread da requisição
+SYNC_WAIT = 2
+# Limite do long polling (?wait=) e da resposta em streaming (s)
+MAX_POLL_WAIT = 25
+STREAM_TIMEOUT = 25
+# Sugestão de espera para o cliente quando a fila está cheia (s)
+RETRY_AFTER = 2
+
+
+def _error(message, code):
+    return Response({'error': message}, status=code)
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _read_scan_request(request):
+    """(bytes da foto, top_k) ou uma Response de erro"""
+    upload = request.FILES.get('image')
+    if upload is None:
+        return _error('Envie a foto no campo image.', status.HTTP_400_BAD_REQUEST)
+
+    top_k = request.data.get('top_k', request.GET.get('top_k'))
+    if top_k not in (None, ''):
+        try:
+            top_k = int(top_k)
+        except ValueError:
+            top_k = -1
+        if not 0 <= top_k <= MAX_TOP_K:
+            return _error(f'top_k deve ser um inteiro entre 0 e {MAX_TOP_K}.', status.HTTP_400_BAD_REQUEST)
+    else:
+        top_k = None
+    if upload.size > MAX_UPLOAD_BYTES:
+        return _error('Imagem muito grande (máximo de 10 MB).', status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return upload.read(), top_k
+
+
+def _submit(request, multi=False):
+    """Valida o upload e enfileira o job; retorna o job ou uma Response de erro"""
+    parsed = _read_scan_request(request)
+    if isinstance(parsed, Response):
+        return parsed
+    data, top_k = parsed
+
+    index = scanner_index.get()
+    if not len(index):
+        return _error(
+            'Scanner indisponível: nenhuma carta de referência indexada.',
+            status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    try:
+        return scan_queue.submit(data, index, top_k=top_k, multi=multi)
+    except QueueFull:
+        return _busy()
+
+
+def _busy():
+    response = _error(
+        'Scanner ocupado, tente de novo em alguns segundos.', status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+def _job_links(request, job_id):
+    return {
+        'poll': request.build_absolute_uri(reverse('scanner-job', args=[job_id])),
+        'stream': request.build_absolute_uri(reverse('scanner-job-stream', args=[job_id])),
+    }
+
+
+def _job_payload(job):
+    """Estado público do job (sem os campos internos)"""
+    payload = {'id': job['id'], 'status': job['status']}
+    for field in ('queued_ms', 'result', 'error'):
+        if field in job:
+            payload[field] = job[field]
+    return payload
+
+
+def _job_not_found():
+    return _error('Job não encontrado ou expirado.', status.HTTP_404_NOT_FOUND)
+
+
+def _identify(request, multi):
+    job = _submit(request, multi=multi)
+    if isinstance(job, Response):
+        return job
+
+    # Sem vaga para esperar, o job já aceito volta como 202 na hora
+    if scan_queue.reserve_waiter():
+        try:
+            job = scan_queue.wait(job['id'], SYNC_WAIT)
+        finally:
+            scan_queue.release_waiter()
+    if job is None:
+        return _job_not_found()
+    if job['status'] == FAILED:
+        return _error(job['error'], job['code'])
+    if job['status'] not in FINISHED:
+        return Response(
+            {**_job_payload(job), **_job_links(request, job['id'])}, status=status.HTTP_202_ACCEPTED
+        )
+    return Response(job['result'])
+
+
+@api_view(['POST'])
+def identify_card(request):
+    """
+    Identifica a carta de uma foto (multipart, campo `image`).
+    Parâmetros opcionais:
+    - top_k: referências mantidas pelo pré-filtro de pHash (0 desliga)
+    Retorna a melhor correspondência (ou null), os candidatos conferidos e o
+    tempo de cada etapa. Passa pela mesma fila dos jobs: com a fila cheia
+    responde 429 e, se não terminar em 2 s, 202 com o job para consulta.
+    """
+    return _identify(request, multi=False)
+
+
+@api_view(['POST'])
+def identify_cards(request):
+    """
+    Várias cartas numa foto só (página de fichário, cartas na mesa); mesmos
+    parâmetros do /identify/. Retorna `cards`, uma entrada por carta
+    detectada (na ordem de leitura) com `box` (4 cantos em px), `bbox`,
+    `match` (ou null) e `candidates`.
+    """
+    return _identify(request, multi=True)
+
+
+@api_view(['POST'])
+def create_scan_job(request):
+    """
+    Enfileira a identificação de uma foto (mesmos parâmetros do /identify/;
+    multi=true para uma foto com várias cartas, como no /identify/batch/).
+    Retorna 202 com o ID do job e os links para polling e streaming; 429
+    (com Retry-After) se a fila estiver cheia.
+    """
+    job = _submit(request, multi=_flag(request.data.get('multi', request.GET.get('multi'))))
+    if isinstance(job, Response):
+        return job
+
+    links = _job_links(request, job['id'])
+    response = Response({**_job_payload(job), **links}, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = links['poll']
+    return response
+
+
+@api_view(['GET'])
+def get_scan_job(request, job_id):
+    """
+    Estado do job: queued, running, done (com `result`) ou failed (com `error`).
+    ?wait=N (até 25 s) segura a resposta até o job terminar (long polling);
+    429 se já houver esperas demais neste worker.
+    """
+    try:
+        wait = float(request.GET.get('wait') or 0)
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait) or wait < 0:
+        return _error('wait deve ser um número de segundos.', status.HTTP_400_BAD_REQUEST)
+    wait = min(wait, MAX_POLL_WAIT)
+
+    job = get_job(job_id)
+    if wait and job is not None and job['status'] not in FINISHED:
+        if not scan_queue.reserve_waiter():
+            return _busy()
+        try:
+            job = scan_queue.wait(job_id, wait)
+        finally:
+            scan_queue.release_waiter()
+    if job is None:
+        return _job_not_found()
+    return Response(_job_payload(job))
+
+
+class _JobStream:
+    """
+    Linhas NDJSON do job. O Django chama close() ao fim da resposta (ou se o
+    cliente cair antes de ler), e aí a vaga de espera é devolvida.
+    """
+
+    def __init__(self, job_id):
+        self._lines = (
+            json.dumps(_job_payload(job), ensure_ascii=False) + '\n'
+            for job in scan_queue.watch(job_id, STREAM_TIMEOUT)
+        )
+        self._closed = False
+
+    def __iter__(self):
+        return self._lines
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._lines.close()
+            scan_queue.release_waiter()
+
+
+@require_GET
+def stream_scan_job(request, job_id):
+    """
+    Acompanha o job em streaming (NDJSON): uma linha a cada mudança de
+    status, a última com o resultado ou o erro (até 25 s).
+    View Django pura: o DRF recusaria (406) um Accept: application/x-ndjson.
+    """
+    if get_job(job_id) is None:
+        return JsonResponse({'error': 'Job não encontrado ou expirado.'}, status=404)
+    if not scan_queue.reserve_waiter():
+        response = JsonResponse({'error': 'Scanner ocupado, tente de novo em alguns segundos.'}, status=429)
+        response['Retry-After'] = str(RETRY_AFTER)
+        return response
+
+    response = StreamingHttpResponse(_JobStream(job_id), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Sem isso o nginx segura as linhas até o fim da resposta
+    response['X-Accel-Buffering'] = 'no'
+    return response
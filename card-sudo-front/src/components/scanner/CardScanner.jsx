@@ -5,6 +5,7 @@ import api from '../../services/api';
 const CardScanner = () => {
   const [loading, setLoading] = useState(false);
   const [preview, setPreview] = useState(null);
+  const [result, setResult] = useState(null);
   const fileInputRef = useRef(null);
 
   const handleFileSelect = async (event) => {
@@ -14,27 +15,45 @@ const CardScanner = () => {
     // Show preview
     const objectUrl = URL.createObjectURL(file);
     setPreview(objectUrl);
+    setResult(null);
     setLoading(true);
 
     const formData = new FormData();
     formData.append('image', file);
 
     try {
-      // TODO: Implement the actual endpoint in backend
-      // const response = await api.post('/scanner/identify/', formData, {
-      //   headers: {
-      //     'Content-Type': 'multipart/form-data',
-      //   },
-      // });
-      // console.log(response.data);
-      
-      // Simulating API call for MVP
-      await new Promise(resolve => setTimeout(resolve, 2000));
-      alert('Carta enviada para análise! (Simulação)');
-
+      // Envia para a fila do scanner e espera o resultado com long polling
+      const { data: created } = await api.post('/scanner/jobs/', formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      });
+      let job = created;
+      while (job.status === 'queued' || job.status === 'running') {
+        try {
+          const { data } = await api.get(`/scanner/jobs/${job.id}/`, { params: { wait: 10 } });
+          job = data;
+        } catch (pollError) {
+          // Esperas demais no servidor: o job segue na fila, consulta de novo depois
+          if (pollError.response?.status !== 429) throw pollError;
+          const retryAfter = Number(pollError.response.headers['retry-after']) || 2;
+          await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+        }
+      }
+      if (job.status === 'failed') {
+        alert(job.error || 'Falha ao analisar a imagem.');
+      } else {
+        setResult(job.result);
+      }
     } catch (error) {
       console.error('Erro ao enviar imagem:', error);
-      alert('Falha ao enviar imagem.');
+      if (error.response?.status === 401) {
+        alert('Entre na sua conta para usar o scanner.');
+      } else if (error.response?.status === 429) {
+        alert('Scanner ocupado. Tente de novo em alguns segundos.');
+      } else {
+        alert(error.response?.data?.error || 'Falha ao enviar imagem.');
+      }
     } finally {
       setLoading(false);
     }
@@ -71,6 +90,21 @@ const CardScanner = () => {
         </div>
       )}
 
+      {result && (
+        <div className="w-full max-w-md mb-6 p-4 rounded-lg bg-gray-800 text-center">
+          {result.match ? (
+            <>
+              <p className="text-white font-bold text-lg">{result.match.name}</p>
+              <p className="text-gray-400 text-sm">
+                Confiança: {Math.round(result.match.confidence * 100)}%
+              </p>
+            </>
+          ) : (
+            <p className="text-gray-300">Não reconhecemos a carta. Tente uma foto mais nítida e de frente.</p>
+          )}
+        </div>
+      )}
+
       <button
         onClick={triggerCamera}
         disabled={loading}
@@ -1,7 +1,9 @@
 import React from 'react';
 import { useNavigate } from 'react-router-dom';
+import { useLoader } from '@react-three/fiber';
 import { X, Swords, Shield, Sparkles, Star, Tag, ExternalLink } from 'lucide-react';
 import { useAuth } from '../../context/AuthContext';
+import { MipChainLoader, getCardTextureUrl, CARD_BACK_TEXTURE_URL } from '../../services/textures';
 
 const Card3D = ({ card, onClose }) => {
   const navigate = useNavigate();
@@ -14,6 +16,12 @@ const Card3D = ({ card, onClose }) => {
     navigate('/sell', { state: { card } });
   };
 
+  // Intenção de abrir o 3D: já baixa as texturas para o cache do useLoader
+  // (mesmas URLs do CardViewer3D), que abre sem esperar por elas
+  const preloadTextures = () => {
+    useLoader.preload(MipChainLoader, [getCardTextureUrl(card.id), CARD_BACK_TEXTURE_URL]);
+  };
+
   const handleView3D = () => {
     onClose();
     navigate(`/card3d/${card.id}`, { state: { card } });
@@ -178,6 +186,9 @@ const Card3D = ({ card, onClose }) => {
         <div className="mt-4 flex gap-2">
           <button
             onClick={handleView3D}
+            onPointerEnter={preloadTextures}
+            onTouchStart={preloadTextures}
+            onFocus={preloadTextures}
             className="flex-1 py-2.5 bg-gray-800 hover:bg-gray-700 text-white font-medium rounded-lg transition-colors flex items-center justify-center gap-2 text-sm border border-gray-700"
           >
             <ExternalLink className="w-4 h-4" />
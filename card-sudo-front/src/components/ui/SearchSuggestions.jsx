@@ -0,0 +1,61 @@
+import React, { useEffect, useState } from 'react';
+import { autocompleteCards } from '../../services/ygoprodeck';
+
+// Espera o usuário parar de digitar antes de consultar o backend
+const DEBOUNCE_MS = 200;
+const MIN_CHARS = 2;
+const MAX_SUGGESTIONS = 8;
+
+/**
+ * Lista de nomes sugeridos (busca-enquanto-digita) abaixo de um campo de
+ * busca. O pai precisa ser `relative`; onSelect recebe { id, name }.
+ */
+const SearchSuggestions = ({ query, onSelect }) => {
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    const term = query.trim();
+    if (term.length < MIN_CHARS) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      autocompleteCards(term, MAX_SUGGESTIONS)
+        .then((results) => {
+          if (!cancelled) setSuggestions(results);
+        })
+        .catch(() => {
+          if (!cancelled) setSuggestions([]);
+        });
+    }, DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
+  if (!suggestions.length) return null;
+
+  return (
+    <ul className="absolute left-0 right-0 top-full mt-1 z-20 bg-gray-900 border border-gray-800 rounded-xl overflow-hidden shadow-lg">
+      {suggestions.map((suggestion) => (
+        <li key={suggestion.id}>
+          <button
+            type="button"
+            // mousedown: dispara antes do blur do campo esconder a lista
+            onMouseDown={(e) => {
+              e.preventDefault();
+              onSelect(suggestion);
+            }}
+            className="w-full text-left px-4 py-2 text-sm text-gray-200 hover:bg-gray-800 truncate"
+          >
+            {suggestion.name}
+          </button>
+        </li>
+      ))}
+    </ul>
+  );
+};
+
+export default SearchSuggestions;
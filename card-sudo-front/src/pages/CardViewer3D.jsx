@@ -1,15 +1,12 @@
 import * as THREE from 'three'
 import { useEffect, useRef, useState, Suspense } from 'react'
 import { useLocation, useNavigate } from 'react-router-dom'
-import { Canvas, useFrame } from '@react-three/fiber'
-import { useTexture, Html } from '@react-three/drei'
+import { Canvas, useFrame, useLoader } from '@react-three/fiber'
+import { Html } from '@react-three/drei'
 import { ArrowLeft, Tag, Swords, Shield, Star, Loader2, Sparkles } from 'lucide-react'
 import { useAuth } from '../context/AuthContext'
+import { MipChainLoader, getCardTextureUrl, CARD_BACK_TEXTURE_URL } from '../services/textures'
 
-// URLs do proxy no backend (resolve CORS)
-const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:8000/api'
-const getCardImageUrl = (cardId) => `${API_BASE}/core/images/${cardId}/`
-const CARD_BACK_URL = `${API_BASE}/core/images/back/`
 
 export default function CardViewer3D() {
   const location = useLocation()
@@ -18,8 +15,8 @@ export default function CardViewer3D() {
   
   const card = location.state?.card
   
-  // Usa o proxy do backend para evitar CORS
-  const cardImageUrl = card?.id ? getCardImageUrl(card.id) : CARD_BACK_URL
+  // Textura com mipmaps prontos, via proxy do backend (resolve CORS)
+  const cardImageUrl = card?.id ? getCardTextureUrl(card.id) : CARD_BACK_TEXTURE_URL
   
   // Debug
   console.log('CardViewer3D - Card ID:', card?.id)
@@ -254,26 +251,11 @@ function Card3DModel({ cardImageUrl }) {
   const dragStart = useRef({ x: 0, y: 0 })
   const rotationStart = useRef({ x: 0, y: 0 })
   
-  // URL do verso da carta via proxy
-  const cardBackUrl = CARD_BACK_URL
-  
-  // Carrega texturas
-  const frontTexture = useTexture(cardImageUrl || cardBackUrl)
-  const backTexture = useTexture(cardBackUrl)
-  
-  // Configurar texturas
-  useEffect(() => {
-    if (frontTexture) {
-      frontTexture.colorSpace = THREE.SRGBColorSpace
-      frontTexture.minFilter = THREE.LinearFilter
-      frontTexture.magFilter = THREE.LinearFilter
-    }
-    if (backTexture) {
-      backTexture.colorSpace = THREE.SRGBColorSpace
-      backTexture.minFilter = THREE.LinearFilter
-      backTexture.magFilter = THREE.LinearFilter
-    }
-  }, [frontTexture, backTexture])
+  // Carrega texturas (potência de dois, mipmaps já gerados no backend)
+  const [frontTexture, backTexture] = useLoader(MipChainLoader, [
+    cardImageUrl || CARD_BACK_TEXTURE_URL,
+    CARD_BACK_TEXTURE_URL,
+  ])
 
   useEffect(() => {
     document.body.style.cursor = hovered ? (dragging ? 'grabbing' : 'grab') : 'auto'
@@ -1,7 +1,25 @@
 import React, { useEffect, useState, useCallback } from 'react';
 import { Search, Loader2, BookOpen, Filter, X } from 'lucide-react';
-import { searchCards, getArchetypes, getPopularCards } from '../services/ygoprodeck';
+import { searchCards, getArchetypes, getPopularCards, getImageAtlas } from '../services/ygoprodeck';
 import Card3D from '../components/ui/Card3D';
+import SearchSuggestions from '../components/ui/SearchSuggestions';
+
+// Máximo de cartas por atlas no backend (MAX_ATLAS_IDS)
+const MAX_ATLAS_CARDS = 60;
+// Sem atlas até aqui, a grade desiste dele e usa as imagens avulsas (ms)
+const ATLAS_TIMEOUT_MS = 5000;
+
+// Estilo de sprite (em %, para acompanhar o tamanho responsivo do card)
+const spriteStyle = (atlas, { x, y }) => {
+  const { width, height, tile } = atlas;
+  const spanX = width - tile.width;
+  const spanY = height - tile.height;
+  return {
+    backgroundImage: `url(${atlas.image})`,
+    backgroundSize: `${(width / tile.width) * 100}% ${(height / tile.height) * 100}%`,
+    backgroundPosition: `${spanX ? (x / spanX) * 100 : 0}% ${spanY ? (y / spanY) * 100 : 0}%`,
+  };
+};
 
 const Catalog = () => {
   const [cards, setCards] = useState([]);
@@ -16,7 +34,11 @@ const Catalog = () => {
     archetype: '',
   });
   const [showFilters, setShowFilters] = useState(false);
+  const [showSuggestions, setShowSuggestions] = useState(false);
   const [isInitialLoad, setIsInitialLoad] = useState(true);
+  // id -> estilo do sprite (null enquanto o atlas carrega: a grade mostra
+  // placeholders); cartas fora do atlas, ou se ele falhar, usam a imagem avulsa
+  const [sprites, setSprites] = useState(null);
 
   const fetchCards = useCallback(async (query = '', filterOpts = {}) => {
     try {
@@ -41,6 +63,39 @@ const Catalog = () => {
     }
   }, []);
 
+  // Uma imagem (atlas) para a grade inteira em vez de uma requisição por carta.
+  // Os sprites só entram depois que a imagem do atlas carregou; se ela (ou o
+  // mapa) falhar ou demorar demais, cada carta usa a imagem avulsa
+  useEffect(() => {
+    let cancelled = false;
+    setSprites(null);
+    if (!cards.length) return undefined;
+    const fallback = () => {
+      if (!cancelled) setSprites((current) => current ?? {});
+    };
+    const timer = setTimeout(fallback, ATLAS_TIMEOUT_MS);
+    getImageAtlas(cards.slice(0, MAX_ATLAS_CARDS).map((card) => card.id))
+      .then((atlas) => {
+        if (cancelled) return;
+        const sheet = new Image();
+        sheet.onload = () => {
+          if (cancelled) return;
+          clearTimeout(timer);
+          setSprites(Object.fromEntries(atlas.cards.map((entry) => [entry.id, spriteStyle(atlas, entry)])));
+        };
+        sheet.onerror = fallback;
+        sheet.src = atlas.image;
+      })
+      .catch((err) => {
+        console.error('Erro ao carregar atlas:', err);
+        fallback();
+      });
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [cards]);
+
   // Carrega cartas de amostra e arquétipos ao iniciar
   useEffect(() => {
     const loadInitialData = async () => {
@@ -66,9 +121,16 @@ const Catalog = () => {
 
   const handleSearch = (e) => {
     e.preventDefault();
+    setShowSuggestions(false);
     fetchCards(searchQuery, filters);
   };
 
+  const handleSelectSuggestion = ({ name }) => {
+    setSearchQuery(name);
+    setShowSuggestions(false);
+    fetchCards(name, filters);
+  };
+
   const handleFilterChange = (key, value) => {
     const newFilters = { ...filters, [key]: value };
     setFilters(newFilters);
@@ -106,10 +168,19 @@ const Catalog = () => {
             <input
               type="text"
               value={searchQuery}
-              onChange={(e) => setSearchQuery(e.target.value)}
+              onChange={(e) => {
+                setSearchQuery(e.target.value);
+                setShowSuggestions(true);
+              }}
+              onFocus={() => setShowSuggestions(true)}
+              onBlur={() => setShowSuggestions(false)}
               placeholder="Buscar carta por nome..."
+              autoComplete="off"
               className="w-full bg-gray-900 border border-gray-800 rounded-xl py-2.5 sm:py-3 pl-9 sm:pl-10 pr-3 sm:pr-4 text-sm focus:outline-none focus:border-primary transition-colors"
             />
+            {showSuggestions && (
+              <SearchSuggestions query={searchQuery} onSelect={handleSelectSuggestion} />
+            )}
           </div>
           <button
             type="submit"
@@ -216,19 +287,30 @@ const Catalog = () => {
           </p>
           
           <div className="grid grid-cols-3 sm:grid-cols-4 md:grid-cols-5 gap-2 sm:gap-3">
-            {cards.map((card) => (
+            {cards.map((card, position) => (
               <div 
                 key={card.id} 
                 onClick={() => setSelectedCard(card)}
                 className="cursor-pointer group"
               >
                 <div className="relative aspect-[3/4.4] bg-gray-900 rounded-lg overflow-hidden border border-gray-800 shadow-sm transition-all duration-300 group-hover:scale-105 group-hover:border-primary group-hover:shadow-lg group-hover:shadow-primary/20 active:scale-95">
-                  <img 
-                    src={card.card_images?.[0]?.image_url_small} 
-                    alt={card.name}
-                    className="w-full h-full object-cover"
-                    loading="lazy"
-                  />
+                  {sprites === null && position < MAX_ATLAS_CARDS ? (
+                    <div className="w-full h-full bg-gray-800 animate-pulse" />
+                  ) : sprites?.[card.id] ? (
+                    <div
+                      role="img"
+                      aria-label={card.name}
+                      className="w-full h-full"
+                      style={sprites[card.id]}
+                    />
+                  ) : (
+                    <img 
+                      src={card.card_images?.[0]?.image_url_small} 
+                      alt={card.name}
+                      className="w-full h-full object-cover"
+                      loading="lazy"
+                    />
+                  )}
                   {/* Hover Overlay */}
                   <div className="absolute inset-0 bg-gradient-to-t from-black/80 via-transparent to-transparent opacity-0 group-hover:opacity-100 transition-opacity flex items-end p-1.5 sm:p-2">
                     <span className="text-[8px] sm:text-[10px] text-white font-medium line-clamp-2">{card.name}</span>
@@ -2,12 +2,15 @@ import React, { useEffect, useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { Loader2, Package, LogIn, Eye, Tag, Calendar, User } from 'lucide-react';
 import { getMyPurchases, CONDITIONS } from '../services/marketplace';
+import { getCardsByIds } from '../services/ygoprodeck';
 import { useAuth } from '../context/AuthContext';
 
 const MyCards = () => {
   const [cards, setCards] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Dados completos das cartas (descrição, ATK/DEF...) por card_id, para o visualizador 3D
+  const [details, setDetails] = useState({});
   const { isAuthenticated } = useAuth();
   const navigate = useNavigate();
 
@@ -23,6 +26,7 @@ const MyCards = () => {
       setError(null);
       const data = await getMyPurchases();
       setCards(data);
+      fetchDetails(data);
     } catch (err) {
       console.error('Erro ao buscar cartas:', err);
       setError('Não foi possível carregar suas cartas.');
@@ -31,6 +35,17 @@ const MyCards = () => {
     }
   };
 
+  // Uma chamada só para todas as cartas; sem ela o 3D mostra só nome e imagem
+  const fetchDetails = async (purchases) => {
+    const ids = [...new Set(purchases.map((card) => Number(card.card_id)).filter(Boolean))];
+    try {
+      const { data } = await getCardsByIds(ids);
+      setDetails(Object.fromEntries(data.map((card) => [String(card.requested_id), card])));
+    } catch (err) {
+      console.error('Erro ao buscar detalhes das cartas:', err);
+    }
+  };
+
   const getConditionLabel = (value) => {
     return CONDITIONS.find(c => c.value === value)?.label || value;
   };
@@ -153,10 +168,12 @@ const MyCards = () => {
                   
                   <button
                     onClick={() => navigate('/card3d', { state: { card: {
-                      id: card.card_id,
                       name: card.card_name,
                       type: card.card_type,
-                      card_images: [{ image_url: card.card_image }]
+                      card_images: [{ image_url: card.card_image }],
+                      ...details[String(card.card_id)],
+                      // ID comprado (pode ser arte alternativa), não o canônico
+                      id: card.card_id,
                     }}})}
                     className="p-1.5 bg-gray-800 hover:bg-gray-700 rounded-lg transition-colors"
                     title="Ver em 3D"
@@ -5,6 +5,7 @@ import { searchCards } from '../services/ygoprodeck';
 import { createListing, CONDITIONS } from '../services/marketplace';
 import { useAuth } from '../context/AuthContext';
 import { useToast } from '../context/ToastContext';
+import SearchSuggestions from '../components/ui/SearchSuggestions';
 
 const Sell = () => {
   const navigate = useNavigate();
@@ -16,6 +17,7 @@ const Sell = () => {
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]);
   const [searching, setSearching] = useState(false);
+  const [showSuggestions, setShowSuggestions] = useState(false);
   const [selectedCard, setSelectedCard] = useState(location.state?.card || null);
   
   // Form de venda
@@ -38,14 +40,14 @@ const Sell = () => {
     }
   }, [selectedCard]);
 
-  const handleSearch = async (e) => {
-    e.preventDefault();
-    if (!searchQuery.trim()) return;
+  const runSearch = async (query) => {
+    if (!query.trim()) return;
 
+    setShowSuggestions(false);
     setSearching(true);
     setError('');
     try {
-      const results = await searchCards(searchQuery, { limit: 20 });
+      const results = await searchCards(query, { limit: 20, summary: true });
       setSearchResults(results);
       if (results.length === 0) {
         setError('Nenhuma carta encontrada.');
@@ -57,6 +59,16 @@ const Sell = () => {
     }
   };
 
+  const handleSearch = (e) => {
+    e.preventDefault();
+    runSearch(searchQuery);
+  };
+
+  const handleSelectSuggestion = ({ name }) => {
+    setSearchQuery(name);
+    runSearch(name);
+  };
+
   const handleSelectCard = (card) => {
     setSelectedCard(card);
     setStep(2);
@@ -141,8 +153,14 @@ const Sell = () => {
               <input
                 type="text"
                 value={searchQuery}
-                onChange={(e) => setSearchQuery(e.target.value)}
+                onChange={(e) => {
+                  setSearchQuery(e.target.value);
+                  setShowSuggestions(true);
+                }}
+                onFocus={() => setShowSuggestions(true)}
+                onBlur={() => setShowSuggestions(false)}
                 placeholder="Buscar carta pelo nome..."
+                autoComplete="off"
                 className="w-full px-4 py-3 bg-gray-800 border border-gray-700 rounded-xl pl-11 focus:outline-none focus:border-primary"
               />
               <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-5 h-5 text-gray-500" />
@@ -153,6 +171,9 @@ const Sell = () => {
               >
                 {searching ? <Loader2 className="w-4 h-4 animate-spin" /> : 'Buscar'}
               </button>
+              {showSuggestions && (
+                <SearchSuggestions query={searchQuery} onSelect={handleSelectSuggestion} />
+              )}
             </div>
           </form>
 
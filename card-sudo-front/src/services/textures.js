@@ -0,0 +1,68 @@
+import * as THREE from 'three';
+
+const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+
+// Celular com pouca memória recebe a textura menor (256 em vez de 512)
+const TEXTURE_MAX = navigator.deviceMemory && navigator.deviceMemory <= 2 ? 256 : 512;
+
+export const getCardTextureUrl = (cardId) =>
+  `${API_BASE_URL}/core/images/${cardId}/texture/?max=${TEXTURE_MAX}`;
+
+export const CARD_BACK_TEXTURE_URL = `${API_BASE_URL}/core/images/back/texture/?max=${TEXTURE_MAX}`;
+
+const MAGIC = 'MIPCHN01';
+
+/**
+ * Lê a cadeia de mipmaps gerada pelo backend (core/imaging.py):
+ * MAGIC | tamanho do cabeçalho (u32 LE) | cabeçalho JSON | níveis encodados.
+ * Cada nível é decodificado com createImageBitmap (fora da thread principal)
+ * e vira um mipmap pronto: o navegador não redimensiona nem gera mipmaps.
+ */
+async function parseMipChain(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const decoder = new TextDecoder();
+  if (decoder.decode(bytes.subarray(0, MAGIC.length)) !== MAGIC) {
+    throw new Error('Resposta não é uma textura do backend');
+  }
+  const headerSize = new DataView(buffer).getUint32(MAGIC.length, true);
+  const headerStart = MAGIC.length + 4;
+  const header = JSON.parse(decoder.decode(bytes.subarray(headerStart, headerStart + headerSize)));
+  const base = headerStart + headerSize;
+
+  const levels = await Promise.all(
+    header.levels.map(({ offset, length }) => {
+      const blob = new Blob([bytes.subarray(base + offset, base + offset + length)], {
+        type: header.content_type,
+      });
+      // ImageBitmap ignora texture.flipY; a inversão é feita na decodificação
+      return createImageBitmap(blob, { imageOrientation: 'flipY' });
+    })
+  );
+
+  const texture = new THREE.Texture(levels[0]);
+  texture.mipmaps = levels;
+  texture.generateMipmaps = false;
+  texture.flipY = false;
+  texture.colorSpace = THREE.SRGBColorSpace;
+  texture.minFilter = THREE.LinearMipmapLinearFilter;
+  texture.magFilter = THREE.LinearFilter;
+  texture.needsUpdate = true;
+  return texture;
+}
+
+/** Loader no formato do Three.js, para usar com useLoader do react-three-fiber */
+export class MipChainLoader extends THREE.Loader {
+  load(url, onLoad, onProgress, onError) {
+    fetch(url)
+      .then((response) => {
+        if (!response.ok) throw new Error(`Falha ao carregar textura (${response.status})`);
+        return response.arrayBuffer();
+      })
+      .then(parseMipChain)
+      .then(onLoad)
+      .catch((error) => {
+        if (onError) onError(error);
+        else console.error(error);
+      });
+  }
+}
@@ -36,7 +36,12 @@ export const searchCards = async (query, options = {}) => {
   const limit = options.limit || 30;
 
   try {
-    const response = await api.get('/core/cards/', { params });
+    // Paginação e resumo feitos no backend (payload bem menor)
+    const backendParams = { ...params, num: limit };
+    if (options.summary) {
+      backendParams.view = 'summary';
+    }
+    const response = await api.get('/core/cards/', { params: backendParams });
     const data = response.data.data || [];
     return data.slice(0, limit);
   } catch (error) {
@@ -58,6 +63,55 @@ export const getCardById = async (id) => {
   return response.data.data?.[0] || response.data;
 };
 
+/**
+ * Sugestões de nomes para busca-enquanto-digita (índice em memória no backend)
+ * Retorna [{ id, name }, ...]
+ */
+export const autocompleteCards = async (query, limit = 10) => {
+  if (!query || !query.trim()) {
+    return [];
+  }
+  const response = await api.get('/core/cards/autocomplete/', { params: { q: query, limit } });
+  return response.data.data || [];
+};
+
+/**
+ * Busca várias cartas de uma vez (carrinho, pedidos, decks).
+ * Retorna { data: [...cartas], missing: [...ids não encontrados] }; cada carta
+ * traz requested_id (o ID pedido, que difere de id em artes alternativas)
+ */
+export const getCardsByIds = async (ids) => {
+  if (!ids.length) {
+    return { data: [], missing: [] };
+  }
+  const response = await api.post('/core/cards/batch/', { ids });
+  return response.data;
+};
+
+/**
+ * Busca a carta pelo código impresso (ex.: LOB-EN001)
+ * Retorna { data: [...cartas], printings: [...coleção/raridade] }
+ */
+export const getCardBySetCode = async (code, rarity) => {
+  const params = { code };
+  if (rarity) {
+    params.rarity = rarity;
+  }
+  const response = await api.get('/core/cards/by-set-code/', { params });
+  return response.data;
+};
+
+/**
+ * Atlas (sprite sheet) com as miniaturas das cartas, na ordem pedida
+ * Retorna { image, width, height, tile: {width, height}, cards: [{id, x, y}], missing }
+ */
+export const getImageAtlas = async (ids, size = 'thumb') => {
+  const response = await api.get('/core/images/atlas/', {
+    params: { ids: ids.join(','), size },
+  });
+  return response.data;
+};
+
 export const getArchetypes = async () => {
   try {
     const response = await api.get('/core/archetypes/');
@@ -75,7 +129,7 @@ export const getPopularCards = async () => {
   try {
     // Tenta buscar do backend
     const response = await api.get('/core/cards/', { 
-      params: { fname: 'dragon' } 
+      params: { fname: 'dragon', num: 20 } 
     });
     const data = response.data.data || [];
     return data.slice(0, 20);
@@ -94,4 +148,4 @@ export const getPopularCards = async () => {
   }
 };
 
-export default { searchCards, getCardById, getArchetypes, getPopularCards };
+export default { searchCards, autocompleteCards, getCardById, getCardsByIds, getCardBySetCode, getImageAtlas, getArchetypes, getPopularCards };